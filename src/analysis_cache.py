@@ -0,0 +1,374 @@
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = ".analysis_cache"
+DEFAULT_EMBEDDING_CACHE_MAX_MB = 512
+SQLITE_MAX_VARIABLES = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def model_slug(model_name: str) -> str:
+    readable = re.sub(r"[^A-Za-z0-9._-]+", "_", model_name).strip("_")
+    return f"{readable}-{hashlib.sha1(model_name.encode('utf-8')).hexdigest()[:8]}"
+
+
+def chunked(items: list, size: int = SQLITE_MAX_VARIABLES):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def open_cache_db(cache_dir: Path) -> sqlite3.Connection:
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(cache_dir / "analysis_cache.sqlite"), timeout=60, isolation_level=None)
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS embedding_models (
+            model TEXT PRIMARY KEY,
+            dim INTEGER NOT NULL,
+            n_rows INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS embeddings (
+            model TEXT NOT NULL,
+            text_hash TEXT NOT NULL,
+            row INTEGER NOT NULL,
+            last_used REAL NOT NULL,
+            PRIMARY KEY (model, text_hash)
+        );
+        CREATE TABLE IF NOT EXISTS nli_verdicts (
+            model TEXT NOT NULL,
+            encoding TEXT NOT NULL,
+            premise_hash TEXT NOT NULL,
+            hypothesis_hash TEXT NOT NULL,
+            label TEXT NOT NULL,
+            logits TEXT NOT NULL,
+            PRIMARY KEY (model, encoding, premise_hash, hypothesis_hash)
+        );
+        CREATE TABLE IF NOT EXISTS metric_definitions (
+            definition_hash TEXT PRIMARY KEY,
+            definition TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS prompt_results (
+            definition_hash TEXT NOT NULL,
+            fingerprint TEXT NOT NULL,
+            result TEXT NOT NULL,
+            PRIMARY KEY (definition_hash, fingerprint)
+        );
+        """
+    )
+    return conn
+
+
+class EmbeddingCache:
+    """
+    On-disk sentence-embedding cache keyed by (model name, SHA-256 of the text).
+
+    Vectors live in one raw float32 file per model that is memory-mapped for
+    reads; the SQLite index maps each text hash to its row and doubles as the
+    cross-process write lock. When a model's vector file grows beyond
+    max_bytes, the least recently used rows are dropped and the file is compacted.
+    """
+
+    def __init__(self, cache_dir: str | Path, model_name: str, max_bytes: int = DEFAULT_EMBEDDING_CACHE_MAX_MB * 2**20) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.vectors_path = self.cache_dir / f"embeddings_{model_slug(model_name)}.f32"
+        self.conn = open_cache_db(self.cache_dir)
+        self.hits = 0
+        self.misses = 0
+
+    def _model_shape(self) -> tuple[int, int] | None:
+        row = self.conn.execute(
+            "SELECT dim, n_rows FROM embedding_models WHERE model = ?", (self.model_name,)
+        ).fetchone()
+        return (int(row[0]), int(row[1])) if row else None
+
+    def _lookup_rows(self, hashes: list[str]) -> dict[str, int]:
+        found: dict[str, int] = {}
+        for chunk in chunked(hashes):
+            placeholders = ",".join("?" * len(chunk))
+            for h, row in self.conn.execute(
+                f"SELECT text_hash, row FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [self.model_name, *chunk],
+            ):
+                found[h] = int(row)
+        return found
+
+    def _append(self, hashes: list[str], vectors: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            shape = self._model_shape()
+            if shape is not None and shape[0] != vectors.shape[1]:
+                raise ValueError(
+                    f"Cached embeddings for {self.model_name} have dim {shape[0]}, got {vectors.shape[1]}."
+                )
+            n_rows = shape[1] if shape else 0
+            with open(self.vectors_path, "r+b" if self.vectors_path.exists() else "wb") as f:
+                f.seek(n_rows * vectors.shape[1] * 4)
+                f.write(vectors.tobytes())
+                f.truncate()
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, row, last_used) VALUES (?, ?, ?, ?)",
+                [(self.model_name, h, n_rows + i, now) for i, h in enumerate(hashes)],
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO embedding_models (model, dim, n_rows) VALUES (?, ?, ?)",
+                (self.model_name, vectors.shape[1], n_rows + len(hashes)),
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def encode(self, texts: list[str], encode_fn: Callable[[list[str]], np.ndarray]) -> np.ndarray:
+        """
+        Return one float32 row per text, calling encode_fn only for texts not yet cached.
+        """
+        if not texts:
+            shape = self._model_shape()
+            return np.zeros((0, shape[0] if shape else 0), dtype=np.float32)
+        hashes = [text_hash(t) for t in texts]
+        unique_hashes = list(dict.fromkeys(hashes))
+        rows = self._lookup_rows(unique_hashes)
+
+        missing = [h for h in unique_hashes if h not in rows]
+        self.hits += len(unique_hashes) - len(missing)
+        self.misses += len(missing)
+        text_by_hash = dict(zip(hashes, texts))
+        fresh: dict[str, np.ndarray] = {}
+        if missing:
+            computed = np.asarray(encode_fn([text_by_hash[h] for h in missing]), dtype=np.float32)
+            fresh.update(zip(missing, computed))
+            self._append(missing, computed)
+
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self._lookup_rows(unique_hashes)
+            evicted = [h for h in unique_hashes if h not in rows and h not in fresh]
+            if evicted:
+                fresh.update(zip(evicted, np.asarray(encode_fn([text_by_hash[h] for h in evicted]), dtype=np.float32)))
+            dim, n_rows = self._model_shape()  # type: ignore[misc]
+            vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(n_rows, dim))
+            result = np.stack([fresh[h] if h not in rows else np.array(vectors[rows[h]]) for h in hashes])
+            del vectors
+            self.conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(time.time(), self.model_name, h) for h in rows],
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        self.evict()
+        return result
+
+    def evict(self) -> int:
+        """
+        Compact the vector file down to the most recently used rows if it exceeds max_bytes.
+        Returns the number of evicted entries.
+        """
+        shape = self._model_shape()
+        if shape is None or shape[0] * shape[1] * 4 <= self.max_bytes:
+            return 0
+
+        self.conn.execute("BEGIN EXCLUSIVE")
+        try:
+            dim, n_rows = self._model_shape()  # type: ignore[misc]
+            keep = max(self.max_bytes // (dim * 4), 0)
+            entries = self.conn.execute(
+                "SELECT text_hash, row, last_used FROM embeddings WHERE model = ? ORDER BY last_used DESC",
+                (self.model_name,),
+            ).fetchall()
+            kept, dropped = entries[:keep], entries[keep:]
+
+            vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(n_rows, dim))
+            compacted = np.array(vectors[[row for _, row, _ in kept]], dtype=np.float32).reshape(-1, dim)
+            del vectors
+            tmp_path = self.vectors_path.with_suffix(".tmp")
+            compacted.tofile(tmp_path)
+            tmp_path.replace(self.vectors_path)
+
+            self.conn.execute("DELETE FROM embeddings WHERE model = ?", (self.model_name,))
+            self.conn.executemany(
+                "INSERT INTO embeddings (model, text_hash, row, last_used) VALUES (?, ?, ?, ?)",
+                [(self.model_name, h, i, last_used) for i, (h, _, last_used) in enumerate(kept)],
+            )
+            self.conn.execute(
+                "UPDATE embedding_models SET n_rows = ? WHERE model = ?", (len(kept), self.model_name)
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return len(dropped)
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class NLIVerdictCache:
+    """
+    Persistent NLI verdicts (label and logits) keyed by (NLI model, input encoding,
+    hash(premise), hash(hypothesis)); the same pair gets different verdicts under
+    different input encodings.
+    """
+
+    def __init__(self, cache_dir: str | Path, model_name: str, input_encoding: str) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.model_name = model_name
+        self.input_encoding = input_encoding
+        self.conn = open_cache_db(self.cache_dir)
+        self.hits = 0
+        self.misses = 0
+
+    def predict(
+        self,
+        pairs: list[tuple[str, str]],
+        predict_fn: Callable[[list[tuple[str, str]]], list[dict]],
+    ) -> list[dict]:
+        """
+        Return one verdict per pair, calling predict_fn once for the distinct uncached pairs.
+        """
+        keys = [(text_hash(a), text_hash(b)) for a, b in pairs]
+        pair_by_key = dict(zip(keys, pairs))
+        unique_keys = list(pair_by_key)
+
+        verdicts: dict[tuple[str, str], dict] = {}
+        for chunk in chunked(unique_keys, SQLITE_MAX_VARIABLES // 2):
+            conditions = " OR ".join("(premise_hash = ? AND hypothesis_hash = ?)" for _ in chunk)
+            params = [h for key in chunk for h in key]
+            for premise_hash, hypothesis_hash, label, logits in self.conn.execute(
+                "SELECT premise_hash, hypothesis_hash, label, logits FROM nli_verdicts "
+                f"WHERE model = ? AND encoding = ? AND ({conditions})",
+                [self.model_name, self.input_encoding, *params],
+            ):
+                verdicts[(premise_hash, hypothesis_hash)] = {"label": label, "logits": json.loads(logits)}
+
+        missing = [key for key in unique_keys if key not in verdicts]
+        self.hits += len(unique_keys) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            computed = predict_fn([pair_by_key[key] for key in missing])
+            verdicts.update(zip(missing, computed))
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO nli_verdicts "
+                    "(model, encoding, premise_hash, hypothesis_hash, label, logits) VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            self.model_name,
+                            self.input_encoding,
+                            key[0],
+                            key[1],
+                            verdict["label"],
+                            json.dumps(verdict["logits"]),
+                        )
+                        for key, verdict in zip(missing, computed)
+                    ],
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+        return [verdicts[key] for key in keys]
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class PromptResultCache:
+    """
+    Stored prompt-level result rows keyed by (metric definition, group fingerprint).
+
+    The fingerprint covers everything a group's metrics are computed from (its
+    responses in order plus the model/condition columns) and the definition covers
+    how they are computed (scorer model names, backends, sampling settings and a
+    version number), so a row is reused only when neither has changed.
+    """
+
+    def __init__(self, cache_dir: str | Path) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.conn = open_cache_db(self.cache_dir)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def definition_hash(definition: dict) -> str:
+        return text_hash(json.dumps(definition, sort_keys=True))
+
+    def get(self, definition: dict, fingerprints: list[str]) -> dict[str, dict]:
+        definition_hash = self.definition_hash(definition)
+        found: dict[str, dict] = {}
+        unique = list(dict.fromkeys(fingerprints))
+        for chunk in chunked(unique):
+            placeholders = ",".join("?" * len(chunk))
+            for fingerprint, result in self.conn.execute(
+                f"SELECT fingerprint, result FROM prompt_results WHERE definition_hash = ? AND fingerprint IN ({placeholders})",
+                [definition_hash, *chunk],
+            ):
+                found[fingerprint] = json.loads(result)
+        self.hits += len(found)
+        self.misses += len(unique) - len(found)
+        return found
+
+    def put(self, definition: dict, results: dict[str, dict]) -> None:
+        definition_hash = self.definition_hash(definition)
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO metric_definitions (definition_hash, definition) VALUES (?, ?)",
+                (definition_hash, json.dumps(definition, sort_keys=True)),
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO prompt_results (definition_hash, fingerprint, result) VALUES (?, ?, ?)",
+                [(definition_hash, fingerprint, json.dumps(result)) for fingerprint, result in results.items()],
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def invalidate_model(cache_dir: str | Path, model_name: str) -> None:
+    """
+    Drop every cached entry produced by model_name.
+    """
+    cache_dir = Path(cache_dir)
+    if not cache_dir.exists():
+        return
+    conn = open_cache_db(cache_dir)
+    try:
+        conn.execute("BEGIN EXCLUSIVE")
+        conn.execute("DELETE FROM embeddings WHERE model = ?", (model_name,))
+        conn.execute("DELETE FROM embedding_models WHERE model = ?", (model_name,))
+        conn.execute("DELETE FROM nli_verdicts WHERE model = ?", (model_name,))
+        stale = [
+            definition_hash
+            for definition_hash, definition in conn.execute("SELECT definition_hash, definition FROM metric_definitions")
+            if model_name in json.loads(definition).get("models", [])
+        ]
+        for definition_hash in stale:
+            conn.execute("DELETE FROM prompt_results WHERE definition_hash = ?", (definition_hash,))
+            conn.execute("DELETE FROM metric_definitions WHERE definition_hash = ?", (definition_hash,))
+        conn.execute("COMMIT")
+        (cache_dir / f"embeddings_{model_slug(model_name)}.f32").unlink(missing_ok=True)
+    finally:
+        conn.close()
@@ -2,17 +2,61 @@ import os
 import glob
 import json
 import argparse
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
 from itertools import combinations
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
-from difflib import SequenceMatcher
-from sentence_transformers import SentenceTransformer, util
-from transformers import pipeline
+
+from analysis_cache import (
+    DEFAULT_CACHE_DIR,
+    DEFAULT_EMBEDDING_CACHE_MAX_MB,
+    EmbeddingCache,
+    NLIVerdictCache,
+    PromptResultCache,
+    invalidate_model,
+    text_hash,
+)
+from columnar_store import build_filters, read_table, write_parquet
+from instrumentation import add_instrumentation_args, drain_stages, merge_stages, run_trace, stage
+from nli_engine import DEFAULT_NLI_BATCH_SIZE, DEFAULT_NLI_INPUT_ENCODING, NLI_INPUT_ENCODINGS, BatchedNLIEngine
+from onnx_scorers import DEFAULT_ONNX_MODEL_DIR, OnnxNLIEngine, OnnxSentenceEncoder
+from pair_sampling import (
+    DEFAULT_CI_LEVEL,
+    DEFAULT_CI_WIDTH,
+    DEFAULT_MIN_SAMPLED_PAIRS,
+    DEFAULT_PAIR_BATCH_SIZE,
+    PairSampler,
+    group_seed,
+)
+from results_store import ingest_paths
+from textual_similarity import DEFAULT_TEXTUAL_BACKEND, TEXTUAL_BACKENDS, get_textual_backend
 
 SEMANTIC_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 NLI_MODEL_NAME = "roberta-large-mnli"
+DEFAULT_SCREEN_NLI_MODEL_NAME = "cross-encoder/nli-distilroberta-base"
+DEFAULT_ESCALATION_BAND = (0.1, 0.9)
+# The screening cross-encoders are trained on pair-encoded inputs, so the screen
+# tier always uses them, whatever encoding the full model is run with.
+SCREEN_NLI_INPUT_ENCODING = "pair"
+IDENTICAL_PAIR_VERDICT = {"label": "ENTAILMENT", "logits": None, "tier": "identical"}
+NLI_TIER_CODES = {"screen": "S", "full": "F", "identical": "I"}
+NLI_LABELS = ("CONTRADICTION", "NEUTRAL", "ENTAILMENT")
+BIDIRECTIONAL_COLUMNS = (
+    "contradiction_rate_reverse",
+    "contradiction_rate_max",
+    "contradiction_rate_mean",
+    "nli_direction_disagreement_rate",
+)
+DEFAULT_EMBEDDING_BATCH_SIZE = 64
+SCORER_BACKENDS = ("torch", "onnx-int8")
+DEFAULT_SCORER_BACKEND = "torch"
+METRIC_DEFINITION_VERSION = 3
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "TOKENIZERS_PARALLELISM")
 
 
 def make_json_serializable(obj):
@@ -34,129 +78,630 @@ def make_json_serializable(obj):
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
-        description="Analyze one experimental condition of the self-reference study."
+        description="Analyze one or more experimental conditions of the self-reference study."
     )
     parser.add_argument(
         "--input_dir",
         type=str,
+        nargs="+",
         required=True,
-        help="Directory containing the CSV outputs for a single run condition.",
+        help="Directory (or directories) containing the Parquet or CSV outputs of one run condition each.",
     )
     parser.add_argument(
         "--output_prefix",
         type=str,
+        nargs="+",
         required=True,
-        help="Prefix for exported analysis files, e.g. analysis_results_temp_0_2.",
+        help="Prefix for exported analysis files, e.g. analysis_results_temp_0_2; one per --input_dir.",
     )
     parser.add_argument(
         "--glob_pattern",
         type=str,
-        default="*.csv",
-        help="Optional glob pattern for input files inside input_dir.",
+        default=None,
+        help="Optional glob pattern for input files inside input_dir. "
+        "Defaults to *.parquet, or *.csv when a directory has no Parquet files.",
+    )
+    parser.add_argument("--models", type=str, nargs="+", default=None, help="Only analyze these models.")
+    parser.add_argument("--temperatures", type=float, nargs="+", default=None, help="Only analyze these temperatures.")
+    parser.add_argument("--categories", type=str, nargs="+", default=None, help="Only analyze these categories.")
+    parser.add_argument(
+        "--export_formats",
+        type=str,
+        nargs="*",
+        choices=["csv", "json"],
+        default=["csv", "json"],
+        help="Formats written next to the Parquet results; pass no value to write Parquet only.",
+    )
+    parser.add_argument(
+        "--embedding_batch_size",
+        type=int,
+        default=DEFAULT_EMBEDDING_BATCH_SIZE,
+        help="Number of responses per Sentence-BERT encoding batch.",
+    )
+    parser.add_argument(
+        "--nli_batch_size",
+        type=int,
+        default=DEFAULT_NLI_BATCH_SIZE,
+        help="Number of premise/hypothesis pairs per NLI forward pass.",
+    )
+    parser.add_argument(
+        "--nli_input_encoding",
+        type=str,
+        choices=NLI_INPUT_ENCODINGS,
+        default=DEFAULT_NLI_INPUT_ENCODING,
+        help="How premise/hypothesis pairs are fed to roberta-large-mnli: pair (the tokenizer's pair encoding) "
+        "or legacy_text (the single text 'a </s> b' the published results were scored with, to reproduce them).",
+    )
+    parser.add_argument(
+        "--textual_backend",
+        type=str,
+        choices=sorted(TEXTUAL_BACKENDS),
+        default=DEFAULT_TEXTUAL_BACKEND,
+        help="Textual similarity measure. sequence_matcher reproduces the published difflib ratios; "
+        "token_jaccard and token_edit are faster token-level approximations.",
+    )
+    parser.add_argument(
+        "--scorer_backend",
+        type=str,
+        choices=SCORER_BACKENDS,
+        default=DEFAULT_SCORER_BACKEND,
+        help="Runtime of the Sentence-BERT and NLI models: fp32 PyTorch (the published results) or "
+        "int8-quantized ONNX exports run by ONNX Runtime. See benchmark_scorer_backends.py for their agreement.",
+    )
+    parser.add_argument(
+        "--nli_cascade",
+        action="store_true",
+        help="Screen every pair with the small --nli_screen_model and escalate only pairs whose contradiction "
+        "probability falls inside --escalation_band to roberta-large-mnli. Prompt rows record which tier "
+        "decided each pair; benchmark_nli_cascade.py measures the agreement with the full model.",
+    )
+    parser.add_argument(
+        "--nli_screen_model",
+        type=str,
+        default=DEFAULT_SCREEN_NLI_MODEL_NAME,
+        help="Hugging Face NLI model of the screening tier of --nli_cascade.",
+    )
+    parser.add_argument(
+        "--escalation_band",
+        type=float,
+        nargs=2,
+        metavar=("LOW", "HIGH"),
+        default=list(DEFAULT_ESCALATION_BAND),
+        help="Screening contradiction probabilities in [LOW, HIGH] are escalated to the full NLI model.",
+    )
+    parser.add_argument(
+        "--bidirectional_nli",
+        action="store_true",
+        help="Score every pair in both directions, (a, b) and (b, a), in the same batched NLI pass. Adds "
+        "contradiction_rate_reverse, _max and _mean and writes a forward/reverse label confusion table per model.",
+    )
+    parser.add_argument(
+        "--onnx_model_dir",
+        type=str,
+        default=DEFAULT_ONNX_MODEL_DIR,
+        help="Folder the ONNX exports are written to on first use and loaded from afterwards.",
+    )
+    parser.add_argument(
+        "--pair_sampling",
+        action="store_true",
+        help="Estimate the all-pairs metrics from a seeded random subset of pairs per prompt, "
+        "stopping once the confidence interval is narrow enough.",
+    )
+    parser.add_argument(
+        "--pair_ci_width",
+        type=float,
+        default=DEFAULT_CI_WIDTH,
+        help="Target full width of the confidence interval for --pair_sampling.",
+    )
+    parser.add_argument(
+        "--ci_level",
+        type=float,
+        default=DEFAULT_CI_LEVEL,
+        help="Confidence level of the --pair_sampling intervals.",
+    )
+    parser.add_argument(
+        "--pair_batch_size",
+        type=int,
+        default=DEFAULT_PAIR_BATCH_SIZE,
+        help="Pairs drawn per prompt and metric between stopping checks.",
+    )
+    parser.add_argument(
+        "--min_sampled_pairs",
+        type=int,
+        default=DEFAULT_MIN_SAMPLED_PAIRS,
+        help="Pairs scored per prompt and metric before the stopping rule applies.",
+    )
+    parser.add_argument(
+        "--max_sampled_pairs",
+        type=int,
+        default=None,
+        help="Pair budget per prompt and metric. Defaults to all pairs.",
+    )
+    parser.add_argument(
+        "--pair_sampling_seed",
+        type=int,
+        default=0,
+        help="Base seed of the pair order; combined with the prompt text.",
     )
+    parser.add_argument(
+        "--results_db",
+        type=str,
+        default=None,
+        help="SQLite results store to ingest the prompt-level results into (see results_store.py).",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=DEFAULT_CACHE_DIR,
+        help="Directory of the persistent embedding and NLI verdict caches.",
+    )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Disable the persistent embedding and NLI verdict caches.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Reuse stored prompt-level rows for response groups whose content and metric "
+        "definitions are unchanged since an earlier run; requires the cache.",
+    )
+    parser.add_argument(
+        "--embedding_cache_max_mb",
+        type=float,
+        default=DEFAULT_EMBEDDING_CACHE_MAX_MB,
+        help="Size bound of the cached vectors per embedding model; least recently used entries are evicted.",
+    )
+    parser.add_argument(
+        "--invalidate_cache",
+        type=str,
+        nargs="+",
+        default=[],
+        metavar="MODEL_NAME",
+        help="Drop all cached entries of the given model name(s) before analyzing.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes; each (condition, model file) pair is one work unit.",
+    )
+    parser.add_argument(
+        "--threads_per_worker",
+        type=int,
+        default=None,
+        help="Intra-op thread cap per worker. Defaults to CPU count divided by --workers when --workers > 1.",
+    )
+    add_instrumentation_args(parser)
     return parser.parse_args()
 
 
-def read_csv_robust(file_path: str) -> pd.DataFrame:
-    encodings = ["utf-8", "utf-8-sig", "cp1252"]
-    last_error = None
-    for enc in encodings:
-        try:
-            return pd.read_csv(file_path, encoding=enc)
-        except UnicodeDecodeError as exc:
-            last_error = exc
-    raise last_error  # type: ignore[misc]
+_scorer_lock = threading.Lock()
+_sbert = None
+_nli_engine: BatchedNLIEngine | None = None
+_screen_nli_engine: BatchedNLIEngine | None = None
+_screen_contradiction_indices: dict[str, int] = {}
+nli_batch_size = DEFAULT_NLI_BATCH_SIZE
+intra_op_threads: int | None = None
+scorer_backend = DEFAULT_SCORER_BACKEND
+onnx_model_dir = DEFAULT_ONNX_MODEL_DIR
+screen_nli_model: str | None = None
+escalation_band = DEFAULT_ESCALATION_BAND
+bidirectional_nli = False
+nli_input_encoding = DEFAULT_NLI_INPUT_ENCODING
+
+
+def apply_thread_limit() -> None:
+    if intra_op_threads is None:
+        return
+    import torch
 
+    torch.set_num_threads(intra_op_threads)
 
-print("Loading Sentence-BERT for semantic similarity...")
-sbert = SentenceTransformer(SEMANTIC_MODEL_NAME)
 
-print("Loading RoBERTa for natural language inference (NLI)...")
-nli = pipeline("text-classification", model=NLI_MODEL_NAME)
+def get_sbert():
+    """
+    Process-wide Sentence-BERT model, loaded on first use.
+    """
+    global _sbert
+    with _scorer_lock:
+        if _sbert is None:
+            print(f"Loading Sentence-BERT for semantic similarity ({scorer_backend})...")
+            with stage("model_load"):
+                if scorer_backend == "onnx-int8":
+                    _sbert = OnnxSentenceEncoder(SEMANTIC_MODEL_NAME, onnx_model_dir, threads=intra_op_threads)
+                else:
+                    from sentence_transformers import SentenceTransformer
+
+                    _sbert = SentenceTransformer(SEMANTIC_MODEL_NAME)
+                    apply_thread_limit()
+    return _sbert
+
+
+def load_nli_engine(model_name: str, input_encoding: str) -> BatchedNLIEngine:
+    with stage("model_load"):
+        if scorer_backend == "onnx-int8":
+            return OnnxNLIEngine(
+                model_name,
+                batch_size=nli_batch_size,
+                model_dir=onnx_model_dir,
+                threads=intra_op_threads,
+                input_encoding=input_encoding,
+            )
+        engine = BatchedNLIEngine(model_name, batch_size=nli_batch_size, input_encoding=input_encoding)
+        apply_thread_limit()
+        return engine
+
+
+def get_nli_engine() -> BatchedNLIEngine:
+    """
+    Process-wide NLI engine, loaded on first use.
+    """
+    global _nli_engine
+    with _scorer_lock:
+        if _nli_engine is None:
+            print(f"Loading RoBERTa for natural language inference (NLI, {scorer_backend})...")
+            _nli_engine = load_nli_engine(NLI_MODEL_NAME, nli_input_encoding)
+    return _nli_engine
+
+
+def get_screen_nli_engine() -> BatchedNLIEngine:
+    """
+    Process-wide NLI engine of the --nli_cascade screening tier, loaded on first
+    use and kept while the screening model stays the same. It always uses
+    SCREEN_NLI_INPUT_ENCODING.
+    """
+    global _screen_nli_engine
+    with _scorer_lock:
+        if _screen_nli_engine is None or _screen_nli_engine.model_name != screen_nli_model:
+            print(f"Loading {screen_nli_model} for NLI screening ({scorer_backend})...")
+            _screen_nli_engine = load_nli_engine(screen_nli_model, SCREEN_NLI_INPUT_ENCODING)
+    return _screen_nli_engine
+
+
+def screen_contradiction_index() -> int:
+    """
+    Logit index of CONTRADICTION in the screening model, read from its config so
+    that fully cached runs do not load the model.
+    """
+    if screen_nli_model not in _screen_contradiction_indices:
+        from transformers import AutoConfig
+
+        labels = {str(label).upper(): int(idx) for idx, label in AutoConfig.from_pretrained(screen_nli_model).id2label.items()}
+        if "CONTRADICTION" not in labels:
+            raise ValueError(f"{screen_nli_model} has no CONTRADICTION label ({sorted(labels)}).")
+        _screen_contradiction_indices[screen_nli_model] = labels["CONTRADICTION"]
+    return _screen_contradiction_indices[screen_nli_model]
+
+
+def scorer_model_name(model_name: str) -> str:
+    """
+    Name the outputs of a scorer model are cached under; quantized backends get
+    their own entries, since their scores differ slightly from fp32.
+    """
+    return model_name if scorer_backend == "torch" else f"{model_name}@{scorer_backend}"
+
+
+embedding_cache: EmbeddingCache | None = None
+nli_cache: NLIVerdictCache | None = None
+screen_nli_cache: NLIVerdictCache | None = None
+result_cache: PromptResultCache | None = None
+nli_stats = {"pairs": 0, "identical": 0, "scored": 0, "screened": 0, "escalated": 0}
+textual_backend = get_textual_backend(DEFAULT_TEXTUAL_BACKEND)
 
 
 def compute_textual_similarity_all_pairs(responses: list[str]) -> float:
-    pairs = list(combinations(responses, 2))
+    pairs = list(combinations(range(len(responses)), 2))
     if not pairs:
         return 0.0
-    scores = [SequenceMatcher(None, a, b).ratio() for a, b in pairs]
+    scores = textual_backend.score_pairs(responses, pairs)
     return float(sum(scores) / len(scores))
 
 
 
-def compute_semantic_similarity_all_pairs(responses: list[str]) -> float:
-    pairs = list(combinations(range(len(responses)), 2))
-    if not pairs:
+def encode_responses(responses: list[str], batch_size: int = DEFAULT_EMBEDDING_BATCH_SIZE) -> np.ndarray:
+    """
+    Encode all responses in one pass and return L2-normalized float32 rows,
+    so cosine similarity reduces to a dot product. No responses give an empty
+    array without loading the model.
+    """
+    if not responses:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    def encode(texts: list[str]) -> np.ndarray:
+        embeddings = get_sbert().encode(
+            texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+        return np.asarray(embeddings, dtype=np.float32)
+
+    if embedding_cache is None:
+        return encode(responses)
+    return embedding_cache.encode(responses, encode)
+
+
+
+def compute_semantic_similarity_all_pairs(embeddings: np.ndarray) -> float:
+    n = len(embeddings)
+    if n < 2:
         return 0.0
-    embeddings = sbert.encode(responses, convert_to_tensor=True)
-    scores = [util.cos_sim(embeddings[i], embeddings[j]).item() for i, j in pairs]
-    return float(sum(scores) / len(scores))
+    scores = embeddings @ embeddings.T
+    upper = np.triu_indices(n, k=1)
+    return float(scores[upper].mean())
+
+
+
+def run_nli(get_engine, cache: NLIVerdictCache | None, pairs: list[tuple[str, str]]) -> list[dict]:
+    if cache is None:
+        return get_engine().predict(pairs)
+    return cache.predict(pairs, lambda todo: get_engine().predict(todo))
+
+
+def predict_nli_cascade(pairs: list[tuple[str, str]]) -> list[dict]:
+    """
+    Screen every pair with the small NLI model (always pair-encoded) and rescore
+    the pairs whose contradiction probability lies in escalation_band with the
+    full model, in its own --nli_input_encoding.
+    """
+    screened = run_nli(get_screen_nli_engine, screen_nli_cache, pairs)
+    index = screen_contradiction_index()
+    low, high = escalation_band
+    uncertain = []
+    for k, verdict in enumerate(screened):
+        logits = np.asarray(verdict["logits"], dtype=np.float64)
+        probabilities = np.exp(logits - logits.max())
+        if low <= probabilities[index] / probabilities.sum() <= high:
+            uncertain.append(k)
+    escalated = run_nli(get_nli_engine, nli_cache, [pairs[k] for k in uncertain])
+    nli_stats["screened"] += len(pairs)
+    nli_stats["escalated"] += len(uncertain)
+
+    verdicts = [dict(verdict, tier="screen") for verdict in screened]
+    for k, verdict in zip(uncertain, escalated):
+        verdicts[k] = dict(verdict, tier="full")
+    return verdicts
+
+
+def predict_nli(pairs: list[tuple[str, str]]) -> list[dict]:
+    """
+    NLI verdict per pair, with the tier that decided it: "full", "screen" (with
+    --nli_cascade) or "identical". Identical strings are never sent to a model and
+    repeated pairs are scored once, through the verdict caches when enabled.
+    """
+    distinct = list(dict.fromkeys(pair for pair in pairs if pair[0] != pair[1]))
+    nli_stats["pairs"] += len(pairs)
+    nli_stats["identical"] += sum(1 for a, b in pairs if a == b)
+    nli_stats["scored"] += len(distinct)
+
+    if screen_nli_model is not None:
+        verdicts = dict(zip(distinct, predict_nli_cascade(distinct)))
+    else:
+        verdicts = {pair: dict(verdict, tier="full") for pair, verdict in zip(distinct, run_nli(get_nli_engine, nli_cache, distinct))}
+    return [IDENTICAL_PAIR_VERDICT if a == b else verdicts[(a, b)] for a, b in pairs]
 
 
 
 def compute_contradiction_rate_all_pairs(responses: list[str]) -> float:
-    contradictions = 0
-    comparisons = 0
-    for a, b in combinations(responses, 2):
-        result = nli(f"{a} </s> {b}")[0]
-        if result["label"] == "CONTRADICTION":
-            contradictions += 1
-        comparisons += 1
-    return (contradictions / comparisons) if comparisons > 0 else 0.0
+    return compute_contradiction_rates([responses])[0]
+
+
+
+def group_nli_verdicts(response_groups: list[list[str]], bidirectional: bool = False) -> list[list[dict]]:
+    """
+    Verdicts of every pair of each group, in combinations order, with the pairs
+    of all groups scored in one NLI pass. With bidirectional, each verdict of
+    (a, b) is followed by that of (b, a). Both directions go through the same
+    pass but are batched independently by token length, which can differ
+    between a pair and its reverse (tokenization at the boundary, truncation),
+    so they need not land in the same batch.
+    """
+    group_pairs = [list(combinations(responses, 2)) for responses in response_groups]
+    if bidirectional:
+        group_pairs = [[pair for a, b in pairs for pair in ((a, b), (b, a))] for pairs in group_pairs]
+    verdicts = predict_nli([pair for pairs in group_pairs for pair in pairs])
+
+    grouped: list[list[dict]] = []
+    offset = 0
+    for pairs in group_pairs:
+        grouped.append(verdicts[offset : offset + len(pairs)])
+        offset += len(pairs)
+    return grouped
+
+
+def contradiction_rate(verdicts: list[dict]) -> float:
+    contradictions = sum(1 for v in verdicts if v["label"] == "CONTRADICTION")
+    return (contradictions / len(verdicts)) if verdicts else 0.0
+
+
+def directional_contradiction_rates(verdicts: list[dict]) -> dict[str, float]:
+    """
+    Contradiction rates of the interleaved (a, b), (b, a) verdicts of one group.
+    A pair counts towards the max rate if either direction is a contradiction.
+    """
+    forward = np.array([v["label"] == "CONTRADICTION" for v in verdicts[0::2]], dtype=bool)
+    reverse = np.array([v["label"] == "CONTRADICTION" for v in verdicts[1::2]], dtype=bool)
+    if not forward.size:
+        return {"contradiction_rate": 0.0, **{metric: 0.0 for metric in BIDIRECTIONAL_COLUMNS[:3]}}
+    return {
+        "contradiction_rate": float(forward.mean()),
+        "contradiction_rate_reverse": float(reverse.mean()),
+        "contradiction_rate_max": float((forward | reverse).mean()),
+        "contradiction_rate_mean": float((forward.mean() + reverse.mean()) / 2),
+    }
+
+
+def compute_contradiction_rates(response_groups: list[list[str]]) -> list[float]:
+    """
+    Contradiction rate for each group, with the pairs of all groups scored in one NLI pass.
+    """
+    return [contradiction_rate(verdicts) for verdicts in group_nli_verdicts(response_groups)]
 
 
 
 def compute_diachronic_textual_similarity(responses: list[str]) -> float:
     if len(responses) <= 1:
         return 0.0
-    base = responses[0]
-    scores = [SequenceMatcher(None, base, r).ratio() for r in responses[1:]]
+    pairs = [(0, j) for j in range(1, len(responses))]
+    scores = textual_backend.score_pairs(responses, pairs)
     return float(sum(scores) / len(scores))
 
 
 
-def compute_diachronic_semantic_similarity(responses: list[str]) -> float:
-    if len(responses) <= 1:
+def compute_diachronic_semantic_similarity(embeddings: np.ndarray) -> float:
+    if len(embeddings) <= 1:
         return 0.0
-    embeddings = sbert.encode(responses, convert_to_tensor=True)
-    base = embeddings[0]
-    scores = [util.cos_sim(base, emb).item() for emb in embeddings[1:]]
-    return float(sum(scores) / len(scores))
+    scores = embeddings[1:] @ embeddings[0]
+    return float(scores.mean())
 
 
 
-def analyze_model_file(file_path: str) -> list[dict]:
-    df = read_csv_robust(file_path)
-    required_cols = {"model", "category", "prompt", "response"}
-    missing = required_cols.difference(df.columns)
-    if missing:
-        raise ValueError(f"Missing required columns in {file_path}: {sorted(missing)}")
+def estimate_pair_metrics(
+    prompts: list[str],
+    response_groups: list[list[str]],
+    embedding_groups: list[np.ndarray],
+    pair_sampling: dict,
+) -> list[dict]:
+    """
+    Sampled estimates with confidence intervals of the three all-pairs metrics
+    per prompt. Every metric of a prompt draws from the same pair order; the NLI
+    batches of all prompts still sampling are scored together in each round.
+    """
+    options = {key: value for key, value in pair_sampling.items() if key != "seed"}
+    estimates: list[dict] = []
+    nli_samplers: list[PairSampler] = []
+
+    for prompt, responses, embeddings in zip(prompts, response_groups, embedding_groups):
+        seed = group_seed(pair_sampling["seed"], prompt)
+
+        textual = PairSampler(len(responses), seed, **options)
+        while not textual.done():
+            textual.add(textual_backend.score_pairs(responses, textual.next_batch()))
+
+        semantic = PairSampler(len(responses), seed, **options)
+        while not semantic.done():
+            first, second = zip(*semantic.next_batch())
+            semantic.add(np.einsum("ij,ij->i", embeddings[list(first)], embeddings[list(second)]).tolist())
+
+        estimate = {"pairs_total": textual.total, "pair_budget": textual.budget}
+        estimate.update(textual.result("textual_similarity"))
+        estimate.update(semantic.result("semantic_similarity"))
+        estimates.append(estimate)
+        nli_samplers.append(PairSampler(len(responses), seed, binary=True, **options))
+
+    while True:
+        rounds = [
+            (sampler, responses, sampler.next_batch())
+            for sampler, responses in zip(nli_samplers, response_groups)
+            if not sampler.done()
+        ]
+        if not rounds:
+            break
+        verdicts = predict_nli([(responses[i], responses[j]) for _, responses, batch in rounds for i, j in batch])
+        offset = 0
+        for sampler, _, batch in rounds:
+            labels = [v["label"] for v in verdicts[offset : offset + len(batch)]]
+            offset += len(batch)
+            sampler.add([1.0 if label == "CONTRADICTION" else 0.0 for label in labels])
+
+    for estimate, sampler in zip(estimates, nli_samplers):
+        estimate.update(sampler.result("contradiction_rate"))
+    return estimates
+
+
+
+def group_metadata(prompt: str, group: pd.DataFrame) -> dict:
+    return {
+        "model": group["model"].iloc[0],
+        "category": group["category"].iloc[0],
+        "prompt": prompt,
+        "temperature": group["temperature"].iloc[0] if "temperature" in group.columns else None,
+        "top_p": group["top_p"].iloc[0] if "top_p" in group.columns else None,
+        "max_tokens": group["max_tokens"].iloc[0] if "max_tokens" in group.columns else None,
+    }
+
+
+
+def group_fingerprint(metadata: dict, responses: list[str]) -> str:
+    return text_hash(json.dumps(make_json_serializable([metadata, responses]), ensure_ascii=False))
+
+
+
+def metric_definition(pair_sampling: dict | None) -> dict:
+    """
+    Everything besides the responses that the prompt-level metrics depend on.
+    Bump METRIC_DEFINITION_VERSION whenever a metric's computation changes.
+    """
+    definition = {
+        "version": METRIC_DEFINITION_VERSION,
+        "models": [scorer_model_name(SEMANTIC_MODEL_NAME), scorer_model_name(NLI_MODEL_NAME)],
+        "nli_input_encoding": nli_input_encoding,
+        "textual_backend": textual_backend.name,
+        "pair_sampling": pair_sampling,
+    }
+    if screen_nli_model is not None:
+        # Listed under "models" too, so that invalidating the screening model drops these rows.
+        definition["models"].append(scorer_model_name(screen_nli_model))
+        definition["nli_cascade"] = {
+            "screen_model": scorer_model_name(screen_nli_model),
+            "screen_input_encoding": SCREEN_NLI_INPUT_ENCODING,
+            "band": list(escalation_band),
+        }
+    if bidirectional_nli:
+        definition["nli_bidirectional"] = True
+    return definition
 
-    grouped = df.groupby("prompt", sort=False)
+
+
+def compute_group_results(
+    df: pd.DataFrame,
+    grouped: list[tuple[str, pd.DataFrame]],
+    embedding_batch_size: int,
+    pair_sampling: dict | None,
+) -> list[dict]:
+    """
+    Prompt-level result rows for the given groups of df.
+    """
+    response_groups = [group["response"].astype(str).tolist() for _, group in grouped]
+    group_positions = [df.index.get_indexer(group.index) for _, group in grouped]
+    positions = np.sort(np.concatenate(group_positions)) if grouped else np.zeros(0, dtype=np.int64)
+    with stage("embedding"):
+        embeddings = encode_responses(df["response"].astype(str).iloc[positions].tolist(), batch_size=embedding_batch_size)
+    embedding_groups = [embeddings[np.searchsorted(positions, group)] for group in group_positions]
+    if pair_sampling is None:
+        with stage("nli"):
+            group_verdicts: list[list[dict] | None] = group_nli_verdicts(response_groups, bidirectional_nli)
+        if bidirectional_nli:
+            directional = [directional_contradiction_rates(verdicts) for verdicts in group_verdicts]
+            contradiction_rates = [rates["contradiction_rate"] for rates in directional]
+        else:
+            contradiction_rates = [contradiction_rate(verdicts) for verdicts in group_verdicts]
+        estimates: list[dict | None] = [None] * len(grouped)
+    else:
+        prompts = [prompt for prompt, _ in grouped]
+        with stage("pair_sampling"):
+            estimates = estimate_pair_metrics(prompts, response_groups, embedding_groups, pair_sampling)
+        contradiction_rates = [estimate["contradiction_rate"] for estimate in estimates]
+        group_verdicts = [None] * len(grouped)
     results: list[dict] = []
 
-    for prompt, group in grouped:
-        responses = group["response"].astype(str).tolist()
-        model = group["model"].iloc[0]
-        category = group["category"].iloc[0]
-        temperature = group["temperature"].iloc[0] if "temperature" in group.columns else None
-        top_p = group["top_p"].iloc[0] if "top_p" in group.columns else None
-        max_tokens = group["max_tokens"].iloc[0] if "max_tokens" in group.columns else None
-
-        textual = compute_textual_similarity_all_pairs(responses)
-        semantic = compute_semantic_similarity_all_pairs(responses)
-        contradiction = compute_contradiction_rate_all_pairs(responses)
-        dia_textual = compute_diachronic_textual_similarity(responses)
-        dia_semantic = compute_diachronic_semantic_similarity(responses)
-
-        results.append(
+    for (prompt, group), responses, contradiction, group_embeddings, estimate, verdicts in zip(
+        grouped, response_groups, contradiction_rates, embedding_groups, estimates, group_verdicts
+    ):
+        with stage("similarity"):
+            if estimate is None:
+                textual = compute_textual_similarity_all_pairs(responses)
+                semantic = compute_semantic_similarity_all_pairs(group_embeddings)
+            else:
+                textual = estimate["textual_similarity"]
+                semantic = estimate["semantic_similarity"]
+            dia_textual = compute_diachronic_textual_similarity(responses)
+            dia_semantic = compute_diachronic_semantic_similarity(group_embeddings)
+
+        row = group_metadata(prompt, group)
+        row.update(
             {
-                "model": model,
-                "category": category,
-                "prompt": prompt,
-                "temperature": temperature,
-                "top_p": top_p,
-                "max_tokens": max_tokens,
                 "textual_similarity": round(textual, 4),
                 "semantic_similarity": round(semantic, 4),
                 "contradiction_rate": round(contradiction, 4),
@@ -165,11 +710,73 @@ def analyze_model_file(file_path: str) -> list[dict]:
                 "diachronic_semantic_similarity": round(dia_semantic, 4),
             }
         )
+        if estimate is not None:
+            for metric in ("textual_similarity", "semantic_similarity", "contradiction_rate"):
+                row[f"{metric}_ci_low"] = round(estimate[f"{metric}_ci_low"], 4)
+                row[f"{metric}_ci_high"] = round(estimate[f"{metric}_ci_high"], 4)
+                row[f"{metric}_pairs_scored"] = estimate[f"{metric}_pairs_scored"]
+            row["pairs_total"] = estimate["pairs_total"]
+            row["pair_budget"] = estimate["pair_budget"]
+            row["ci_target_width"] = pair_sampling["ci_width"]
+            row["ci_level"] = pair_sampling["ci_level"]
+        if screen_nli_model is not None and verdicts is not None:
+            row["nli_pairs_escalated"] = sum(1 for v in verdicts if v["tier"] == "full")
+            row["nli_pair_tiers"] = "".join(NLI_TIER_CODES[v["tier"]] for v in verdicts)
+        if bidirectional_nli and verdicts is not None:
+            rates = directional_contradiction_rates(verdicts)
+            for metric in BIDIRECTIONAL_COLUMNS[:3]:
+                row[metric] = round(rates[metric], 4)
+            pairs = len(verdicts) // 2
+            disagreements = sum(1 for k in range(pairs) if verdicts[2 * k]["label"] != verdicts[2 * k + 1]["label"])
+            row["nli_direction_disagreement_rate"] = round(disagreements / pairs, 4) if pairs else 0.0
+            row["nli_direction_labels"] = "".join(v["label"][0] for v in verdicts)
+        results.append(row)
 
     return results
 
 
 
+def analyze_model_file(
+    file_path: str,
+    embedding_batch_size: int = DEFAULT_EMBEDDING_BATCH_SIZE,
+    pair_sampling: dict | None = None,
+    filters: list[tuple] | None = None,
+) -> list[dict]:
+    """
+    Prompt-level results of one output file. With the prompt result cache enabled,
+    only groups whose fingerprint or metric definition changed are recomputed.
+    """
+    with stage("load"):
+        df = read_table(file_path, filters=filters)
+    required_cols = {"model", "category", "prompt", "response"}
+    missing = required_cols.difference(df.columns)
+    if missing:
+        raise ValueError(f"Missing required columns in {file_path}: {sorted(missing)}")
+    if df.empty:
+        return []
+
+    grouped = list(df.groupby("prompt", sort=False))
+    if result_cache is None:
+        return compute_group_results(df, grouped, embedding_batch_size, pair_sampling)
+
+    definition = metric_definition(pair_sampling)
+    fingerprints = [
+        group_fingerprint(group_metadata(prompt, group), group["response"].astype(str).tolist())
+        for prompt, group in grouped
+    ]
+    stored = result_cache.get(definition, fingerprints)
+    todo = [k for k, fingerprint in enumerate(fingerprints) if fingerprint not in stored]
+    fresh = []
+    if todo:
+        fresh = compute_group_results(df, [grouped[k] for k in todo], embedding_batch_size, pair_sampling)
+    if fresh:
+        computed = {fingerprints[k]: make_json_serializable(row) for k, row in zip(todo, fresh)}
+        result_cache.put(definition, computed)
+        stored.update(computed)
+    return [stored[fingerprint] for fingerprint in fingerprints]
+
+
+
 def build_model_summary(df_results: pd.DataFrame) -> pd.DataFrame:
     numeric_cols = [
         "textual_similarity",
@@ -179,6 +786,7 @@ def build_model_summary(df_results: pd.DataFrame) -> pd.DataFrame:
         "diachronic_textual_similarity",
         "diachronic_semantic_similarity",
     ]
+    numeric_cols += [col for col in BIDIRECTIONAL_COLUMNS if col in df_results.columns]
     summary = (
         df_results.groupby(["model", "temperature", "top_p"], dropna=False)[numeric_cols]
         .mean()
@@ -188,48 +796,304 @@ def build_model_summary(df_results: pd.DataFrame) -> pd.DataFrame:
     return summary
 
 
+def build_direction_confusion(df_results: pd.DataFrame) -> pd.DataFrame:
+    """
+    Forward (a, b) against reverse (b, a) NLI labels per model, counted from the
+    nli_direction_labels of --bidirectional_nli, with each cell's share of the pairs.
+    """
+    keys = ["model", "temperature", "top_p"]
+    rows = []
+    for key, group in df_results.groupby(keys, dropna=False, sort=True):
+        counts: Counter = Counter()
+        for labels in group["nli_direction_labels"]:
+            counts.update(zip(labels[0::2], labels[1::2]))
+        pairs = sum(counts.values())
+        for forward in NLI_LABELS:
+            for reverse in NLI_LABELS:
+                count = counts[(forward[0], reverse[0])]
+                rows.append(
+                    {
+                        **dict(zip(keys, key)),
+                        "forward_label": forward,
+                        "reverse_label": reverse,
+                        "pairs": count,
+                        "fraction": round(count / pairs, 4) if pairs else 0.0,
+                    }
+                )
+    return pd.DataFrame(rows)
+
+
+
+def configure_scorers(
+    cache_dir: str | None,
+    embedding_cache_max_mb: float,
+    batch_size: int,
+    threads: int | None,
+    textual_backend_name: str = DEFAULT_TEXTUAL_BACKEND,
+    incremental: bool = False,
+    scorer_backend_name: str = DEFAULT_SCORER_BACKEND,
+    onnx_dir: str = DEFAULT_ONNX_MODEL_DIR,
+    nli_screen_model: str | None = None,
+    nli_escalation_band: tuple[float, float] = DEFAULT_ESCALATION_BAND,
+    bidirectional: bool = False,
+    nli_encoding: str = DEFAULT_NLI_INPUT_ENCODING,
+) -> None:
+    """
+    Set up the scorer configuration and caches of the current process.
+    Also used as the process-pool initializer, so each worker loads its own scorers once.
+    Switching the scorer backend drops scorers already loaded with the other one.
+    nli_screen_model enables the NLI cascade with that screening model, and
+    bidirectional scores every NLI pair in both directions. nli_encoding is the
+    input encoding of the full NLI model.
+    """
+    global embedding_cache, nli_cache, screen_nli_cache, result_cache, nli_batch_size, intra_op_threads, textual_backend
+    global scorer_backend, onnx_model_dir, screen_nli_model, escalation_band, bidirectional_nli, nli_input_encoding
+    global _sbert, _nli_engine, _screen_nli_engine
+
+    if scorer_backend_name not in SCORER_BACKENDS:
+        raise ValueError(f"Unknown scorer backend '{scorer_backend_name}'. Available: {list(SCORER_BACKENDS)}")
+    low, high = nli_escalation_band
+    if not 0.0 <= low <= high <= 1.0:
+        raise ValueError(f"The escalation band must satisfy 0 <= LOW <= HIGH <= 1, got {list(nli_escalation_band)}.")
+    if nli_encoding not in NLI_INPUT_ENCODINGS:
+        raise ValueError(f"Unknown NLI input encoding '{nli_encoding}'. Available: {list(NLI_INPUT_ENCODINGS)}")
+    if scorer_backend_name != scorer_backend:
+        _sbert = _nli_engine = _screen_nli_engine = None
+    if nli_encoding != nli_input_encoding:
+        _nli_engine = None
+    scorer_backend = scorer_backend_name
+    onnx_model_dir = onnx_dir
+    screen_nli_model = nli_screen_model
+    escalation_band = (low, high)
+    bidirectional_nli = bidirectional
+    nli_input_encoding = nli_encoding
+    textual_backend = get_textual_backend(textual_backend_name)
+    nli_batch_size = batch_size
+    intra_op_threads = threads
+    if threads is not None:
+        for var in THREAD_ENV_VARS:
+            os.environ[var] = "false" if var == "TOKENIZERS_PARALLELISM" else str(threads)
+    if cache_dir is not None:
+        embedding_cache = EmbeddingCache(
+            cache_dir,
+            scorer_model_name(SEMANTIC_MODEL_NAME),
+            max_bytes=int(embedding_cache_max_mb * 2**20),
+        )
+        nli_cache = NLIVerdictCache(cache_dir, scorer_model_name(NLI_MODEL_NAME), nli_encoding)
+        screen_nli_cache = (
+            NLIVerdictCache(cache_dir, scorer_model_name(nli_screen_model), SCREEN_NLI_INPUT_ENCODING)
+            if nli_screen_model
+            else None
+        )
+        if incremental:
+            result_cache = PromptResultCache(cache_dir)
 
-def main() -> None:
-    args = parse_args()
-    input_dir = Path(args.input_dir)
-    if not input_dir.exists():
-        raise FileNotFoundError(f"Input directory not found: {input_dir}")
 
-    all_results: list[dict] = []
-    files = sorted(glob.glob(str(input_dir / args.glob_pattern)))
-    if not files:
-        raise FileNotFoundError(f"No files found in {input_dir} matching {args.glob_pattern}")
 
-    for file in files:
-        print(f"Analyzing file: {file}")
-        all_results.extend(analyze_model_file(file))
+def scorer_counters() -> dict[str, int]:
+    counters = {f"nli_{key}": value for key, value in nli_stats.items()}
+    if embedding_cache is not None:
+        counters["embedding_cache_hits"] = embedding_cache.hits
+        counters["embedding_cache_misses"] = embedding_cache.misses
+    if nli_cache is not None:
+        counters["nli_cache_hits"] = nli_cache.hits
+        counters["nli_cache_misses"] = nli_cache.misses
+    if screen_nli_cache is not None:
+        counters["screen_nli_cache_hits"] = screen_nli_cache.hits
+        counters["screen_nli_cache_misses"] = screen_nli_cache.misses
+    if result_cache is not None:
+        counters["prompt_results_reused"] = result_cache.hits
+        counters["prompt_results_computed"] = result_cache.misses
+    return counters
 
+
+
+def analyze_work_unit(
+    file_path: str,
+    embedding_batch_size: int,
+    pair_sampling: dict | None = None,
+    filters: list[tuple] | None = None,
+) -> tuple[list[dict], dict[str, int], dict[str, dict]]:
+    """
+    Results, scorer counter deltas and stage timings of one file, so that workers
+    can report all three back to the parent process.
+    """
+    before = scorer_counters()
+    print(f"Analyzing file: {file_path}")
+    results = analyze_model_file(
+        file_path,
+        embedding_batch_size=embedding_batch_size,
+        pair_sampling=pair_sampling,
+        filters=filters,
+    )
+    after = scorer_counters()
+    return results, {key: value - before.get(key, 0) for key, value in after.items()}, drain_stages()
+
+
+
+def write_condition_outputs(all_results: list[dict], output_prefix: Path, export_formats: list[str]) -> None:
+    if not all_results:
+        print(f"Warning: no rows left to analyze for {output_prefix}; nothing written.")
+        return
     df_results = pd.DataFrame(all_results)
-    output_prefix = Path(args.output_prefix)
+    df_summary = build_model_summary(df_results)
     output_prefix.parent.mkdir(parents=True, exist_ok=True)
+    summary_prefix = output_prefix.parent / f"{output_prefix.stem}_model_summary"
 
-    csv_path = output_prefix.with_suffix(".csv")
-    json_path = output_prefix.with_suffix(".json")
-    summary_csv_path = output_prefix.parent / f"{output_prefix.stem}_model_summary.csv"
-    summary_json_path = output_prefix.parent / f"{output_prefix.stem}_model_summary.json"
+    tables = [
+        (output_prefix, df_results, all_results, "prompt-level results"),
+        (summary_prefix, df_summary, df_summary.to_dict(orient="records"), "model-level summary"),
+    ]
+    if "nli_direction_labels" in df_results.columns:
+        df_confusion = build_direction_confusion(df_results)
+        tables.append(
+            (
+                output_prefix.parent / f"{output_prefix.stem}_nli_direction_confusion",
+                df_confusion,
+                df_confusion.to_dict(orient="records"),
+                "NLI direction confusion",
+            )
+        )
+        pairs = int(df_confusion["pairs"].sum())
+        if pairs:
+            differing = df_confusion[df_confusion["forward_label"] != df_confusion["reverse_label"]]
+            one_way = differing[(differing["forward_label"] == "CONTRADICTION") | (differing["reverse_label"] == "CONTRADICTION")]
+            print(
+                f"NLI directions of {output_prefix.stem}: labels differ on {differing['pairs'].sum()} of {pairs} pairs "
+                f"({differing['pairs'].sum() / pairs:.1%}), a contradiction in one direction only on "
+                f"{one_way['pairs'].sum()} ({one_way['pairs'].sum() / pairs:.1%})"
+            )
+    for prefix, df, records, label in tables:
+        paths = [prefix.with_suffix(".parquet")]
+        write_parquet(df, paths[0])
+        if "csv" in export_formats:
+            paths.append(prefix.with_suffix(".csv"))
+            df.to_csv(paths[-1], index=False, encoding="utf-8")
+        if "json" in export_formats:
+            paths.append(prefix.with_suffix(".json"))
+            with open(paths[-1], "w", encoding="utf-8") as f:
+                json.dump(make_json_serializable(records), f, indent=2, ensure_ascii=False)
+        print(f"Saved {label} to: {', '.join(str(path) for path in paths)}")
 
-    df_results.to_csv(csv_path, index=False, encoding="utf-8")
 
-    json_ready_results = make_json_serializable(all_results)
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(json_ready_results, f, indent=2, ensure_ascii=False)
 
-    df_summary = build_model_summary(df_results)
-    df_summary.to_csv(summary_csv_path, index=False, encoding="utf-8")
+def main() -> None:
+    args = parse_args()
+    with run_trace("analyze_results_adjusted", args):
+        if len(args.input_dir) != len(args.output_prefix):
+            raise ValueError("--input_dir and --output_prefix must be given the same number of times.")
+        if args.incremental and args.no_cache:
+            raise ValueError("--incremental stores its prompt-level rows in the cache and cannot be combined with --no_cache.")
+        if args.bidirectional_nli and args.pair_sampling:
+            raise ValueError("--bidirectional_nli scores all pairs and cannot be combined with --pair_sampling.")
+
+        conditions: list[tuple[Path, list[str]]] = []
+        for input_dir_arg, output_prefix_arg in zip(args.input_dir, args.output_prefix):
+            input_dir = Path(input_dir_arg)
+            if not input_dir.exists():
+                raise FileNotFoundError(f"Input directory not found: {input_dir}")
+            glob_pattern = args.glob_pattern
+            if glob_pattern is None:
+                glob_pattern = "*.parquet" if any(input_dir.glob("*.parquet")) else "*.csv"
+            files = sorted(glob.glob(str(input_dir / glob_pattern)))
+            if not files:
+                raise FileNotFoundError(f"No files found in {input_dir} matching {glob_pattern}")
+            conditions.append((Path(output_prefix_arg), files))
+
+        for model_name in args.invalidate_cache:
+            invalidate_model(args.cache_dir, model_name)
+            print(f"Invalidated cached entries for: {model_name}")
+
+        threads = args.threads_per_worker
+        if threads is None and args.workers > 1:
+            threads = max(1, (os.cpu_count() or 1) // args.workers)
+        init_scorers = partial(
+            configure_scorers,
+            cache_dir=None if args.no_cache else args.cache_dir,
+            embedding_cache_max_mb=args.embedding_cache_max_mb,
+            batch_size=args.nli_batch_size,
+            threads=threads,
+            textual_backend_name=args.textual_backend,
+            incremental=args.incremental,
+            scorer_backend_name=args.scorer_backend,
+            onnx_dir=args.onnx_model_dir,
+            nli_screen_model=args.nli_screen_model if args.nli_cascade else None,
+            nli_escalation_band=tuple(args.escalation_band),
+            bidirectional=args.bidirectional_nli,
+            nli_encoding=args.nli_input_encoding,
+        )
 
-    json_ready_summary = make_json_serializable(df_summary.to_dict(orient="records"))
-    with open(summary_json_path, "w", encoding="utf-8") as f:
-        json.dump(json_ready_summary, f, indent=2, ensure_ascii=False)
+        filters = build_filters(args.models, args.temperatures, args.categories)
+        pair_sampling = None
+        if args.pair_sampling:
+            pair_sampling = {
+                "seed": args.pair_sampling_seed,
+                "batch_size": args.pair_batch_size,
+                "min_pairs": args.min_sampled_pairs,
+                "max_pairs": args.max_sampled_pairs,
+                "ci_width": args.pair_ci_width,
+                "ci_level": args.ci_level,
+            }
+
+        work_units = [(idx, file) for idx, (_, files) in enumerate(conditions) for file in files]
+        unit_results: dict[tuple[int, str], list[dict]] = {}
+        totals: Counter = Counter()
+
+        if args.workers <= 1:
+            init_scorers()
+            for unit in work_units:
+                results, counters, stages = analyze_work_unit(unit[1], args.embedding_batch_size, pair_sampling, filters)
+                unit_results[unit] = results
+                totals.update(counters)
+                merge_stages(stages)
+        else:
+            print(f"Analyzing {len(work_units)} files with {args.workers} workers x {threads} threads.")
+            with ProcessPoolExecutor(max_workers=args.workers, initializer=init_scorers) as pool:
+                futures = {
+                    pool.submit(analyze_work_unit, unit[1], args.embedding_batch_size, pair_sampling, filters): unit for unit in work_units
+                }
+                for future in as_completed(futures):
+                    results, counters, stages = future.result()
+                    unit_results[futures[future]] = results
+                    totals.update(counters)
+                    merge_stages(stages)
 
-    print("Analysis completed.")
-    print(f"Saved prompt-level results to: {csv_path} and {json_path}")
-    print(f"Saved model-level summary to: {summary_csv_path} and {summary_json_path}")
+        for idx, (output_prefix, files) in enumerate(conditions):
+            all_results = [row for file in files for row in unit_results[(idx, file)]]
+            with stage("aggregation"):
+                write_condition_outputs(all_results, output_prefix, args.export_formats)
+                if args.results_db is not None and all_results:
+                    ingest_paths(args.results_db, [str(output_prefix.with_suffix(".parquet"))])
+
+        print(f"Analysis completed (textual backend: {args.textual_backend}, scorer backend: {args.scorer_backend}).")
+        if "embedding_cache_hits" in totals:
+            print(
+                f"Embedding cache: {totals['embedding_cache_hits']} hits, "
+                f"{totals['embedding_cache_misses']} misses ({args.cache_dir})"
+            )
+        print(
+            f"NLI pairs: {totals['nli_pairs']} total, {totals['nli_identical']} identical (skipped), "
+            f"{totals['nli_scored']} distinct after deduplication"
+        )
+        if args.nli_cascade and totals["nli_screened"]:
+            print(
+                f"NLI cascade: {totals['nli_screened']} pairs screened by {args.nli_screen_model}, "
+                f"{totals['nli_escalated']} escalated to {NLI_MODEL_NAME} "
+                f"({totals['nli_escalated'] / totals['nli_screened']:.1%}, band {args.escalation_band})"
+            )
+        if "nli_cache_hits" in totals:
+            print(f"NLI verdict cache: {totals['nli_cache_hits']} hits, {totals['nli_cache_misses']} misses ({args.cache_dir})")
+        if "screen_nli_cache_hits" in totals:
+            print(
+                f"Screening NLI verdict cache: {totals['screen_nli_cache_hits']} hits, "
+                f"{totals['screen_nli_cache_misses']} misses ({args.cache_dir})"
+            )
+        if "prompt_results_reused" in totals:
+            print(
+                f"Incremental analysis: {totals['prompt_results_reused']} prompt groups reused, "
+                f"{totals['prompt_results_computed']} recomputed"
+            )
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
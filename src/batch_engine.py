@@ -0,0 +1,307 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+import llama_cpp
+
+DEFAULT_TOP_K = 40
+DEFAULT_MIN_P = 0.05
+DEFAULT_REPEAT_PENALTY = 1.1
+DEFAULT_PENALTY_LAST_N = 64
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = np.exp(logits - logits.max())
+    return shifted / shifted.sum()
+
+
+def sample_token(
+    logits: np.ndarray,
+    penalty_tokens: list[int],
+    temperature: float,
+    top_p: float,
+    rng: np.random.Generator,
+    top_k: int = DEFAULT_TOP_K,
+    min_p: float = DEFAULT_MIN_P,
+    repeat_penalty: float = DEFAULT_REPEAT_PENALTY,
+) -> int:
+    """
+    Numpy port of the sampler chain Llama.generate() runs with its default settings:
+    repetition penalty, top-k, top-p, min-p, temperature, then a draw from the
+    remaining distribution (tail-free and typical sampling are no-ops at their defaults).
+    """
+    logits = logits.astype(np.float64)
+    if penalty_tokens and repeat_penalty != 1.0:
+        ids = np.unique(penalty_tokens)
+        values = logits[ids]
+        logits[ids] = np.where(values <= 0, values * repeat_penalty, values / repeat_penalty)
+    if temperature <= 0:
+        return int(np.argmax(logits))
+
+    k = top_k if 0 < top_k < logits.size else logits.size
+    candidates = np.argpartition(-logits, k - 1)[:k]
+    candidates = candidates[np.argsort(-logits[candidates], kind="stable")]
+    values = logits[candidates]
+
+    if top_p < 1.0:
+        cumulative = np.cumsum(softmax(values))
+        keep = int(np.argmax(cumulative >= top_p)) + 1 if cumulative[-1] >= top_p else values.size
+        candidates, values = candidates[:keep], values[:keep]
+    if min_p > 0.0:
+        probs = softmax(values)
+        keep = max(int(np.count_nonzero(probs >= min_p * probs[0])), 1)
+        candidates, values = candidates[:keep], values[:keep]
+
+    probs = softmax(values / temperature)
+    return int(candidates[rng.choice(candidates.size, p=probs)])
+
+
+class _Sequence:
+    def __init__(self, request: dict, seq_id: int, prompt_tokens: list[int]) -> None:
+        self.request = request
+        self.seq_id = seq_id
+        self.prompt_tokens = prompt_tokens
+        self.completion: list[int] = []
+        self.rng = np.random.default_rng(request["seed"])
+        self.next_token: int | None = None
+        self.pos = 0
+        self.logits_index = -1
+        self.prompt_eval_ms = 0.0
+        self.decode_ms = 0.0
+        self.admitted_at = time.perf_counter()
+
+
+class BatchedGenerator:
+    """
+    Continuous batching over one loaded llama-cpp-python model.
+
+    Requests are queued with submit() and return a Future of (text, stats), with
+    the stats PromptPrefix.complete() reports plus generation_ms, the time from
+    admission into the batch to the last token. A background thread owns the llama.cpp context: it keeps up to
+    n_parallel sequences in the KV cache, each under its own sequence id, and
+    every llama_decode call carries the next token of every running sequence
+    plus the prompts of newly admitted ones. A finished sequence frees its KV
+    cells and its slot is refilled on the next step, so the batch stays full
+    while requests are waiting.
+
+    The context is split evenly between the slots, so the model should be loaded
+    with n_ctx = n_parallel x (prompt + max_tokens) or more. Sampling reproduces
+    Llama.generate()'s default sampler settings with a per-request numpy RNG, so
+    completions follow the same distribution as the sequential path but are not
+    token-identical to it. Prompt-eval and decode ms are the durations of the
+    shared llama_decode calls the sequence took part in, so they overlap between
+    sequences and are not additive. The repetition penalty covers the first
+    penalty_last_n evaluated tokens, which is what llama-cpp-python 0.2.57 passes
+    to llama.cpp, rather than the last ones.
+    """
+
+    def __init__(
+        self,
+        model: llama_cpp.Llama,
+        n_parallel: int,
+        top_k: int = DEFAULT_TOP_K,
+        min_p: float = DEFAULT_MIN_P,
+        repeat_penalty: float = DEFAULT_REPEAT_PENALTY,
+        penalty_last_n: int = DEFAULT_PENALTY_LAST_N,
+    ) -> None:
+        self.model = model
+        self.ctx = model._ctx.ctx
+        self.n_parallel = n_parallel
+        self.n_batch = model.n_batch
+        self.n_vocab = model.n_vocab()
+        self.seq_ctx = model.n_ctx() // n_parallel
+        self.eos = model.token_eos()
+        self.top_k = top_k
+        self.min_p = min_p
+        self.repeat_penalty = repeat_penalty
+        self.penalty_last_n = penalty_last_n
+
+        self.error: BaseException | None = None
+        self.decode_calls = 0
+        self.batch_tokens = 0
+        self.decode_seconds = 0.0
+        self.sample_seconds = 0.0
+
+        llama_cpp.llama_kv_cache_clear(self.ctx)
+        model.reset()
+        self.batch = llama_cpp.llama_batch_init(self.n_batch, 0, 1)
+        self.requests: queue.Queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="batched-generator", daemon=True)
+        self.thread.start()
+
+    def submit(self, prompt_text: str, max_tokens: int, temperature: float, top_p: float, seed: int | None = None) -> Future:
+        if self.error is not None:
+            raise RuntimeError("The batched generator stopped after an error.") from self.error
+        future: Future = Future()
+        self.requests.put(
+            {
+                "prompt_text": prompt_text,
+                "max_tokens": max_tokens,
+                "temperature": temperature,
+                "top_p": top_p,
+                "seed": seed,
+                "future": future,
+            }
+        )
+        return future
+
+    def close(self) -> None:
+        """
+        Finish all submitted requests, stop the worker and leave the model reset for sequential use.
+        """
+        if self.batch is None:
+            return
+        self.requests.put(None)
+        self.thread.join()
+        llama_cpp.llama_batch_free(self.batch)
+        self.batch = None
+        llama_cpp.llama_kv_cache_clear(self.ctx)
+        self.model.reset()
+
+    def __enter__(self) -> "BatchedGenerator":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _add(self, token: int, pos: int, seq_id: int, logits: bool) -> int:
+        i = self.batch.n_tokens
+        self.batch.token[i] = token
+        self.batch.pos[i] = pos
+        self.batch.n_seq_id[i] = 1
+        self.batch.seq_id[i][0] = seq_id
+        self.batch.logits[i] = logits
+        self.batch.n_tokens = i + 1
+        return i
+
+    def _admit(self, request: dict, seq_id: int) -> _Sequence | None:
+        prompt_tokens = self.model.tokenize(request["prompt_text"].encode("utf-8"), special=True)
+        needed = len(prompt_tokens) + request["max_tokens"]
+        if len(prompt_tokens) > self.n_batch or needed > self.seq_ctx:
+            request["future"].set_exception(
+                ValueError(
+                    f"Request needs {len(prompt_tokens)} prompt + {request['max_tokens']} completion tokens; "
+                    f"each of the {self.n_parallel} sequences has {self.seq_ctx} (n_batch {self.n_batch})."
+                )
+            )
+            return None
+        return _Sequence(request, seq_id, prompt_tokens)
+
+    def _finish(self, sequence: _Sequence, finish_reason: str) -> None:
+        llama_cpp.llama_kv_cache_seq_rm(self.ctx, sequence.seq_id, -1, -1)
+        text = self.model.detokenize(sequence.completion, prev_tokens=sequence.prompt_tokens)
+        stats = {
+            "prompt_tokens": len(sequence.prompt_tokens),
+            "completion_tokens": len(sequence.completion),
+            "prompt_eval_ms": round(sequence.prompt_eval_ms, 3),
+            "decode_ms": round(sequence.decode_ms, 3),
+            "generation_ms": round((time.perf_counter() - sequence.admitted_at) * 1000, 3),
+            "finish_reason": finish_reason,
+        }
+        sequence.request["future"].set_result((text.decode("utf-8", errors="ignore").strip(), stats))
+
+    def _run(self) -> None:
+        pending: deque = deque()
+        slots: list[_Sequence | None] = [None] * self.n_parallel
+        closing = False
+        try:
+            while True:
+                running = any(slot is not None for slot in slots)
+                if not running and not pending:
+                    if closing:
+                        return
+                    item = self.requests.get()
+                    closing = item is None
+                    if item is not None:
+                        pending.append(item)
+                while True:
+                    try:
+                        item = self.requests.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        closing = True
+                    else:
+                        pending.append(item)
+
+                self.batch.n_tokens = 0
+                for sequence in slots:
+                    if sequence is not None:
+                        sequence.logits_index = self._add(sequence.next_token, sequence.pos, sequence.seq_id, True)
+                        sequence.pos += 1
+                free = [seq_id for seq_id, slot in enumerate(slots) if slot is None]
+                admitted = []
+                while free and pending:
+                    sequence = self._admit(pending[0], free[0])
+                    if sequence is None:
+                        pending.popleft()
+                        continue
+                    if self.batch.n_tokens + len(sequence.prompt_tokens) > self.n_batch:
+                        break
+                    pending.popleft()
+                    last = len(sequence.prompt_tokens) - 1
+                    for pos, token in enumerate(sequence.prompt_tokens):
+                        sequence.logits_index = self._add(token, pos, sequence.seq_id, pos == last)
+                    sequence.pos = len(sequence.prompt_tokens)
+                    slots[free.pop(0)] = sequence
+                    admitted.append(sequence)
+                if self.batch.n_tokens == 0:
+                    continue
+
+                started = time.perf_counter()
+                return_code = llama_cpp.llama_decode(self.ctx, self.batch)
+                if return_code != 0:
+                    raise RuntimeError(f"llama_decode returned {return_code}")
+                self.decode_calls += 1
+                self.batch_tokens += self.batch.n_tokens
+                sampled = time.perf_counter()
+                self.decode_seconds += sampled - started
+                decode_ms = (sampled - started) * 1000
+
+                for seq_id, sequence in enumerate(slots):
+                    if sequence is None:
+                        continue
+                    if sequence in admitted:
+                        sequence.prompt_eval_ms += decode_ms
+                    else:
+                        sequence.decode_ms += decode_ms
+                    pointer = llama_cpp.llama_get_logits_ith(self.ctx, sequence.logits_index)
+                    logits = np.ctypeslib.as_array(pointer, shape=(self.n_vocab,))
+                    evaluated = sequence.prompt_tokens + sequence.completion
+                    request = sequence.request
+                    token = sample_token(
+                        logits,
+                        evaluated[: self.penalty_last_n],
+                        request["temperature"],
+                        request["top_p"],
+                        sequence.rng,
+                        top_k=self.top_k,
+                        min_p=self.min_p,
+                        repeat_penalty=self.repeat_penalty,
+                    )
+                    if token != self.eos:
+                        sequence.completion.append(token)
+                    if token == self.eos or len(sequence.completion) >= request["max_tokens"]:
+                        self._finish(sequence, "stop" if token == self.eos else "length")
+                        slots[seq_id] = None
+                    else:
+                        sequence.next_token = token
+                self.sample_seconds += time.perf_counter() - sampled
+        except BaseException as exc:
+            self.error = exc
+            for sequence in slots:
+                if sequence is not None and not sequence.request["future"].done():
+                    sequence.request["future"].set_exception(exc)
+            for request in pending:
+                request["future"].set_exception(exc)
+            while True:
+                try:
+                    request = self.requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is not None:
+                    request["future"].set_exception(exc)
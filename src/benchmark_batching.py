@@ -0,0 +1,122 @@
+import argparse
+import json
+import time
+
+from llama_cpp import Llama
+
+from batch_engine import BatchedGenerator
+from main_adjusted import (
+    DEFAULT_CTX_SIZE,
+    DEFAULT_THREADS,
+    MODELS,
+    format_prompt,
+    resolve_model_path,
+)
+from prompt_prefix import PromptPrefix
+from prompts import load_prompts
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Compare generation throughput of the sequential path with continuous batching."
+    )
+    parser.add_argument("--model", type=str, nargs="+", default=["tinyllama", "mistral"], help="Models to benchmark.")
+    parser.add_argument("--models_dir", type=str, default="models")
+    parser.add_argument("--prompts_file", type=str, default="prompts.json")
+    parser.add_argument("--num_prompts", type=int, default=3)
+    parser.add_argument("--repetitions", type=int, default=10)
+    parser.add_argument("--max_tokens", type=int, default=64)
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--top_p", type=float, default=0.95)
+    parser.add_argument(
+        "--n_parallel",
+        type=int,
+        nargs="+",
+        default=[4, 8, 16],
+        help="Batch widths to measure against the sequential path.",
+    )
+    parser.add_argument("--ctx_size", type=int, default=DEFAULT_CTX_SIZE, help="Context per sequence.")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS)
+    parser.add_argument("--output_json", type=str, default=None)
+    return parser.parse_args()
+
+
+def run_sequential(model: Llama, prompts: list[str], args: argparse.Namespace) -> dict:
+    started = time.perf_counter()
+    completions = 0
+    completion_tokens = 0
+    for prompt in prompts:
+        prefix = PromptPrefix(model, format_prompt(prompt))
+        for _ in range(args.repetitions):
+            _, stats = prefix.complete(args.max_tokens, args.temperature, args.top_p)
+            completion_tokens += stats["completion_tokens"]
+            completions += 1
+    wall_seconds = time.perf_counter() - started
+    return {
+        "completions": completions,
+        "completion_tokens": completion_tokens,
+        "wall_seconds": round(wall_seconds, 3),
+        "tokens_per_second": round(completion_tokens / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+    }
+
+
+def run_batched(model: Llama, n_parallel: int, prompts: list[str], args: argparse.Namespace) -> dict:
+    started = time.perf_counter()
+    with BatchedGenerator(model, n_parallel) as engine:
+        futures = [
+            engine.submit(format_prompt(prompt), args.max_tokens, args.temperature, args.top_p, seed=repetition)
+            for prompt in prompts
+            for repetition in range(args.repetitions)
+        ]
+        completion_tokens = sum(future.result()[1]["completion_tokens"] for future in futures)
+    wall_seconds = time.perf_counter() - started
+    return {
+        "completions": len(futures),
+        "completion_tokens": completion_tokens,
+        "wall_seconds": round(wall_seconds, 3),
+        "tokens_per_second": round(completion_tokens / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        "decode_calls": engine.decode_calls,
+        "avg_batch_tokens": round(engine.batch_tokens / max(engine.decode_calls, 1), 1),
+        "decode_seconds": round(engine.decode_seconds, 3),
+        "sample_seconds": round(engine.sample_seconds, 3),
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    prompts = [entry["prompt"] for entry in load_prompts(args.prompts_file)[: args.num_prompts]]
+
+    report: dict[str, dict] = {}
+    for model_key in args.model:
+        model_path = resolve_model_path(args.models_dir, MODELS[model_key])
+        model = Llama(
+            model_path=str(model_path),
+            n_ctx=args.ctx_size * max(args.n_parallel),
+            n_threads=args.threads,
+            verbose=False,
+        )
+        report[model_key] = {"sequential": run_sequential(model, prompts, args)}
+        for n_parallel in args.n_parallel:
+            report[model_key][f"batched_{n_parallel}"] = run_batched(model, n_parallel, prompts, args)
+        del model
+
+        sequential_rate = report[model_key]["sequential"]["tokens_per_second"]
+        for path, row in report[model_key].items():
+            speedup = row["tokens_per_second"] / sequential_rate if sequential_rate > 0 else 0.0
+            batching = (
+                f", {row['decode_calls']} decode calls of {row['avg_batch_tokens']} tokens"
+                if "decode_calls" in row
+                else ""
+            )
+            print(
+                f"{model_key:<10} {path:<12} {row['tokens_per_second']:>8.2f} tokens/s "
+                f"({row['completion_tokens']} tokens in {row['wall_seconds']:.2f}s, x{speedup:.2f}{batching})"
+            )
+
+    if args.output_json:
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
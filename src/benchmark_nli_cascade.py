@@ -0,0 +1,181 @@
+import argparse
+import json
+import time
+from itertools import combinations
+
+import numpy as np
+
+import analyze_results_adjusted as analysis
+from benchmark_scorer_backends import DEFAULT_INPUT_DIRS, agreement, load_groups
+
+
+def parse_band(value: str) -> tuple[float, float]:
+    try:
+        low, high = (float(part) for part in value.split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected LOW:HIGH, got '{value}'.")
+    if not 0.0 <= low <= high <= 1.0:
+        raise argparse.ArgumentTypeError(f"Expected 0 <= LOW <= HIGH <= 1, got '{value}'.")
+    return low, high
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Compare the NLI cascade (--nli_cascade) with scoring every pair by the full model on the stored "
+            "completions: contradiction_rate agreement, escalation rate and throughput."
+        )
+    )
+    parser.add_argument("--input_dir", type=str, nargs="+", default=DEFAULT_INPUT_DIRS, help="Generation outputs to score.")
+    parser.add_argument("--nli_screen_model", type=str, default=analysis.DEFAULT_SCREEN_NLI_MODEL_NAME)
+    parser.add_argument(
+        "--escalation_band",
+        type=parse_band,
+        default=analysis.DEFAULT_ESCALATION_BAND,
+        help="Band of the measured cascade run, as LOW:HIGH.",
+    )
+    parser.add_argument(
+        "--sweep",
+        type=parse_band,
+        nargs="*",
+        default=[(0.05, 0.95), (0.1, 0.9), (0.2, 0.8), (0.3, 0.7)],
+        help="Further bands evaluated from the screening and full verdicts, with estimated time.",
+    )
+    parser.add_argument(
+        "--scorer_backend", type=str, choices=analysis.SCORER_BACKENDS, default=analysis.DEFAULT_SCORER_BACKEND
+    )
+    parser.add_argument(
+        "--nli_input_encoding",
+        type=str,
+        choices=analysis.NLI_INPUT_ENCODINGS,
+        default=analysis.DEFAULT_NLI_INPUT_ENCODING,
+        help="Input encoding of the full NLI model; the screening model always uses pair encoding.",
+    )
+    parser.add_argument("--nli_batch_size", type=int, default=analysis.DEFAULT_NLI_BATCH_SIZE)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--output_json", type=str, default=None, help="Optional path for the report.")
+    return parser.parse_args()
+
+
+def configure(args: argparse.Namespace, screen_model: str | None, band: tuple[float, float]) -> None:
+    analysis.configure_scorers(
+        cache_dir=None,
+        embedding_cache_max_mb=0,
+        batch_size=args.nli_batch_size,
+        threads=args.threads,
+        scorer_backend_name=args.scorer_backend,
+        nli_screen_model=screen_model,
+        nli_escalation_band=band,
+        nli_encoding=args.nli_input_encoding,
+    )
+
+
+def group_rates(labels: list[str], group_sizes: list[int]) -> np.ndarray:
+    rates, offset = [], 0
+    for size in group_sizes:
+        group = labels[offset : offset + size]
+        rates.append(group.count("CONTRADICTION") / size if size else 0.0)
+        offset += size
+    return np.asarray(rates)
+
+
+def main() -> None:
+    args = parse_args()
+    groups = load_groups(args.input_dir)
+    group_pairs = [list(combinations(group["responses"], 2)) for group in groups]
+    pairs = [pair for group in group_pairs for pair in group]
+    group_sizes = [len(group) for group in group_pairs]
+    distinct = list(dict.fromkeys(pair for pair in pairs if pair[0] != pair[1]))
+    print(f"{len(pairs)} pairs ({len(distinct)} distinct) from {len(groups)} prompt groups.")
+
+    configure(args, args.nli_screen_model, args.escalation_band)
+    analysis.get_nli_engine()
+    analysis.get_screen_nli_engine()
+
+    configure(args, None, args.escalation_band)
+    started = time.perf_counter()
+    full = analysis.predict_nli(pairs)
+    full_seconds = time.perf_counter() - started
+
+    configure(args, args.nli_screen_model, args.escalation_band)
+    escalated_before = analysis.nli_stats["escalated"]
+    started = time.perf_counter()
+    cascade = analysis.predict_nli(pairs)
+    cascade_seconds = time.perf_counter() - started
+    escalated = analysis.nli_stats["escalated"] - escalated_before
+
+    started = time.perf_counter()
+    screened = dict(zip(distinct, analysis.get_screen_nli_engine().predict(distinct)))
+    screen_seconds = time.perf_counter() - started
+    index = analysis.screen_contradiction_index()
+    probabilities = {}
+    for pair, verdict in screened.items():
+        logits = np.asarray(verdict["logits"], dtype=np.float64)
+        exp = np.exp(logits - logits.max())
+        probabilities[pair] = exp[index] / exp.sum()
+
+    full_labels = [verdict["label"] for verdict in full]
+    full_rates = group_rates(full_labels, group_sizes)
+    cascade_labels = [verdict["label"] for verdict in cascade]
+    report = {
+        "pairs": len(pairs),
+        "distinct_pairs": len(distinct),
+        "screen_model": args.nli_screen_model,
+        "full_model": analysis.NLI_MODEL_NAME,
+        "nli_input_encoding": args.nli_input_encoding,
+        "screen_input_encoding": analysis.SCREEN_NLI_INPUT_ENCODING,
+        "scorer_backend": args.scorer_backend,
+        "measured": {
+            "band": list(args.escalation_band),
+            "escalated_pairs": escalated,
+            "escalation_rate": round(escalated / len(distinct), 4) if distinct else 0.0,
+            "full_seconds": round(full_seconds, 3),
+            "cascade_seconds": round(cascade_seconds, 3),
+            "screen_only_seconds": round(screen_seconds, 3),
+            "speedup": round(full_seconds / cascade_seconds, 2) if cascade_seconds > 0 else None,
+            "label_agreement": round(np.mean([a == b for a, b in zip(full_labels, cascade_labels)]), 4) if pairs else None,
+            "contradiction_rate": agreement(full_rates, group_rates(cascade_labels, group_sizes)),
+        },
+        "sweep": [],
+    }
+
+    for low, high in args.sweep:
+        labels = [
+            full_label if a == b or low <= probabilities[(a, b)] <= high else screened[(a, b)]["label"]
+            for (a, b), full_label in zip(pairs, full_labels)
+        ]
+        escalation_rate = np.mean([low <= probabilities[pair] <= high for pair in distinct]) if distinct else 0.0
+        estimated_seconds = screen_seconds + escalation_rate * full_seconds
+        report["sweep"].append(
+            {
+                "band": [low, high],
+                "escalation_rate": round(float(escalation_rate), 4),
+                "estimated_seconds": round(float(estimated_seconds), 3),
+                "estimated_speedup": round(full_seconds / estimated_seconds, 2) if estimated_seconds > 0 else None,
+                "label_agreement": round(np.mean([a == b for a, b in zip(full_labels, labels)]), 4) if pairs else None,
+                "contradiction_rate": agreement(full_rates, group_rates(labels, group_sizes)),
+            }
+        )
+
+    measured = report["measured"]
+    print(
+        f"Band {measured['band']}: {measured['escalation_rate']:.1%} of pairs escalated, "
+        f"{measured['cascade_seconds']:.2f}s vs {measured['full_seconds']:.2f}s for the full model (x{measured['speedup']}), "
+        f"label agreement {measured['label_agreement']:.2%}, "
+        f"contradiction_rate |diff| mean {measured['contradiction_rate']['mean_abs_diff']:.4f} "
+        f"max {measured['contradiction_rate']['max_abs_diff']:.4f}"
+    )
+    for row in report["sweep"]:
+        print(
+            f"  band {row['band']}: escalated {row['escalation_rate']:>6.1%}, est. x{row['estimated_speedup']}, "
+            f"label agreement {row['label_agreement']:.2%}, "
+            f"|diff| mean {row['contradiction_rate']['mean_abs_diff']:.4f} max {row['contradiction_rate']['max_abs_diff']:.4f}"
+        )
+
+    if args.output_json:
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
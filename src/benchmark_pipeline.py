@@ -0,0 +1,372 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+import analyze_results_adjusted as analysis
+import main_adjusted
+from columnar_store import prefer_parquet, read_table, write_parquet
+from main_adjusted import MODELS, condition_jobs, condition_paths, resolve_model_path, run_condition
+from throttle import AdaptiveThrottle
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_SAMPLES_DIR = SCRIPT_DIR.parent / "outputs" / "temp_0_7"
+DEFAULT_BASELINE = SCRIPT_DIR / "benchmark_baseline.json"
+DEFAULT_REGRESSION_THRESHOLD = 0.2
+DEFAULT_MIN_DELTA_SECONDS = 0.05
+PLOT_SCRIPTS = ("plot_logical_heatmap_revised.py", "plot_semantic_heatmap_revised.py")
+SAMPLE_TEMPERATURE = 0.7
+SAMPLE_TOP_P = 0.95
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Time each stage of the generation and analysis pipelines on fixed samples and "
+            "compare the result with a stored baseline."
+        )
+    )
+    parser.add_argument(
+        "--samples_dir",
+        type=str,
+        default=str(DEFAULT_SAMPLES_DIR),
+        help="Generation outputs the fixed samples are drawn from.",
+    )
+    parser.add_argument("--num_models", type=int, default=2, help="Output files (models) sampled, in name order.")
+    parser.add_argument("--num_prompts", type=int, default=5, help="First prompts of each sampled file.")
+    parser.add_argument("--repetitions", type=int, default=3, help="Completions generated per sampled prompt.")
+    parser.add_argument("--max_tokens", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=3, help="Repetitions of each stage; the median is reported.")
+    parser.add_argument(
+        "--gguf_model",
+        type=str,
+        default=None,
+        help=f"Benchmark a real model ({', '.join(MODELS)}) instead of the mock Llama.",
+    )
+    parser.add_argument("--models_dir", type=str, default="models")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--mock_load_seconds", type=float, default=0.5, help="Load time of the mock Llama.")
+    parser.add_argument("--mock_prompt_ms_per_token", type=float, default=2.0, help="Prompt-eval time of the mock Llama.")
+    parser.add_argument("--mock_decode_ms_per_token", type=float, default=25.0, help="Decode time of the mock Llama.")
+    parser.add_argument(
+        "--textual_backend",
+        type=str,
+        choices=sorted(analysis.TEXTUAL_BACKENDS),
+        default=analysis.DEFAULT_TEXTUAL_BACKEND,
+    )
+    parser.add_argument(
+        "--scorer_backend",
+        type=str,
+        choices=analysis.SCORER_BACKENDS,
+        default=analysis.DEFAULT_SCORER_BACKEND,
+    )
+    parser.add_argument("--skip_figures", action="store_true", help="Do not time the plot scripts.")
+    parser.add_argument("--baseline", type=str, default=str(DEFAULT_BASELINE), help="Baseline file to compare against.")
+    parser.add_argument("--update_baseline", action="store_true", help="Write this run to --baseline instead of comparing.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_REGRESSION_THRESHOLD,
+        help="Relative slowdown of a stage's median above which it is flagged as a regression.",
+    )
+    parser.add_argument(
+        "--min_delta_seconds",
+        type=float,
+        default=DEFAULT_MIN_DELTA_SECONDS,
+        help="Slowdowns smaller than this are never flagged, to ignore timer noise on fast stages.",
+    )
+    parser.add_argument("--output_json", type=str, default=None, help="Optional path for this run's measurements.")
+    return parser.parse_args()
+
+
+class MockTimings:
+    """
+    Stand-in for the llama_timings struct that query_model reads.
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.t_p_eval_ms = 0.0
+        self.t_eval_ms = 0.0
+        self.n_p_eval = 0
+        self.n_eval = 0
+
+
+class MockLlama:
+    """
+    Stand-in for llama_cpp.Llama with the __call__ interface query_model uses.
+
+    Loading and generation sleep for a fixed load time and a fixed time per
+    prompt and completion token (about four characters each), and each completion
+    is a sample response chosen by the request seed, so everything around the
+    model and the analysis of its outputs runs on realistic text.
+    """
+
+    def __init__(
+        self, responses: list[str], load_seconds: float, prompt_ms_per_token: float, decode_ms_per_token: float
+    ) -> None:
+        time.sleep(load_seconds)
+        self.responses = responses
+        self.prompt_ms_per_token = prompt_ms_per_token
+        self.decode_ms_per_token = decode_ms_per_token
+        self._ctx = SimpleNamespace(ctx=MockTimings())
+
+    def __call__(self, prompt: str, max_tokens: int, temperature: float, top_p: float, seed: int | None = None, **kwargs) -> dict:
+        response = self.responses[int(np.random.default_rng(seed).integers(len(self.responses)))]
+        prompt_tokens = len(prompt) // 4 + 1
+        completion_tokens = min(max_tokens, len(response) // 4 + 1)
+        timings = self._ctx.ctx
+        timings.t_p_eval_ms += prompt_tokens * self.prompt_ms_per_token
+        timings.t_eval_ms += completion_tokens * self.decode_ms_per_token
+        timings.n_p_eval += prompt_tokens
+        timings.n_eval += completion_tokens
+        time.sleep((prompt_tokens * self.prompt_ms_per_token + completion_tokens * self.decode_ms_per_token) / 1000)
+        return {
+            "choices": [{"text": " " + response, "finish_reason": "length" if completion_tokens >= max_tokens else "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+
+@contextmanager
+def mock_llama_timings(llama_module):
+    """
+    Route llama_module's llama_reset_timings/llama_get_timings to MockTimings
+    contexts while active. llama_module is the llama_cpp module the generation
+    code calls them through.
+    """
+    reset_timings, get_timings = llama_module.llama_reset_timings, llama_module.llama_get_timings
+    llama_module.llama_reset_timings = lambda ctx: ctx.reset() if isinstance(ctx, MockTimings) else reset_timings(ctx)
+    llama_module.llama_get_timings = lambda ctx: ctx if isinstance(ctx, MockTimings) else get_timings(ctx)
+    try:
+        yield
+    finally:
+        llama_module.llama_reset_timings, llama_module.llama_get_timings = reset_timings, get_timings
+
+
+def measure(fn: Callable[[], object], runs: int) -> dict:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return {
+        "median_s": round(statistics.median(timings), 4),
+        "min_s": round(min(timings), 4),
+        "max_s": round(max(timings), 4),
+        "runs": runs,
+    }
+
+
+def load_samples(samples_dir: str, num_models: int, num_prompts: int) -> pd.DataFrame:
+    """
+    The rows of the first num_prompts prompts of the first num_models output files.
+    """
+    sources = sorted({prefer_parquet(path) for path in Path(samples_dir).glob("*.csv")} | set(Path(samples_dir).glob("*.parquet")))
+    if not sources:
+        raise FileNotFoundError(f"No generation outputs found in {samples_dir}")
+    frames = []
+    for source in sources[:num_models]:
+        df = read_table(source)
+        prompts = list(dict.fromkeys(df["prompt"]))[:num_prompts]
+        frames.append(df[df["prompt"].isin(prompts)])
+    return pd.concat(frames, ignore_index=True)
+
+
+def run_benchmark(args: argparse.Namespace, workdir: Path) -> dict[str, dict]:
+    samples = load_samples(args.samples_dir, args.num_models, args.num_prompts)
+    sample_file = workdir / "samples.parquet"
+    write_parquet(samples, sample_file)
+    stages: dict[str, dict] = {}
+
+    prompts = samples.drop_duplicates("prompt")[["category", "prompt"]].to_dict(orient="records")
+    responses = samples["response"].astype(str).tolist()
+    if args.gguf_model is not None:
+        import llama_cpp
+
+        model_path = resolve_model_path(args.models_dir, MODELS[args.gguf_model])
+        load = lambda: llama_cpp.Llama(model_path=str(model_path), n_ctx=2048, n_threads=args.threads, verbose=False)
+    else:
+        load = lambda: MockLlama(
+            responses, args.mock_load_seconds, args.mock_prompt_ms_per_token, args.mock_decode_ms_per_token
+        )
+
+    model = None
+
+    def load_model() -> None:
+        nonlocal model
+        model = None
+        model = load()
+
+    stages["model_load"] = measure(load_model, 1 if args.gguf_model else args.runs)
+
+    jobs = condition_jobs("benchmark", prompts, set(), SAMPLE_TEMPERATURE, SAMPLE_TOP_P, args.repetitions)
+    paths = condition_paths(workdir, "benchmark", SAMPLE_TEMPERATURE, SAMPLE_TOP_P)
+    generate = lambda: run_condition(
+        model=model,
+        model_name="benchmark",
+        jobs=jobs,
+        paths=paths,
+        temperature=SAMPLE_TEMPERATURE,
+        top_p=SAMPLE_TOP_P,
+        max_tokens=args.max_tokens,
+        throttle=AdaptiveThrottle(max_pause_seconds=0),
+        prefix_reuse=args.gguf_model is not None,
+    )
+    with mock_llama_timings(main_adjusted.llama_cpp):
+        stages["generation"] = measure(generate, args.runs)
+    stages["generation"]["per_completion_ms"] = round(stages["generation"]["median_s"] / len(jobs) * 1000, 3)
+    model = None
+
+    analysis.configure_scorers(
+        cache_dir=None,
+        embedding_cache_max_mb=0,
+        batch_size=analysis.DEFAULT_NLI_BATCH_SIZE,
+        threads=None,
+        textual_backend_name=args.textual_backend,
+        scorer_backend_name=args.scorer_backend,
+    )
+    groups = [group["response"].astype(str).tolist() for _, group in samples.groupby(["model", "prompt"], sort=False)]
+
+    def textual_similarity() -> None:
+        for group in groups:
+            analysis.compute_textual_similarity_all_pairs(group)
+            analysis.compute_diachronic_textual_similarity(group)
+
+    stages["embedding_load"] = measure(analysis.get_sbert, 1)
+    stages["embedding"] = measure(lambda: analysis.encode_responses(responses), args.runs)
+    stages["nli_load"] = measure(analysis.get_nli_engine, 1)
+    stages["nli"] = measure(lambda: analysis.compute_contradiction_rates(groups), args.runs)
+    stages["textual_similarity"] = measure(textual_similarity, args.runs)
+
+    results: list[dict] = []
+
+    def prompt_metrics() -> None:
+        results[:] = analysis.analyze_model_file(str(sample_file))
+
+    stages["prompt_metrics"] = measure(prompt_metrics, args.runs)
+    output_prefix = workdir / "analysis_results_benchmark"
+    stages["aggregation"] = measure(
+        lambda: analysis.write_condition_outputs(results, output_prefix, ["csv", "json"]), args.runs
+    )
+
+    if not args.skip_figures:
+        def render_figures() -> None:
+            for script in PLOT_SCRIPTS:
+                subprocess.run(
+                    [sys.executable, script, "--input_csv", str(output_prefix.with_suffix(".csv")), "--output_dir", str(workdir / "figures")],
+                    cwd=SCRIPT_DIR,
+                    check=True,
+                    stdout=subprocess.DEVNULL,
+                )
+
+        stages["figure_rendering"] = measure(render_figures, args.runs)
+    return stages
+
+
+def run_config(args: argparse.Namespace) -> dict:
+    return {
+        "samples_dir": Path(args.samples_dir).name,
+        "num_models": args.num_models,
+        "num_prompts": args.num_prompts,
+        "repetitions": args.repetitions,
+        "max_tokens": args.max_tokens,
+        "model": args.gguf_model or "mock",
+        "mock_timings": None
+        if args.gguf_model
+        else [args.mock_load_seconds, args.mock_prompt_ms_per_token, args.mock_decode_ms_per_token],
+        "textual_backend": args.textual_backend,
+        "scorer_backend": args.scorer_backend,
+        "figures": not args.skip_figures,
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float, min_delta_seconds: float) -> list[str]:
+    """
+    Print every stage next to its baseline and return the stages that regressed.
+    """
+    if baseline.get("config") != report["config"]:
+        print("Warning: the baseline was recorded with a different configuration; timings may not be comparable.")
+    if baseline.get("machine") != report["machine"]:
+        print("Warning: the baseline was recorded on a different machine or Python version.")
+
+    regressions = []
+    print(f"{'stage':<20} {'baseline':>10} {'current':>10} {'change':>8}")
+    for stage, current in report["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if base is None:
+            print(f"{stage:<20} {'-':>10} {current['median_s']:>9.3f}s {'new':>8}")
+            continue
+        delta = current["median_s"] - base["median_s"]
+        change = delta / base["median_s"] if base["median_s"] > 0 else 0.0
+        regressed = delta > min_delta_seconds and change > threshold
+        if regressed:
+            regressions.append(stage)
+        print(
+            f"{stage:<20} {base['median_s']:>9.3f}s {current['median_s']:>9.3f}s {change:>+7.1%}"
+            + ("  REGRESSION" if regressed else "")
+        )
+    return regressions
+
+
+def main() -> None:
+    args = parse_args()
+    with tempfile.TemporaryDirectory(prefix="pipeline_benchmark_") as workdir:
+        stages = run_benchmark(args, Path(workdir))
+    report = {
+        "created_at": datetime.utcnow().isoformat(),
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": run_config(args),
+        "stages": stages,
+    }
+    if args.output_json:
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {baseline_path}.")
+        for stage, timing in stages.items():
+            print(f"{stage:<20} {timing['median_s']:>9.3f}s")
+        return
+    if not baseline_path.exists():
+        for stage, timing in stages.items():
+            print(f"{stage:<20} {timing['median_s']:>9.3f}s")
+        print(f"No baseline at {baseline_path}; rerun with --update_baseline to record one.")
+        return
+
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, args.threshold, args.min_delta_seconds)
+    if regressions:
+        print(f"{len(regressions)} stage(s) slower than the baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
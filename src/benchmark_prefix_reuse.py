@@ -0,0 +1,97 @@
+import argparse
+import json
+import time
+
+import llama_cpp
+from llama_cpp import Llama
+
+from main_adjusted import (
+    DEFAULT_CTX_SIZE,
+    DEFAULT_THREADS,
+    MODELS,
+    format_prompt,
+    query_model,
+    resolve_model_path,
+)
+from prompt_prefix import PromptPrefix
+from prompts import load_prompts
+
+PATHS = ("cold", "library_prefix_match", "prompt_prefix")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Measure prompt-eval time saved by resuming repetitions from a cached prompt state."
+    )
+    parser.add_argument("--model", type=str, nargs="+", default=list(MODELS), help="Models to benchmark.")
+    parser.add_argument("--models_dir", type=str, default="models")
+    parser.add_argument("--prompts_file", type=str, default="prompts.json")
+    parser.add_argument("--num_prompts", type=int, default=3)
+    parser.add_argument("--repetitions", type=int, default=10)
+    parser.add_argument("--max_tokens", type=int, default=16)
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--top_p", type=float, default=0.95)
+    parser.add_argument("--ctx_size", type=int, default=DEFAULT_CTX_SIZE)
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS)
+    parser.add_argument(
+        "--system_prefix",
+        type=str,
+        default="",
+        help="Text prepended to every prompt, to measure longer system-style prefixes.",
+    )
+    parser.add_argument("--output_json", type=str, default=None)
+    return parser.parse_args()
+
+
+def run_path(model: Llama, path: str, prompts: list[str], args: argparse.Namespace) -> dict:
+    llama_cpp.llama_reset_timings(model._ctx.ctx)
+    started = time.perf_counter()
+    completions = 0
+    for prompt in prompts:
+        prefix = PromptPrefix(model, format_prompt(prompt)) if path == "prompt_prefix" else None
+        for _ in range(args.repetitions):
+            if prefix is not None:
+                prefix.complete(args.max_tokens, args.temperature, args.top_p)
+            else:
+                if path == "cold":
+                    model.reset()
+                query_model(model, prompt, args.max_tokens, args.temperature, args.top_p)
+            completions += 1
+    wall_seconds = time.perf_counter() - started
+    timings = llama_cpp.llama_get_timings(model._ctx.ctx)
+    return {
+        "completions": completions,
+        "wall_seconds": round(wall_seconds, 3),
+        "prompt_eval_tokens": int(timings.n_p_eval),
+        "prompt_eval_ms": round(float(timings.t_p_eval_ms), 1),
+        "decode_ms": round(float(timings.t_eval_ms), 1),
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    prompts = [args.system_prefix + entry["prompt"] for entry in load_prompts(args.prompts_file)[: args.num_prompts]]
+
+    report: dict[str, dict] = {}
+    for model_key in args.model:
+        model_path = resolve_model_path(args.models_dir, MODELS[model_key])
+        model = Llama(model_path=str(model_path), n_ctx=args.ctx_size, n_threads=args.threads, verbose=False)
+        report[model_key] = {path: run_path(model, path, prompts, args) for path in PATHS}
+        del model
+
+        cold_ms = report[model_key]["cold"]["prompt_eval_ms"]
+        for path in PATHS:
+            row = report[model_key][path]
+            print(
+                f"{model_key:<10} {path:<21} prompt-eval {row['prompt_eval_ms']:>9.1f} ms "
+                f"({row['prompt_eval_tokens']} tokens), saved vs cold {cold_ms - row['prompt_eval_ms']:>9.1f} ms, "
+                f"wall {row['wall_seconds']:.2f}s"
+            )
+
+    if args.output_json:
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import argparse
+import glob
+import json
+import time
+from itertools import combinations
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import analyze_results_adjusted as analysis
+from columnar_store import read_table
+from onnx_scorers import DEFAULT_ONNX_MODEL_DIR, export_sentence_encoder, export_sequence_classifier
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_INPUT_DIRS = [str(SCRIPT_DIR.parent / "outputs" / f"temp_{t}") for t in ("0_2", "0_7", "1_0")]
+BASELINE_BACKEND = "torch"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Score the stored completions with the fp32 PyTorch scorers and a quantized backend, and report "
+            "the agreement of semantic_similarity and contradiction_rate and the speedup."
+        )
+    )
+    parser.add_argument("--input_dir", type=str, nargs="+", default=DEFAULT_INPUT_DIRS, help="Generation outputs to score.")
+    parser.add_argument(
+        "--candidate",
+        type=str,
+        choices=[backend for backend in analysis.SCORER_BACKENDS if backend != BASELINE_BACKEND],
+        default="onnx-int8",
+        help="Backend compared against the fp32 PyTorch baseline.",
+    )
+    parser.add_argument("--onnx_model_dir", type=str, default=DEFAULT_ONNX_MODEL_DIR)
+    parser.add_argument("--embedding_batch_size", type=int, default=analysis.DEFAULT_EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--nli_batch_size", type=int, default=analysis.DEFAULT_NLI_BATCH_SIZE)
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads of both backends.")
+    parser.add_argument("--output_json", type=str, default=None, help="Optional path for the agreement and timing report.")
+    parser.add_argument("--output_csv", type=str, default=None, help="Optional path for the per-prompt metrics of both backends.")
+    return parser.parse_args()
+
+
+def load_groups(input_dirs: list[str]) -> list[dict]:
+    """
+    One entry per (output file, prompt), the unit the analysis computes its metrics on.
+    """
+    groups = []
+    for input_dir in input_dirs:
+        files = sorted(glob.glob(str(Path(input_dir) / "*.parquet"))) or sorted(glob.glob(str(Path(input_dir) / "*.csv")))
+        for file in files:
+            df = read_table(file)
+            for prompt, group in df.groupby("prompt", sort=False):
+                groups.append(
+                    {
+                        "file": Path(file).stem,
+                        "model": group["model"].iloc[0],
+                        "prompt": prompt,
+                        "responses": group["response"].astype(str).tolist(),
+                    }
+                )
+    return groups
+
+
+def score(groups: list[dict], backend: str, args: argparse.Namespace) -> dict:
+    analysis.configure_scorers(
+        cache_dir=None,
+        embedding_cache_max_mb=0,
+        batch_size=args.nli_batch_size,
+        threads=args.threads,
+        scorer_backend_name=backend,
+        onnx_dir=args.onnx_model_dir,
+    )
+    started = time.perf_counter()
+    analysis.get_sbert()
+    analysis.get_nli_engine()
+    load_seconds = time.perf_counter() - started
+
+    responses = [response for group in groups for response in group["responses"]]
+    started = time.perf_counter()
+    embeddings = analysis.encode_responses(responses, batch_size=args.embedding_batch_size)
+    embedding_seconds = time.perf_counter() - started
+
+    group_pairs = [list(combinations(group["responses"], 2)) for group in groups]
+    started = time.perf_counter()
+    verdicts = analysis.predict_nli([pair for pairs in group_pairs for pair in pairs])
+    nli_seconds = time.perf_counter() - started
+
+    labels = [verdict["label"] for verdict in verdicts]
+    semantic, contradiction = [], []
+    row = pair = 0
+    for group, pairs in zip(groups, group_pairs):
+        n = len(group["responses"])
+        semantic.append(analysis.compute_semantic_similarity_all_pairs(embeddings[row : row + n]))
+        group_labels = labels[pair : pair + len(pairs)]
+        contradiction.append(group_labels.count("CONTRADICTION") / len(pairs) if pairs else 0.0)
+        row += n
+        pair += len(pairs)
+    return {
+        "load_seconds": load_seconds,
+        "embedding_seconds": embedding_seconds,
+        "nli_seconds": nli_seconds,
+        "scoring_seconds": embedding_seconds + nli_seconds,
+        "semantic_similarity": np.asarray(semantic),
+        "contradiction_rate": np.asarray(contradiction),
+        "labels": labels,
+    }
+
+
+def agreement(baseline: np.ndarray, candidate: np.ndarray) -> dict:
+    diff = np.abs(candidate - baseline)
+    correlated = len(baseline) > 1 and baseline.std() > 0 and candidate.std() > 0
+    return {
+        "baseline_mean": round(float(baseline.mean()), 4),
+        "candidate_mean": round(float(candidate.mean()), 4),
+        "mean_abs_diff": round(float(diff.mean()), 4),
+        "max_abs_diff": round(float(diff.max()), 4),
+        "pearson_r": round(float(np.corrcoef(baseline, candidate)[0, 1]), 4) if correlated else None,
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    groups = load_groups(args.input_dir)
+    completions = sum(len(group["responses"]) for group in groups)
+    print(f"Scoring {completions} completions in {len(groups)} prompt groups.")
+
+    if args.candidate == "onnx-int8":
+        started = time.perf_counter()
+        export_sentence_encoder(analysis.SEMANTIC_MODEL_NAME, args.onnx_model_dir)
+        export_sequence_classifier(analysis.NLI_MODEL_NAME, args.onnx_model_dir)
+        print(f"ONNX exports ready in {time.perf_counter() - started:.1f}s (not included in the timings below).")
+
+    baseline = score(groups, BASELINE_BACKEND, args)
+    candidate = score(groups, args.candidate, args)
+
+    label_matches = sum(a == b for a, b in zip(baseline["labels"], candidate["labels"]))
+    report = {
+        "baseline": BASELINE_BACKEND,
+        "candidate": args.candidate,
+        "completions": completions,
+        "prompt_groups": len(groups),
+        "nli_pairs": len(baseline["labels"]),
+        "semantic_similarity": agreement(baseline["semantic_similarity"], candidate["semantic_similarity"]),
+        "contradiction_rate": agreement(baseline["contradiction_rate"], candidate["contradiction_rate"]),
+        "nli_label_agreement": round(label_matches / len(baseline["labels"]), 4) if baseline["labels"] else None,
+        "timings": {},
+    }
+    for stage in ("load_seconds", "embedding_seconds", "nli_seconds", "scoring_seconds"):
+        report["timings"][stage] = {
+            BASELINE_BACKEND: round(baseline[stage], 3),
+            args.candidate: round(candidate[stage], 3),
+            "speedup": round(baseline[stage] / candidate[stage], 2) if candidate[stage] > 0 else None,
+        }
+
+    for metric in ("semantic_similarity", "contradiction_rate"):
+        stats = report[metric]
+        print(
+            f"{metric:<20} mean {stats['baseline_mean']:.4f} -> {stats['candidate_mean']:.4f}, "
+            f"|diff| mean {stats['mean_abs_diff']:.4f} max {stats['max_abs_diff']:.4f}, r = {stats['pearson_r']}"
+        )
+    print(f"NLI label agreement: {report['nli_label_agreement']:.2%} of {report['nli_pairs']} pairs")
+    for stage, timing in report["timings"].items():
+        print(
+            f"{stage:<18} {BASELINE_BACKEND} {timing[BASELINE_BACKEND]:>8.2f}s  "
+            f"{args.candidate} {timing[args.candidate]:>8.2f}s  x{timing['speedup']}"
+        )
+
+    if args.output_json:
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.output_csv:
+        pd.DataFrame(
+            {
+                "file": [group["file"] for group in groups],
+                "model": [group["model"] for group in groups],
+                "prompt": [group["prompt"] for group in groups],
+                f"semantic_similarity_{BASELINE_BACKEND}": baseline["semantic_similarity"].round(4),
+                f"semantic_similarity_{args.candidate}": candidate["semantic_similarity"].round(4),
+                f"contradiction_rate_{BASELINE_BACKEND}": baseline["contradiction_rate"].round(4),
+                f"contradiction_rate_{args.candidate}": candidate["contradiction_rate"].round(4),
+            }
+        ).to_csv(args.output_csv, index=False, encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+COMMANDS = {
+    "help": [sys.executable, "analyze_results_adjusted.py", "--help"],
+    "import": [sys.executable, "-c", "from analyze_results_adjusted import make_json_serializable"],
+    "eager_scorers": [
+        sys.executable,
+        "-c",
+        "from analyze_results_adjusted import get_sbert, get_nli_engine; get_sbert(); get_nli_engine()",
+    ],
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Measure startup time of analyze_results_adjusted.py with lazy scorers "
+            "against the cost of loading both scorers up front."
+        )
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Repetitions per measured command.")
+    parser.add_argument(
+        "--skip_eager",
+        action="store_true",
+        help="Only measure the lazy paths (no model download or load).",
+    )
+    parser.add_argument("--output_json", type=str, default=None, help="Optional path for the measurements.")
+    return parser.parse_args()
+
+
+def peak_child_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+
+def time_command(cmd: list[str], runs: int) -> dict:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=SCRIPT_DIR, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return {
+        "median_s": round(statistics.median(timings), 3),
+        "min_s": round(min(timings), 3),
+        "max_s": round(max(timings), 3),
+        "peak_child_rss_mb_so_far": peak_child_rss_mb(),
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    results: dict[str, dict] = {}
+    for name, cmd in COMMANDS.items():
+        if name == "eager_scorers" and args.skip_eager:
+            continue
+        results[name] = time_command(cmd, 1 if name == "eager_scorers" else args.runs)
+        print(f"{name:>14}: median {results[name]['median_s']:.3f}s")
+
+    if "eager_scorers" in results:
+        lazy = results["help"]["median_s"]
+        eager = results["eager_scorers"]["median_s"]
+        print(f"--help is {eager / max(lazy, 1e-9):.1f}x faster than loading both scorers at startup.")
+
+    if args.output_json:
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
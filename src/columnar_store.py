@@ -0,0 +1,120 @@
+from pathlib import Path
+from typing import Iterable
+
+import pandas as pd
+
+DICTIONARY_COLUMNS = ("model", "category", "prompt")
+PARQUET_COMPRESSION = "zstd"
+PARQUET_BATCH_ROWS = 50_000
+
+
+def read_csv_robust(file_path: str | Path) -> pd.DataFrame:
+    encodings = ["utf-8", "utf-8-sig", "cp1252"]
+    last_error = None
+    for enc in encodings:
+        try:
+            return pd.read_csv(file_path, encoding=enc)
+        except UnicodeDecodeError as exc:
+            last_error = exc
+    raise last_error  # type: ignore[misc]
+
+
+def build_filters(
+    models: list[str] | None = None,
+    temperatures: list[float] | None = None,
+    categories: list[str] | None = None,
+) -> list[tuple] | None:
+    """
+    Row filters in the pyarrow/pandas read_parquet format; None when nothing is filtered.
+    """
+    filters = []
+    for column, values in (("model", models), ("temperature", temperatures), ("category", categories)):
+        if values:
+            filters.append((column, "in", list(values)))
+    return filters or None
+
+
+def prefer_parquet(path: str | Path) -> Path:
+    """
+    The Parquet file next to a CSV/JSON path if one exists, else the path itself.
+    """
+    path = Path(path)
+    parquet_path = path.with_suffix(".parquet")
+    return parquet_path if parquet_path.exists() else path
+
+
+def read_table(path: str | Path, filters: list[tuple] | None = None, columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    Load a Parquet or CSV output file. Parquet filters are pushed down to the
+    reader, so row groups that cannot match are skipped; CSV files are read in
+    full and filtered afterwards.
+    """
+    path = Path(path)
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path, engine="pyarrow", filters=filters, columns=columns)
+
+    df = read_csv_robust(path)
+    for column, _, values in filters or []:
+        if column in df.columns:
+            df = df[df[column].isin(values)]
+    if columns is not None:
+        df = df[columns]
+    return df.reset_index(drop=True)
+
+
+def write_parquet(df: pd.DataFrame, path: str | Path) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(
+        table,
+        path,
+        compression=PARQUET_COMPRESSION,
+        use_dictionary=[column for column in DICTIONARY_COLUMNS if column in df.columns],
+    )
+
+
+def write_parquet_rows(rows: Iterable[dict], path: str | Path, batch_rows: int = PARQUET_BATCH_ROWS) -> int:
+    """
+    Stream dict records into a Parquet file, one row group per batch_rows records,
+    so the whole table never has to be held in memory. The schema is taken from the
+    first batch. Returns the number of rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    count = 0
+    batch: list[dict] = []
+
+    def flush() -> None:
+        nonlocal writer
+        if writer is None:
+            table = pa.Table.from_pylist(batch)
+            writer = pq.ParquetWriter(
+                path,
+                table.schema,
+                compression=PARQUET_COMPRESSION,
+                use_dictionary=[column for column in DICTIONARY_COLUMNS if column in table.column_names],
+            )
+        else:
+            table = pa.Table.from_pylist(batch, schema=writer.schema)
+        writer.write_table(table)
+        batch.clear()
+
+    try:
+        for row in rows:
+            batch.append(row)
+            count += 1
+            if len(batch) >= batch_rows:
+                flush()
+        if batch:
+            flush()
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        pq.write_table(pa.table({}), path)
+    return count
@@ -0,0 +1,47 @@
+import argparse
+import json
+from pathlib import Path
+
+from columnar_store import build_filters, read_table
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Export Parquet generation outputs or analysis results to JSON and/or CSV."
+    )
+    parser.add_argument(
+        "parquet_files",
+        type=str,
+        nargs="+",
+        help="Parquet files to export; each export is written next to its source file.",
+    )
+    parser.add_argument(
+        "--formats",
+        type=str,
+        nargs="+",
+        choices=["json", "csv"],
+        default=["json", "csv"],
+        help="Formats to export.",
+    )
+    parser.add_argument("--models", type=str, nargs="+", default=None, help="Only export these models.")
+    parser.add_argument("--temperatures", type=float, nargs="+", default=None, help="Only export these temperatures.")
+    parser.add_argument("--categories", type=str, nargs="+", default=None, help="Only export these categories.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    filters = build_filters(args.models, args.temperatures, args.categories)
+    for parquet_file in args.parquet_files:
+        source = Path(parquet_file)
+        df = read_table(source, filters=filters)
+        if "csv" in args.formats:
+            df.to_csv(source.with_suffix(".csv"), index=False, encoding="utf-8")
+        if "json" in args.formats:
+            with open(source.with_suffix(".json"), "w", encoding="utf-8") as f:
+                json.dump(df.to_dict(orient="records"), f, indent=2, ensure_ascii=False)
+        print(f"Exported {len(df)} rows of {source} as {', '.join(args.formats)}.")
+
+
+if __name__ == "__main__":
+    main()
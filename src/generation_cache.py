@@ -0,0 +1,160 @@
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+from analysis_cache import chunked
+
+DEFAULT_GENERATION_CACHE_DIR = ".generation_cache"
+DEFAULT_GENERATION_CACHE_MAX_MB = 256
+HASH_CHUNK_BYTES = 16 * 2**20
+
+
+def open_generation_cache_db(cache_dir: Path) -> sqlite3.Connection:
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(cache_dir / "completions.sqlite"), timeout=60, isolation_level=None)
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS model_files (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            sha256 TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS completions (
+            cache_key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            telemetry TEXT NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS completions_by_last_used ON completions (last_used);
+        """
+    )
+    return conn
+
+
+class CompletionCache:
+    """
+    Content-addressed store of generated completions.
+
+    The key is a hash of everything a seeded completion depends on: the SHA-256
+    of the GGUF file, the generation path (its sampler implementation), the full
+    prompt text, max_tokens, temperature, top_p and the seed. Each entry keeps
+    the response and the telemetry of the generation that produced it. Model file
+    hashes are remembered per (path, size, mtime), so a file is read once. When
+    the stored responses exceed max_bytes, the least recently used entries are
+    evicted.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | Path,
+        max_bytes: int = DEFAULT_GENERATION_CACHE_MAX_MB * 2**20,
+    ) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.conn = open_generation_cache_db(self.cache_dir)
+        self.hits = 0
+        self.misses = 0
+
+    def model_fingerprint(self, model_path: str | Path) -> str:
+        model_path = Path(model_path).resolve()
+        stat = model_path.stat()
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, sha256 FROM model_files WHERE path = ?", (str(model_path),)
+        ).fetchone()
+        if row is not None and (row[0], row[1]) == (stat.st_size, stat.st_mtime_ns):
+            return row[2]
+
+        digest = hashlib.sha256()
+        with open(model_path, "rb") as f:
+            while chunk := f.read(HASH_CHUNK_BYTES):
+                digest.update(chunk)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO model_files (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+            (str(model_path), stat.st_size, stat.st_mtime_ns, digest.hexdigest()),
+        )
+        return digest.hexdigest()
+
+    @staticmethod
+    def key(
+        model_fingerprint: str,
+        sampler: str,
+        prompt_text: str,
+        max_tokens: int,
+        temperature: float,
+        top_p: float,
+        seed: int,
+    ) -> str:
+        payload = json.dumps(
+            [model_fingerprint, sampler, prompt_text, max_tokens, temperature, top_p, seed], ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def contains(self, keys: list[str]) -> set[str]:
+        found: set[str] = set()
+        for chunk in chunked(list(dict.fromkeys(keys))):
+            placeholders = ",".join("?" * len(chunk))
+            found.update(
+                key for (key,) in self.conn.execute(
+                    f"SELECT cache_key FROM completions WHERE cache_key IN ({placeholders})", chunk
+                )
+            )
+        return found
+
+    def get(self, key: str) -> tuple[str, dict] | None:
+        """
+        (response, telemetry) of a cached completion, or None on a miss.
+        """
+        row = self.conn.execute("SELECT response, telemetry FROM completions WHERE cache_key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.conn.execute("UPDATE completions SET last_used = ? WHERE cache_key = ?", (time.time(), key))
+        return row[0], json.loads(row[1])
+
+    def put(self, key: str, response: str, telemetry: dict) -> None:
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO completions "
+            "(cache_key, response, telemetry, size_bytes, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, response, json.dumps(telemetry), len(response.encode("utf-8")), now, now),
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def evict(self) -> int:
+        """
+        Drop the least recently used completions until the stored responses fit in
+        max_bytes. Returns the number of evicted entries.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            total = self.conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM completions").fetchone()[0]
+            evicted = []
+            if total > self.max_bytes:
+                for key, size_bytes in self.conn.execute(
+                    "SELECT cache_key, size_bytes FROM completions ORDER BY last_used"
+                ).fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    evicted.append(key)
+                    total -= size_bytes
+                for chunk in chunked(evicted):
+                    placeholders = ",".join("?" * len(chunk))
+                    self.conn.execute(f"DELETE FROM completions WHERE cache_key IN ({placeholders})", chunk)
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return len(evicted)
+
+    def close(self) -> None:
+        self.conn.close()
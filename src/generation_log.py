@@ -0,0 +1,108 @@
+import csv
+import json
+import os
+from pathlib import Path
+from typing import Iterator
+
+KEY_FIELDS = ("model", "prompt", "repetition", "temperature", "top_p")
+
+
+def completion_key(row: dict) -> tuple:
+    return tuple(row[field] for field in KEY_FIELDS)
+
+
+def iter_log(log_path: Path) -> Iterator[dict]:
+    """
+    Yield the completions recorded in a JSONL log, skipping a torn last line.
+    """
+    if not log_path.exists():
+        return
+    with open(log_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def completed_keys(log_path: Path) -> set[tuple]:
+    return {completion_key(row) for row in iter_log(log_path)}
+
+
+class GenerationLog:
+    """
+    Append-only JSONL log with one completion per line. Every append is flushed
+    and fsynced, so a crash loses at most the completion being written.
+    """
+
+    def __init__(self, log_path: Path, resume: bool) -> None:
+        self.log_path = log_path
+        if resume and log_path.exists():
+            self._drop_torn_tail()
+            self.file = open(log_path, "a", encoding="utf-8")
+        else:
+            self.file = open(log_path, "w", encoding="utf-8")
+
+    def _drop_torn_tail(self) -> None:
+        with open(self.log_path, "rb+") as f:
+            data = f.read()
+            end = data.rfind(b"\n") + 1
+            if end != len(data):
+                f.truncate(end)
+
+    def append(self, row: dict) -> None:
+        self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def iter_unique(log_path: Path) -> Iterator[dict]:
+    """
+    Yield the first logged record of each completion key.
+    """
+    seen: set[tuple] = set()
+    for row in iter_log(log_path):
+        key = completion_key(row)
+        if key in seen:
+            continue
+        seen.add(key)
+        yield row
+
+
+def export_log_parquet(log_path: Path, parquet_path: Path) -> int:
+    """
+    Stream the deduplicated log into a Parquet file. Returns the number of exported completions.
+    """
+    from columnar_store import write_parquet_rows
+
+    return write_parquet_rows(iter_unique(log_path), parquet_path)
+
+
+def export_log(log_path: Path, json_path: Path, csv_path: Path) -> int:
+    """
+    Stream the log into the JSON array and CSV files, keeping the first record of
+    each completion key. Returns the number of exported completions.
+    """
+    count = 0
+    with open(json_path, "w", encoding="utf-8") as json_file, open(
+        csv_path, "w", newline="", encoding="utf-8"
+    ) as csv_file:
+        writer = None
+        for row in iter_unique(log_path):
+            if writer is None:
+                writer = csv.DictWriter(csv_file, fieldnames=list(row.keys()))
+                writer.writeheader()
+                json_file.write("[\n")
+            else:
+                json_file.write(",\n")
+            writer.writerow(row)
+            record = json.dumps(row, indent=2, ensure_ascii=False)
+            json_file.write("\n".join("  " + line for line in record.splitlines()))
+            count += 1
+
+        json_file.write("\n]" if count else "[]")
+    return count
@@ -0,0 +1,136 @@
+import multiprocessing as mp
+import struct
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import BinaryIO, Callable
+
+RAM_OVERHEAD_FACTOR = 1.15
+RAM_FIXED_OVERHEAD_BYTES = 512 * 2**20
+KV_CACHE_BYTES_PER_VALUE = 2  # llama.cpp keeps K and V in f16 by default
+# Used when the GGUF header cannot be read: a 7B model without grouped-query
+# attention (32 layers x 4096 x K and V x f16), the largest cache in the study.
+FALLBACK_KV_BYTES_PER_TOKEN = 32 * 4096 * 2 * KV_CACHE_BYTES_PER_VALUE
+
+_GGUF_SCALARS = {0: "B", 1: "b", 2: "H", 3: "h", 4: "I", 5: "i", 6: "f", 7: "?", 10: "Q", 11: "q", 12: "d"}
+_GGUF_STRING, _GGUF_ARRAY = 8, 9
+
+
+def _read_gguf_value(f: BinaryIO, value_type: int):
+    if value_type == _GGUF_STRING:
+        (length,) = struct.unpack("<Q", f.read(8))
+        return f.read(length).decode("utf-8", errors="replace")
+    if value_type == _GGUF_ARRAY:
+        item_type, count = struct.unpack("<IQ", f.read(12))
+        if item_type in _GGUF_SCALARS:
+            f.seek(count * struct.calcsize(_GGUF_SCALARS[item_type]), 1)
+        else:
+            for _ in range(count):
+                _read_gguf_value(f, item_type)
+        return None
+    fmt = "<" + _GGUF_SCALARS[value_type]
+    return struct.unpack(fmt, f.read(struct.calcsize(fmt)))[0]
+
+
+def read_gguf_metadata(model_path: Path) -> dict:
+    """
+    Scalar and string key/values of a GGUF (v2 or later) file header; arrays such
+    as the tokenizer vocabulary are skipped. Empty if the file is not GGUF.
+    """
+    metadata = {}
+    with open(model_path, "rb") as f:
+        if f.read(4) != b"GGUF":
+            return {}
+        version, _, kv_count = struct.unpack("<IQQ", f.read(20))
+        if version < 2:
+            return {}
+        for _ in range(kv_count):
+            key = _read_gguf_value(f, _GGUF_STRING)
+            (value_type,) = struct.unpack("<I", f.read(4))
+            value = _read_gguf_value(f, value_type)
+            if value is not None:
+                metadata[key] = value
+    return metadata
+
+
+def kv_cache_bytes_per_token(model_path: Path) -> int:
+    """
+    KV-cache bytes llama.cpp allocates per context token: K and V for every layer,
+    sized by the key/value heads (fewer than the query heads with grouped-query
+    attention) times the head dimension.
+    """
+    try:
+        metadata = read_gguf_metadata(model_path)
+        arch = metadata["general.architecture"]
+        layers = metadata[f"{arch}.block_count"]
+        embedding = metadata[f"{arch}.embedding_length"]
+        heads = metadata[f"{arch}.attention.head_count"]
+        kv_heads = metadata.get(f"{arch}.attention.head_count_kv", heads)
+    except (OSError, KeyError, struct.error, UnicodeDecodeError):
+        return FALLBACK_KV_BYTES_PER_TOKEN
+    return int(2 * layers * kv_heads * (embedding // heads) * KV_CACHE_BYTES_PER_VALUE)
+
+
+def estimate_model_ram_bytes(model_path: Path, n_ctx: int) -> int:
+    """
+    Rough resident-memory estimate for a GGUF model loaded with an n_ctx context:
+    the quantized weights as stored on disk with a margin for compute buffers,
+    plus the KV cache, which grows with n_ctx (ctx_size x batch_parallel).
+    """
+    weights = int(model_path.stat().st_size * RAM_OVERHEAD_FACTOR)
+    return weights + n_ctx * kv_cache_bytes_per_token(model_path) + RAM_FIXED_OVERHEAD_BYTES
+
+
+def run_concurrently(
+    jobs: list[dict],
+    target: Callable[..., dict],
+    max_parallel: int,
+    total_threads: int,
+    memory_budget_bytes: int,
+) -> list[dict]:
+    """
+    Run target(**job["kwargs"], threads=...) for every job, each in its own process.
+
+    A job is admitted only while fewer than max_parallel jobs are running and its
+    job["ram_bytes"] estimate fits into what is left of the memory budget; later
+    jobs that fit may overtake one that does not. The cores in total_threads are
+    split evenly among the max_parallel slots. A job that exceeds the whole budget
+    on its own is run alone. Returns the summaries in completion order.
+    """
+    threads = max(1, total_threads // max_parallel)
+    pending = list(jobs)
+    running: dict = {}
+    reserved = 0
+    summaries: list[dict] = []
+
+    with ProcessPoolExecutor(
+        max_workers=max_parallel,
+        mp_context=mp.get_context("spawn"),
+        max_tasks_per_child=1,
+    ) as pool:
+        while pending or running:
+            for job in list(pending):
+                if len(running) >= max_parallel:
+                    break
+                fits = reserved + job["ram_bytes"] <= memory_budget_bytes
+                if not fits and running:
+                    continue
+                if not fits:
+                    print(
+                        f"Warning: {job['name']} needs ~{job['ram_bytes'] / 2**30:.1f} GiB, "
+                        f"more than the {memory_budget_bytes / 2**30:.1f} GiB budget; running it alone."
+                    )
+                pending.remove(job)
+                reserved += job["ram_bytes"]
+                running[pool.submit(target, **job["kwargs"], threads=threads)] = job
+                print(
+                    f"Scheduled {job['name']} with {threads} threads "
+                    f"(~{job['ram_bytes'] / 2**30:.1f} GiB, {reserved / 2**30:.1f} GiB reserved)."
+                )
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                reserved -= job["ram_bytes"]
+                summaries.append(future.result())
+
+    return summaries
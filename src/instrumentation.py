@@ -0,0 +1,273 @@
+import argparse
+import cProfile
+import json
+import os
+import platform
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from system_resources import PeakRSS, peak_rss_bytes
+
+PROFILERS = ("cprofile", "sampling")
+DEFAULT_PROFILE_DIR = "profiles"
+DEFAULT_SAMPLING_INTERVAL_SECONDS = 0.005
+PROFILE_TOP_FUNCTIONS = 25
+# Set by run_trace() while a trace is recorded. An environment variable rather
+# than a global so that worker processes, forked or spawned, see it too.
+TRACING_ENV_VAR = "INSTRUMENTATION_TRACING"
+
+_stages: dict[str, dict] = {}
+_stages_lock = threading.Lock()
+_local = threading.local()
+
+
+def add_instrumentation_args(parser: argparse.ArgumentParser) -> argparse.ArgumentParser:
+    parser.add_argument(
+        "--profile",
+        type=str,
+        nargs="?",
+        const="cprofile",
+        choices=PROFILERS,
+        default=None,
+        help=(
+            "Profile the run: cprofile (deterministic, the default) or sampling (a low-overhead stack "
+            "sampler writing folded stacks for flame graphs). Dumps go to --profile_dir."
+        ),
+    )
+    parser.add_argument(
+        "--profile_dir",
+        type=str,
+        default=DEFAULT_PROFILE_DIR,
+        help="Folder for profiler dumps and, with --profile, the run's JSON trace.",
+    )
+    parser.add_argument(
+        "--trace_json",
+        type=str,
+        default=None,
+        help="Write the run's JSON trace (stage wall/CPU timers, peak RSS, profile summary) to this file.",
+    )
+    return parser
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a stage of the current run. Nested stages are recorded under
+    "outer/inner"; repeated stages accumulate calls, wall and CPU seconds, and
+    keep the highest RSS sampled while any of their calls ran. CPU time and RSS
+    are those of the whole process, so they include helper threads. Outside a
+    trace (no --trace_json or --profile) nothing is timed or sampled.
+    """
+    if not os.environ.get(TRACING_ENV_VAR):
+        yield
+        return
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(name)
+    path = "/".join(stack)
+    rss = PeakRSS().start()
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall_started
+        cpu = time.process_time() - cpu_started
+        stack.pop()
+        merge_stages({path: {"calls": 1, "wall_seconds": wall, "cpu_seconds": cpu, "peak_rss_bytes": rss.stop()}})
+
+
+def merge_stages(stages: dict[str, dict]) -> None:
+    """
+    Add stage timings, e.g. those returned by drain_stages() in a worker process,
+    to this process's totals.
+    """
+    with _stages_lock:
+        for path, timing in stages.items():
+            total = _stages.setdefault(path, {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_rss_bytes": None})
+            total["calls"] += timing["calls"]
+            total["wall_seconds"] += timing["wall_seconds"]
+            total["cpu_seconds"] += timing["cpu_seconds"]
+            if timing["peak_rss_bytes"] is not None:
+                total["peak_rss_bytes"] = max(total["peak_rss_bytes"] or 0, timing["peak_rss_bytes"])
+
+
+def drain_stages() -> dict[str, dict]:
+    """
+    Stage timings recorded in this process since the last drain. Worker processes
+    return these with their results so the parent's trace covers them too.
+    """
+    with _stages_lock:
+        stages = dict(_stages)
+        _stages.clear()
+    return stages
+
+
+class StackSampler:
+    """
+    Sampling profiler for one thread: a daemon thread records the thread's stack
+    every interval_seconds. Counts are kept per folded stack, the input format
+    of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id: int, interval_seconds: float = DEFAULT_SAMPLING_INTERVAL_SECONDS) -> None:
+        self.thread_id = thread_id
+        self.interval_seconds = interval_seconds
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path: Path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def top_functions(self, limit: int = PROFILE_TOP_FUNCTIONS) -> list[dict]:
+        total = sum(self.stacks.values())
+        inclusive: Counter = Counter()
+        own: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            for function in set(frames):
+                inclusive[function] += count
+            own[frames[-1]] += count
+        return [
+            {
+                "function": function,
+                "own_samples": samples,
+                "own_fraction": round(samples / total, 4),
+                "inclusive_fraction": round(inclusive[function] / total, 4),
+            }
+            for function, samples in own.most_common(limit)
+        ]
+
+
+def cprofile_top_functions(profiler: cProfile.Profile, limit: int = PROFILE_TOP_FUNCTIONS) -> list[dict]:
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {
+            "function": f"{name} ({Path(filename).name}:{line})",
+            "calls": calls,
+            "own_seconds": round(own, 4),
+            "cumulative_seconds": round(cumulative, 4),
+        }
+        for (filename, line, name), (_, calls, own, cumulative, _) in rows
+    ]
+
+
+@contextmanager
+def run_trace(entry_point: str, args: argparse.Namespace):
+    """
+    Instrument one run of an entry point. With --profile the run is profiled and
+    the dump is written to --profile_dir. The JSON trace is written to --trace_json
+    or, with --profile, next to the dump. It holds wall and CPU time, peak RSS, the
+    stage timers and the most expensive functions. Stages timed in worker processes
+    appear only if the workers' drain_stages() are merged back.
+    """
+    profiler_name = getattr(args, "profile", None)
+    profile_dir = Path(getattr(args, "profile_dir", DEFAULT_PROFILE_DIR))
+    run_stem = f"{entry_point}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    trace_path = getattr(args, "trace_json", None)
+    if trace_path is None and profiler_name is not None:
+        trace_path = profile_dir / f"{run_stem}.trace.json"
+
+    profiler: cProfile.Profile | StackSampler | None = None
+    if profiler_name == "cprofile":
+        profiler = cProfile.Profile()
+    elif profiler_name == "sampling":
+        profiler = StackSampler(threading.get_ident())
+
+    started_at = datetime.now().isoformat()
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    status = "ok"
+    tracing_before = os.environ.get(TRACING_ENV_VAR)
+    if trace_path is not None:
+        os.environ[TRACING_ENV_VAR] = "1"
+    if profiler is not None:
+        (profiler.enable if isinstance(profiler, cProfile.Profile) else profiler.start)()
+    try:
+        yield
+    except BaseException as e:
+        status = type(e).__name__
+        raise
+    finally:
+        if tracing_before is None:
+            os.environ.pop(TRACING_ENV_VAR, None)
+        else:
+            os.environ[TRACING_ENV_VAR] = tracing_before
+        profile = None
+        if profiler is not None:
+            profile_dir.mkdir(parents=True, exist_ok=True)
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+                dump_path = profile_dir / f"{run_stem}.prof"
+                profiler.dump_stats(str(dump_path))
+                top_functions = cprofile_top_functions(profiler)
+            else:
+                profiler.stop()
+                dump_path = profile_dir / f"{run_stem}.folded"
+                profiler.dump(dump_path)
+                top_functions = profiler.top_functions()
+            profile = {"profiler": profiler_name, "dump": str(dump_path), "top_functions": top_functions}
+            print(f"Profile written to {dump_path}.")
+
+        if trace_path is not None:
+            peak_rss = peak_rss_bytes()
+            trace = {
+                "entry_point": entry_point,
+                "argv": sys.argv[1:],
+                "started_at": started_at,
+                "finished_at": datetime.now().isoformat(),
+                "status": status,
+                "wall_seconds": round(time.perf_counter() - wall_started, 4),
+                "cpu_seconds": round(time.process_time() - cpu_started, 4),
+                "peak_rss_mb": round(peak_rss / 2**20, 1) if peak_rss is not None else None,
+                "machine": {
+                    "platform": platform.platform(),
+                    "python": platform.python_version(),
+                    "cpu_count": os.cpu_count(),
+                },
+                "stages": {
+                    path: {
+                        "calls": timing["calls"],
+                        "wall_seconds": round(timing["wall_seconds"], 4),
+                        "cpu_seconds": round(timing["cpu_seconds"], 4),
+                        "peak_rss_mb": round(timing["peak_rss_bytes"] / 2**20, 1)
+                        if timing["peak_rss_bytes"] is not None
+                        else None,
+                    }
+                    for path, timing in drain_stages().items()
+                },
+                "profile": profile,
+            }
+            Path(trace_path).parent.mkdir(parents=True, exist_ok=True)
+            with open(trace_path, "w", encoding="utf-8") as f:
+                json.dump(trace, f, indent=2)
+            print(f"Trace written to {trace_path}.")
@@ -1,13 +1,28 @@
 import os
 import json
-import csv
 import time
 import gc
 import argparse
+import hashlib
+from collections import Counter, deque
+from concurrent.futures import Future
 from datetime import datetime
 from pathlib import Path
 
-from llama_cpp import Llama
+import llama_cpp
+import numpy as np
+from llama_cpp import Llama, __version__ as llama_cpp_version
+
+from batch_engine import BatchedGenerator
+from generation_cache import DEFAULT_GENERATION_CACHE_DIR, DEFAULT_GENERATION_CACHE_MAX_MB, CompletionCache
+from generation_log import GenerationLog, completed_keys, export_log, export_log_parquet
+from generation_scheduler import estimate_model_ram_bytes, run_concurrently
+from instrumentation import add_instrumentation_args, drain_stages, merge_stages, run_trace, stage
+from prompt_prefix import PromptPrefix, eval_timings_ms
+from prompts import DEFAULT_REPETITIONS, load_prompts
+from results_store import ingest_paths
+from system_resources import PeakRSS, available_memory_bytes, physical_core_count
+from throttle import DEFAULT_LOAD_RATIO, DEFAULT_MAX_PAUSE_SECONDS, AdaptiveThrottle
 
 # ========== DEFAULT CONFIGURATION ==========
 MODELS = {
@@ -18,13 +33,22 @@ MODELS = {
     "stablelm": "stablelm-zephyr-3b.Q4_K_M.gguf",
 }
 
-DEFAULT_REPETITIONS = 10
 DEFAULT_TEMPERATURE = 0.7
 DEFAULT_TOP_P = 0.95
 DEFAULT_MAX_TOKENS = 100
 DEFAULT_CTX_SIZE = 2048
 DEFAULT_THREADS = 4
-DEFAULT_SLEEP = 0.2
+DEFAULT_SWEEP_TEMPERATURES = [0.2, 0.7, 1.0]
+DEFAULT_SWEEP_TOP_PS = [0.95]
+PROMPT_TEMPLATE = "Question: {prompt}\nAnswer:"
+TELEMETRY_FIELDS = (
+    "prompt_tokens",
+    "completion_tokens",
+    "prompt_eval_ms",
+    "decode_ms",
+    "generation_ms",
+    "finish_reason",
+)
 
 
 def parse_args() -> argparse.Namespace:
@@ -41,7 +65,31 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--max_tokens", type=int, default=DEFAULT_MAX_TOKENS)
     parser.add_argument("--repetitions", type=int, default=DEFAULT_REPETITIONS)
     parser.add_argument("--ctx_size", type=int, default=DEFAULT_CTX_SIZE)
-    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS)
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help=(
+            f"Threads per model. Defaults to {DEFAULT_THREADS} when running sequentially, "
+            "or the physical cores split among --parallel_models."
+        ),
+    )
+    parser.add_argument(
+        "--parallel_models",
+        type=int,
+        default=1,
+        help="Number of models to run concurrently, each in its own process.",
+    )
+    parser.add_argument(
+        "--memory_budget_gb",
+        type=float,
+        default=None,
+        help=(
+            "RAM budget for concurrently loaded models, estimated from GGUF file sizes plus the KV cache of "
+            "ctx_size x batch_parallel tokens. "
+            "Defaults to 90%% of the currently available memory."
+        ),
+    )
     parser.add_argument(
         "--models_dir",
         type=str,
@@ -68,30 +116,128 @@ def parse_args() -> argparse.Namespace:
         type=str,
         default=None,
         help=(
-            "Optional run folder name, e.g. temp_0_2. "
+            "Optional run folder name, e.g. temp_0_2. May contain {temperature} and {top_p} "
+            "placeholders (e.g. temp_{temperature}), which --sweep fills per condition. "
             "If omitted, one will be generated from temperature/top_p."
         ),
     )
     parser.add_argument(
+        "--sweep",
+        action="store_true",
+        help=(
+            "Run every (temperature, top_p) combination of --temperatures x --top_ps, "
+            "loading each model only once."
+        ),
+    )
+    parser.add_argument(
+        "--temperatures",
+        type=float,
+        nargs="+",
+        default=DEFAULT_SWEEP_TEMPERATURES,
+        help="Temperatures used by --sweep.",
+    )
+    parser.add_argument(
+        "--top_ps",
+        type=float,
+        nargs="+",
+        default=DEFAULT_SWEEP_TOP_PS,
+        help="top_p values used by --sweep.",
+    )
+    parser.add_argument(
+        "--no_prefix_reuse",
+        action="store_true",
+        help="Evaluate the prompt again for every repetition instead of resuming from its cached state.",
+    )
+    parser.add_argument(
+        "--batch_parallel",
+        type=int,
+        default=1,
+        help=(
+            "Number of sequences decoded together in each llama.cpp batch (continuous batching). "
+            "The context is enlarged to --ctx_size x this value. 1 keeps the sequential path."
+        ),
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=(
+            "Continue from the JSONL completion logs in the output folders, skipping "
+            "(model, prompt, repetition, temperature, top_p) tuples that are already done."
+        ),
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=None,
+        help=(
+            "Run only slice i of N of every condition, e.g. 2/4. The (prompt, repetition) cells are "
+            "dealt round-robin and written to *_shard_i_of_N files; merge them with merge_shards.py."
+        ),
+    )
+    parser.add_argument(
+        "--generation_cache",
+        type=str,
+        default=DEFAULT_GENERATION_CACHE_DIR,
+        help=(
+            "Directory of the completion cache. A completion with the same model file, prompt, "
+            "decoding parameters and seed is copied from it instead of being generated again."
+        ),
+    )
+    parser.add_argument(
+        "--no_generation_cache",
+        action="store_true",
+        help="Generate every completion and leave the completion cache untouched.",
+    )
+    parser.add_argument(
+        "--generation_cache_max_mb",
+        type=float,
+        default=DEFAULT_GENERATION_CACHE_MAX_MB,
+        help="Size of the cached responses above which the least recently used ones are evicted.",
+    )
+    parser.add_argument(
+        "--export_json_csv",
+        action="store_true",
+        help="Also export each condition as indented JSON and CSV next to the Parquet file.",
+    )
+    parser.add_argument(
+        "--results_db",
+        type=str,
+        default=None,
+        help="SQLite results store to ingest each finished condition into (see results_store.py).",
+    )
+    parser.add_argument(
+        "--max_throttle_seconds",
         "--sleep_seconds",
+        dest="max_throttle_seconds",
+        type=float,
+        default=DEFAULT_MAX_PAUSE_SECONDS,
+        help=(
+            "Longest pause between generations when contention (load, memory pressure or a "
+            "tokens/s drop) is detected. No pause is taken otherwise; 0 disables throttling."
+        ),
+    )
+    parser.add_argument(
+        "--throttle_load_ratio",
         type=float,
-        default=DEFAULT_SLEEP,
-        help="Pause between generations to reduce local contention.",
+        default=DEFAULT_LOAD_RATIO,
+        help="1-minute load average per CPU above which generation is throttled.",
     )
+    add_instrumentation_args(parser)
     return parser.parse_args()
 
 
-def load_prompts(prompts_file: str) -> list[dict]:
-    with open(prompts_file, "r", encoding="utf-8") as f:
-        prompts = json.load(f)
-    if not isinstance(prompts, list) or not prompts:
-        raise ValueError("prompts.json must contain a non-empty list of prompt records.")
-    return prompts
+def condition_suffix(temperature: float, top_p: float) -> str:
+    return f"temp_{str(temperature).replace('.', '_')}_top_p_{str(top_p).replace('.', '_')}"
 
 
 def build_output_dir(output_root: str, run_tag: str | None, temperature: float, top_p: float) -> Path:
     if run_tag is None:
-        run_tag = f"temp_{str(temperature).replace('.', '_')}_top_p_{str(top_p).replace('.', '_')}"
+        run_tag = condition_suffix(temperature, top_p)
+    else:
+        run_tag = run_tag.format(
+            temperature=str(temperature).replace(".", "_"),
+            top_p=str(top_p).replace(".", "_"),
+        )
     output_dir = Path(output_root) / run_tag
     output_dir.mkdir(parents=True, exist_ok=True)
     return output_dir
@@ -116,112 +262,575 @@ def resolve_model_path(models_dir: str, model_file: str) -> Path:
     )
 
 
-def query_model(model: Llama, prompt: str, max_tokens: int, temperature: float, top_p: float) -> str:
+def format_prompt(prompt: str) -> str:
+    return PROMPT_TEMPLATE.format(prompt=prompt)
+
+
+def completion_seed(model_name: str, prompt: str, repetition: int, temperature: float, top_p: float) -> int:
+    """
+    Sampling seed of one completion, derived from its key so that it does not
+    depend on the order completions run in or on how the grid is sharded.
+    """
+    key = json.dumps([model_name, prompt, repetition, temperature, top_p], ensure_ascii=False)
+    return int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:4], "little") & 0x7FFFFFFF
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"--shard must look like i/N, got '{value}'")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"--shard index must be between 1 and N, got '{value}'")
+    return index, count
+
+
+def in_shard(position: int, shard: tuple[int, int] | None) -> bool:
+    return shard is None or position % shard[1] == shard[0] - 1
+
+
+def query_model(
+    model: Llama, prompt: str, max_tokens: int, temperature: float, top_p: float, seed: int | None = None
+) -> tuple[str, dict]:
+    """
+    Return the stripped completion and its stats: prompt and completion tokens,
+    llama.cpp prompt-eval and decode ms, and the finish reason.
+    """
+    llama_cpp.llama_reset_timings(model._ctx.ctx)
     output = model(
-        f"Question: {prompt}\nAnswer:",
+        format_prompt(prompt),
         max_tokens=max_tokens,
         temperature=temperature,
         top_p=top_p,
+        seed=seed,
     )
-    return output["choices"][0]["text"].strip()
+    prompt_eval_ms, decode_ms = eval_timings_ms(model)
+    usage = output.get("usage", {})
+    return output["choices"][0]["text"].strip(), {
+        "prompt_tokens": int(usage.get("prompt_tokens", 0)),
+        "completion_tokens": int(usage.get("completion_tokens", 0)),
+        "prompt_eval_ms": prompt_eval_ms,
+        "decode_ms": decode_ms,
+        "finish_reason": output["choices"][0].get("finish_reason"),
+    }
 
 
-def run_experiment(
+def condition_paths(
+    output_dir: Path, model_name: str, temperature: float, top_p: float, shard: tuple[int, int] | None = None
+) -> dict[str, Path]:
+    stem = f"self_reference_{model_name}_{condition_suffix(temperature, top_p)}"
+    if shard is not None:
+        stem += f"_shard_{shard[0]}_of_{shard[1]}"
+    paths = {ext: output_dir / f"{stem}.{ext}" for ext in ("jsonl", "parquet", "json", "csv")}
+    paths["performance"] = output_dir / f"{stem}_performance.json"
+    return paths
+
+
+def pending_repetitions(
+    done: set[tuple],
+    model_name: str,
+    prompt_index: int,
+    prompt: str,
+    repetitions: int,
+    temperature: float,
+    top_p: float,
+    shard: tuple[int, int] | None = None,
+) -> list[int]:
+    """
+    Repetitions of one prompt still to generate. With a shard (i, N), the
+    (prompt, repetition) cells of the grid are dealt round-robin in prompt-file
+    order and only every N-th one, starting at the i-th, is kept.
+    """
+    return [
+        rep
+        for rep in range(1, repetitions + 1)
+        if in_shard(prompt_index * repetitions + rep - 1, shard)
+        and (model_name, prompt, rep, temperature, top_p) not in done
+    ]
+
+
+def condition_jobs(
     model_name: str,
-    model_file: str,
     prompts: list[dict],
-    models_dir: str,
-    output_dir: Path,
+    done: set[tuple],
     temperature: float,
     top_p: float,
-    max_tokens: int,
     repetitions: int,
-    ctx_size: int,
-    threads: int,
-    sleep_seconds: float,
-) -> None:
-    model_path = resolve_model_path(models_dir, model_file)
+    shard: tuple[int, int] | None = None,
+) -> list[dict]:
+    """
+    Pending completions of one condition in prompt then repetition order. A job
+    holds category, prompt, repetition and seed.
+    """
+    return [
+        {
+            "category": entry["category"],
+            "prompt": entry["prompt"],
+            "repetition": repetition,
+            "seed": completion_seed(model_name, entry["prompt"], repetition, temperature, top_p),
+        }
+        for index, entry in enumerate(prompts)
+        for repetition in pending_repetitions(
+            done, model_name, index, entry["prompt"], repetitions, temperature, top_p, shard
+        )
+    ]
+
+
+def generation_sampler(prefix_reuse: bool, batch_parallel: int) -> str:
+    """
+    Name of the sampling implementation a completion comes from; the same seed
+    gives different text on different paths, so it is part of the cache key.
+    """
+    path = "batched" if batch_parallel > 1 else "prompt_prefix" if prefix_reuse else "call"
+    return f"{path}/llama_cpp {llama_cpp_version}"
 
+
+def generate_completions(
+    model: Llama,
+    jobs: list[dict],
+    temperature: float,
+    top_p: float,
+    max_tokens: int,
+    prefix_reuse: bool,
+    engine: BatchedGenerator | None,
+    cache: CompletionCache | None = None,
+):
+    """
+    Yield (job, response, telemetry, seconds, cached) for every job in order, where
+    the telemetry holds TELEMETRY_FIELDS. Jobs with a cache_key found in the cache
+    are answered from it, with the telemetry of the run that generated them,
+    without touching the model. With an engine, up to 2 x n_parallel requests are
+    kept in flight; generation_ms and decode_ms are then each request's own
+    latency and decode time, while seconds is the wall time since the previous
+    completion, so the seconds add up to the wall time of the condition but say
+    nothing about any single request.
+    """
+
+    def lookup(job: dict) -> tuple[str, dict] | None:
+        return cache.get(job["cache_key"]) if cache is not None else None
+
+    def finish(job: dict, response: str, stats: dict, seconds: float) -> dict:
+        telemetry = {field: stats.get(field) for field in TELEMETRY_FIELDS}
+        if telemetry["generation_ms"] is None:
+            telemetry["generation_ms"] = round(seconds * 1000, 3)
+        if cache is not None:
+            cache.put(job["cache_key"], response, telemetry)
+        return telemetry
+
+    if engine is not None:
+        in_flight: deque = deque()
+        submitted = 0
+        last = time.perf_counter()
+        while submitted < len(jobs) or in_flight:
+            while submitted < len(jobs) and len(in_flight) < 2 * engine.n_parallel:
+                job = jobs[submitted]
+                hit = lookup(job)
+                if hit is not None:
+                    future: Future = Future()
+                    future.set_result(hit)
+                else:
+                    future = engine.submit(format_prompt(job["prompt"]), max_tokens, temperature, top_p, seed=job["seed"])
+                in_flight.append((job, future, hit is not None))
+                submitted += 1
+            job, future, cached = in_flight.popleft()
+            response, stats = future.result()
+            now = time.perf_counter()
+            if cached:
+                yield job, response, {field: stats.get(field) for field in TELEMETRY_FIELDS}, 0.0, True
+            else:
+                yield job, response, finish(job, response, stats, now - last), now - last, False
+            last = time.perf_counter()
+        return
+
+    prefix, prefix_prompt = None, None
+    for job in jobs:
+        hit = lookup(job)
+        if hit is not None:
+            yield job, hit[0], {field: hit[1].get(field) for field in TELEMETRY_FIELDS}, 0.0, True
+            continue
+        prompt = job["prompt"]
+        if prefix_reuse and prompt != prefix_prompt:
+            prefix, prefix_prompt = PromptPrefix(model, format_prompt(prompt)), prompt
+        started = time.perf_counter()
+        if prefix is not None:
+            response, stats = prefix.complete(max_tokens, temperature, top_p, seed=job["seed"])
+        else:
+            response, stats = query_model(model, prompt, max_tokens, temperature, top_p, seed=job["seed"])
+        elapsed = time.perf_counter() - started
+        yield job, response, finish(job, response, stats, elapsed), elapsed, False
+
+
+def performance_summary(telemetry: list[dict], generation_seconds: float) -> dict:
+    """
+    Latency percentiles and throughput over generated completions (cache hits
+    excluded); generation_seconds is the wall time they took together.
+    """
+    summary: dict = {"completions": len(telemetry)}
+    for field in ("generation_ms", "prompt_eval_ms", "decode_ms"):
+        values = [t[field] for t in telemetry if t.get(field) is not None]
+        summary[f"{field}_p50"] = round(float(np.percentile(values, 50)), 3) if values else None
+        summary[f"{field}_p95"] = round(float(np.percentile(values, 95)), 3) if values else None
+    completion_tokens = sum(t["completion_tokens"] or 0 for t in telemetry)
+    decode_ms = sum(t["decode_ms"] or 0.0 for t in telemetry)
+    summary["prompt_tokens"] = sum(t["prompt_tokens"] or 0 for t in telemetry)
+    summary["completion_tokens"] = completion_tokens
+    summary["generation_seconds"] = round(generation_seconds, 3)
+    summary["tokens_per_second"] = round(completion_tokens / generation_seconds, 2) if generation_seconds > 0 else 0.0
+    summary["decode_tokens_per_second"] = round(completion_tokens / decode_ms * 1000, 2) if decode_ms > 0 else None
+    summary["finish_reasons"] = dict(Counter(t["finish_reason"] for t in telemetry))
+    return summary
+
+
+def run_condition(
+    model: Llama,
+    model_name: str,
+    jobs: list[dict],
+    paths: dict[str, Path],
+    temperature: float,
+    top_p: float,
+    max_tokens: int,
+    throttle: AdaptiveThrottle,
+    prefix_reuse: bool = True,
+    resume: bool = False,
+    export_json_csv: bool = False,
+    results_db: str | None = None,
+    engine: BatchedGenerator | None = None,
+    cache: CompletionCache | None = None,
+    run_info: dict | None = None,
+) -> dict:
+    """
+    Generate (or copy from the cache) the given jobs into the condition's files and
+    write a performance summary of the generated completions next to them;
+    run_info (model load settings and timings) is included in that summary. Its
+    peak_rss_mb is the highest RSS sampled while this condition ran, not the
+    lifetime peak of the process.
+    """
     print(
         f"\nRunning: {model_name} | temp={temperature} | top_p={top_p} | "
-        f"max_tokens={max_tokens} | repetitions={repetitions}"
+        f"max_tokens={max_tokens} | pending={len(jobs)}"
     )
-    print(f"Model path: {model_path}")
 
-    model = Llama(model_path=str(model_path), n_ctx=ctx_size, n_threads=threads)
+    rss = PeakRSS().start()
+    log = GenerationLog(paths["jsonl"], resume=resume)
+    generated: list[dict] = []
+    cached_completions = 0
+    generation_seconds = 0.0
+    with stage("generation"):
+        try:
+            for job, response, telemetry, elapsed, cached in generate_completions(
+                model, jobs, temperature, top_p, max_tokens, prefix_reuse, engine, cache
+            ):
+                if cached:
+                    cached_completions += 1
+                else:
+                    generated.append(telemetry)
+                    generation_seconds += elapsed
+                    # With the batched engine elapsed is the gap since the previous result, close to
+                    # zero when several sequences finish in the same step, so the slowdown signal uses
+                    # the request's own decode time instead.
+                    decode_seconds = elapsed if engine is None else (telemetry["decode_ms"] or 0.0) / 1000
+                    throttle.observe(telemetry["completion_tokens"], decode_seconds)
+                log.append(
+                    {
+                        "timestamp": datetime.utcnow().isoformat(),
+                        "model": model_name,
+                        "category": job["category"],
+                        "prompt": job["prompt"],
+                        "repetition": job["repetition"],
+                        "response": response,
+                        "temperature": temperature,
+                        "top_p": top_p,
+                        "max_tokens": max_tokens,
+                        "seed": job["seed"],
+                        **telemetry,
+                    }
+                )
+                print(f"[{model_name}]{' (cached)' if cached else ''} {job['prompt']} -> {response[:80]}...")
+                if not cached:
+                    throttle.wait()
+        finally:
+            log.close()
 
-    results: list[dict] = []
-    for entry in prompts:
-        prompt = entry["prompt"]
-        category = entry["category"]
-        for i in range(repetitions):
-            response = query_model(model, prompt, max_tokens, temperature, top_p)
-            results.append(
-                {
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "model": model_name,
-                    "category": category,
-                    "prompt": prompt,
-                    "repetition": i + 1,
-                    "response": response,
-                    "temperature": temperature,
-                    "top_p": top_p,
-                    "max_tokens": max_tokens,
-                }
-            )
-            print(f"[{model_name}] {prompt} -> {response[:80]}...")
-            time.sleep(sleep_seconds)
+    with stage("export"):
+        export_log_parquet(paths["jsonl"], paths["parquet"])
+        if export_json_csv:
+            export_log(paths["jsonl"], paths["json"], paths["csv"])
+        if results_db is not None:
+            ingest_paths(results_db, [str(paths["parquet"])])
+
+    peak_rss = rss.stop()
+    with open(paths["performance"], "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                **(run_info or {}),
+                "model": model_name,
+                "temperature": temperature,
+                "top_p": top_p,
+                "max_tokens": max_tokens,
+                "cached_completions": cached_completions,
+                **performance_summary(generated, generation_seconds),
+                "peak_rss_mb": round(peak_rss / 2**20, 1) if peak_rss is not None else None,
+            },
+            f,
+            indent=2,
+        )
+
+    print(f"Finished: {model_name} | temp={temperature} | top_p={top_p}. Results saved to {paths['jsonl'].parent}")
+    return {
+        "temperature": temperature,
+        "top_p": top_p,
+        "completions": len(generated),
+        "cached_completions": cached_completions,
+        "completion_tokens": sum(t["completion_tokens"] for t in generated),
+        "generation_seconds": generation_seconds,
+        "telemetry": generated,
+    }
+
+
+def run_experiment(
+    model_name: str,
+    model_file: str,
+    prompts: list[dict],
+    models_dir: str,
+    conditions: list[dict],
+    max_tokens: int,
+    repetitions: int,
+    ctx_size: int,
+    threads: int,
+    max_throttle_seconds: float,
+    throttle_load_ratio: float = DEFAULT_LOAD_RATIO,
+    prefix_reuse: bool = True,
+    resume: bool = False,
+    export_json_csv: bool = False,
+    results_db: str | None = None,
+    batch_parallel: int = 1,
+    shard: tuple[int, int] | None = None,
+    generation_cache_dir: str | None = None,
+    generation_cache_max_mb: float = DEFAULT_GENERATION_CACHE_MAX_MB,
+) -> dict:
+    """
+    Load one model and generate every decoding condition with it. Each condition is
+    a dict with temperature, top_p and the output_dir its files are written to.
+    With resume, completions already logged are skipped; with a generation cache,
+    completions generated before with the same model file, prompt, parameters and
+    seed are copied from it. The model is only loaded if something is left to generate.
+    With batch_parallel > 1 the completions are generated by a BatchedGenerator that
+    decodes that many sequences per step, and the context is enlarged to match.
+    The summary's peak_rss_mb is sampled from before the model load until the
+    last condition finished, so it is this model's own.
+    """
+    model_path = resolve_model_path(models_dir, model_file)
+    cache = None
+    if generation_cache_dir is not None:
+        cache = CompletionCache(generation_cache_dir, max_bytes=int(generation_cache_max_mb * 2**20))
+        fingerprint = cache.model_fingerprint(model_path)
+        sampler = generation_sampler(prefix_reuse, batch_parallel)
 
-    suffix = f"temp_{str(temperature).replace('.', '_')}_top_p_{str(top_p).replace('.', '_')}"
-    json_path = output_dir / f"self_reference_{model_name}_{suffix}.json"
-    csv_path = output_dir / f"self_reference_{model_name}_{suffix}.csv"
+    plans = []
+    for condition in conditions:
+        temperature, top_p = condition["temperature"], condition["top_p"]
+        paths = condition_paths(condition["output_dir"], model_name, temperature, top_p, shard)
+        done = completed_keys(paths["jsonl"]) if resume else set()
+        if done:
+            print(f"Resuming from {paths['jsonl']} ({len(done)} completions already logged).")
+        jobs = condition_jobs(model_name, prompts, done, temperature, top_p, repetitions, shard)
+        if cache is not None:
+            for job in jobs:
+                job["cache_key"] = cache.key(
+                    fingerprint, sampler, format_prompt(job["prompt"]), max_tokens, temperature, top_p, job["seed"]
+                )
+        plans.append((condition, paths, jobs))
 
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+    rss = PeakRSS().start()
+    all_jobs = [job for _, _, jobs in plans for job in jobs]
+    to_generate = len(all_jobs)
+    if cache is not None:
+        to_generate -= len(cache.contains([job["cache_key"] for job in all_jobs]))
+    if to_generate == 0:
+        print(f"\nSkipping model load: {model_name} ({len(all_jobs)} pending completion(s), all cached).")
+        model = None
+        load_seconds = 0.0
+    else:
+        print(f"\nLoading: {model_name} | model path: {model_path} | {to_generate} completion(s) to generate")
+        load_started = time.perf_counter()
+        with stage("model_load"):
+            model = Llama(model_path=str(model_path), n_ctx=ctx_size * batch_parallel, n_threads=threads)
+        load_seconds = time.perf_counter() - load_started
+    engine = BatchedGenerator(model, batch_parallel) if model is not None and batch_parallel > 1 else None
 
-    with open(csv_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
-        writer.writeheader()
-        writer.writerows(results)
+    throttle = AdaptiveThrottle(max_pause_seconds=max_throttle_seconds, load_ratio=throttle_load_ratio)
+    run_info = {
+        "model_file": model_path.name,
+        "threads": threads,
+        "ctx_size": ctx_size,
+        "batch_parallel": batch_parallel,
+        "prefix_reuse": prefix_reuse,
+        "load_seconds": round(load_seconds, 3),
+    }
+    condition_summaries = [
+        run_condition(
+            model=model,
+            model_name=model_name,
+            jobs=jobs,
+            paths=paths,
+            temperature=condition["temperature"],
+            top_p=condition["top_p"],
+            max_tokens=max_tokens,
+            throttle=throttle,
+            prefix_reuse=prefix_reuse,
+            resume=resume,
+            export_json_csv=export_json_csv,
+            results_db=results_db,
+            engine=engine,
+            cache=cache,
+            run_info=run_info,
+        )
+        for condition, paths, jobs in plans
+    ]
+    if engine is not None:
+        engine.close()
+        print(
+            f"[{model_name}] batched decoding: {engine.decode_calls} decode calls, "
+            f"{engine.batch_tokens / max(engine.decode_calls, 1):.1f} tokens per batch on average."
+        )
+    cache_hits = cache_misses = 0
+    if cache is not None:
+        cache_hits, cache_misses = cache.hits, cache.misses
+        evicted = cache.evict()
+        print(
+            f"[{model_name}] generation cache: {cache_hits} hit(s), {cache_misses} miss(es) "
+            f"({cache.hit_rate:.1%} hit rate), {evicted} entr{'y' if evicted == 1 else 'ies'} evicted."
+        )
+        cache.close()
 
-    print(f"Finished: {model_name}. Results saved to {output_dir}")
+    print(f"Finished: {model_name}.")
+    peak_rss = rss.stop()
     del model
     gc.collect()
 
+    completion_tokens = sum(c["completion_tokens"] for c in condition_summaries)
+    generation_seconds = sum(c["generation_seconds"] for c in condition_summaries)
+    performance = performance_summary([t for c in condition_summaries for t in c["telemetry"]], generation_seconds)
+    return {
+        "model": model_name,
+        "threads": threads,
+        "conditions": len(condition_summaries),
+        "completions": sum(c["completions"] for c in condition_summaries),
+        "cached_completions": sum(c["cached_completions"] for c in condition_summaries),
+        "cache_hits": cache_hits,
+        "cache_misses": cache_misses,
+        "completion_tokens": completion_tokens,
+        "load_seconds": round(load_seconds, 3),
+        "generation_seconds": round(generation_seconds, 3),
+        "tokens_per_second": round(completion_tokens / generation_seconds, 2) if generation_seconds > 0 else 0.0,
+        "latency_ms_p50": performance["generation_ms_p50"],
+        "latency_ms_p95": performance["generation_ms_p95"],
+        "peak_rss_mb": round(peak_rss / 2**20, 1) if peak_rss is not None else None,
+        "throttled_seconds": round(throttle.throttled_seconds, 3),
+        "throttle_pauses": throttle.pauses,
+        "stages": drain_stages(),
+    }
+
+
+def print_throughput(summaries: list[dict]) -> None:
+    print("\nThroughput per model:")
+    for summary in sorted(summaries, key=lambda s: s["model"]):
+        print(
+            f"  {summary['model']:<10} {summary['tokens_per_second']:>8.2f} tokens/s "
+            f"({summary['completion_tokens']} tokens in {summary['generation_seconds']:.1f}s "
+            f"over {summary['conditions']} condition(s), load {summary['load_seconds']:.1f}s, "
+            f"{summary['threads']} threads, throttled {summary['throttled_seconds']:.1f}s "
+            f"in {summary['throttle_pauses']} pause(s), {summary['cached_completions']} completion(s) from cache)"
+        )
+        if summary["latency_ms_p50"] is not None:
+            print(
+                f"  {'':<10} latency p50 {summary['latency_ms_p50']:.0f} ms, p95 {summary['latency_ms_p95']:.0f} ms, "
+                f"peak RSS {summary['peak_rss_mb']} MB while loaded"
+            )
+
 
 def main() -> None:
     args = parse_args()
-    prompts = load_prompts(args.prompts_file)
-    output_dir = build_output_dir(args.output_root, args.run_tag, args.temperature, args.top_p)
-
-    if args.model:
-        model_key = args.model.lower()
-        if model_key not in MODELS:
-            raise ValueError(f"Unknown model '{model_key}'. Available: {list(MODELS.keys())}")
-        selected_models = {model_key: MODELS[model_key]}
-    else:
-        selected_models = MODELS
-
-    for idx, (model_key, model_file) in enumerate(selected_models.items(), start=1):
-        run_experiment(
-            model_name=model_key,
-            model_file=model_file,
-            prompts=prompts,
-            models_dir=args.models_dir,
-            output_dir=output_dir,
-            temperature=args.temperature,
-            top_p=args.top_p,
-            max_tokens=args.max_tokens,
-            repetitions=args.repetitions,
-            ctx_size=args.ctx_size,
-            threads=args.threads,
-            sleep_seconds=args.sleep_seconds,
-        )
-        if idx < len(selected_models):
-            print(f"Memory cleared after {model_key}.\n")
-            time.sleep(3)
+    with run_trace("main_adjusted", args):
+        prompts = load_prompts(args.prompts_file)
+        if args.sweep:
+            grid = [(temperature, top_p) for temperature in args.temperatures for top_p in args.top_ps]
+        else:
+            grid = [(args.temperature, args.top_p)]
+        conditions = [
+            {
+                "temperature": temperature,
+                "top_p": top_p,
+                "output_dir": build_output_dir(args.output_root, args.run_tag, temperature, top_p),
+            }
+            for temperature, top_p in grid
+        ]
+        if len({c["output_dir"] for c in conditions}) < len(conditions):
+            raise ValueError("--run_tag must contain {temperature}/{top_p} placeholders to tell sweep conditions apart.")
+
+        if args.model:
+            model_key = args.model.lower()
+            if model_key not in MODELS:
+                raise ValueError(f"Unknown model '{model_key}'. Available: {list(MODELS.keys())}")
+            selected_models = {model_key: MODELS[model_key]}
+        else:
+            selected_models = MODELS
+
+        def experiment_kwargs(model_key: str, model_file: str) -> dict:
+            return {
+                "model_name": model_key,
+                "model_file": model_file,
+                "prompts": prompts,
+                "models_dir": args.models_dir,
+                "conditions": conditions,
+                "max_tokens": args.max_tokens,
+                "repetitions": args.repetitions,
+                "ctx_size": args.ctx_size,
+                "max_throttle_seconds": args.max_throttle_seconds,
+                "throttle_load_ratio": args.throttle_load_ratio,
+                "prefix_reuse": not args.no_prefix_reuse,
+                "resume": args.resume,
+                "export_json_csv": args.export_json_csv,
+                "results_db": args.results_db,
+                "batch_parallel": args.batch_parallel,
+                "shard": args.shard,
+                "generation_cache_dir": None if args.no_generation_cache else args.generation_cache,
+                "generation_cache_max_mb": args.generation_cache_max_mb,
+            }
+
+        summaries: list[dict] = []
+        if args.parallel_models > 1:
+            jobs = [
+                {
+                    "name": model_key,
+                    "ram_bytes": estimate_model_ram_bytes(
+                        resolve_model_path(args.models_dir, model_file), n_ctx=args.ctx_size * args.batch_parallel
+                    ),
+                    "kwargs": experiment_kwargs(model_key, model_file),
+                }
+                for model_key, model_file in selected_models.items()
+            ]
+            if args.memory_budget_gb is not None:
+                memory_budget = int(args.memory_budget_gb * 2**30)
+            else:
+                memory_budget = int((available_memory_bytes() or sum(job["ram_bytes"] for job in jobs)) * 0.9)
+            summaries = run_concurrently(
+                jobs,
+                target=run_experiment,
+                max_parallel=args.parallel_models,
+                total_threads=args.threads * args.parallel_models if args.threads else physical_core_count(),
+                memory_budget_bytes=memory_budget,
+            )
+        else:
+            for model_key, model_file in selected_models.items():
+                summaries.append(
+                    run_experiment(**experiment_kwargs(model_key, model_file), threads=args.threads or DEFAULT_THREADS)
+                )
 
-    print("All experiments completed successfully.")
+        for summary in summaries:
+            merge_stages(summary.pop("stages"))
+        print_throughput(summaries)
+        print("All experiments completed successfully.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,106 @@
+import argparse
+import json
+import re
+from pathlib import Path
+
+from generation_log import completion_key, export_log, export_log_parquet, iter_unique
+from prompts import DEFAULT_REPETITIONS, load_prompts
+from results_store import ingest_paths
+
+SHARD_PATTERN = re.compile(r"^(?P<stem>.+)_shard_(?P<index>\d+)_of_(?P<count>\d+)\.jsonl$")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Merge the JSONL logs of a sharded generation run (main_adjusted.py --shard) into the standard output layout."
+    )
+    parser.add_argument(
+        "shard_roots",
+        type=str,
+        nargs="+",
+        help="Output roots of the shards, e.g. the --output_root folder copied back from each machine.",
+    )
+    parser.add_argument("--output_root", type=str, default="outputs", help="Root the merged run folders are written under.")
+    parser.add_argument(
+        "--prompts_file",
+        type=str,
+        default="prompts.json",
+        help="Prompts of the run; merged rows follow its order, as in an unsharded run.",
+    )
+    parser.add_argument("--repetitions", type=int, default=DEFAULT_REPETITIONS, help="Repetitions of the run, to report missing cells.")
+    parser.add_argument(
+        "--export_json_csv",
+        action="store_true",
+        help="Also export each merged condition as indented JSON and CSV next to the Parquet file.",
+    )
+    parser.add_argument("--results_db", type=str, default=None, help="SQLite results store to ingest the merged files into.")
+    return parser.parse_args()
+
+
+def discover_shards(shard_roots: list[str]) -> dict[tuple[str, str], dict[int, list[Path]]]:
+    """
+    Shard logs grouped by (run folder relative to its root, merged file stem), then by shard count.
+    """
+    groups: dict[tuple[str, str], dict[int, list[Path]]] = {}
+    for root in shard_roots:
+        for path in sorted(Path(root).rglob("*_shard_*_of_*.jsonl")):
+            match = SHARD_PATTERN.match(path.name)
+            if match is None:
+                continue
+            key = (str(path.parent.relative_to(root)), match["stem"])
+            groups.setdefault(key, {}).setdefault(int(match["count"]), []).append(path)
+    return groups
+
+
+def merge_logs(shard_paths: list[Path], prompt_order: dict[str, int]) -> list[dict]:
+    """
+    Union of the shard logs, one row per completion key, in prompt-file then repetition order.
+    """
+    rows: dict[tuple, dict] = {}
+    for path in shard_paths:
+        for row in iter_unique(path):
+            rows.setdefault(completion_key(row), row)
+    return sorted(
+        rows.values(),
+        key=lambda row: (prompt_order.get(row["prompt"], len(prompt_order)), row["prompt"], row["repetition"]),
+    )
+
+
+def main() -> None:
+    args = parse_args()
+    prompts = load_prompts(args.prompts_file)
+    prompt_order = {entry["prompt"]: index for index, entry in enumerate(prompts)}
+    merged_paths: list[str] = []
+
+    for (run_folder, stem), by_count in sorted(discover_shards(args.shard_roots).items()):
+        if len(by_count) > 1:
+            raise ValueError(f"{run_folder}/{stem} has shards of different runs (N = {sorted(by_count)}).")
+        count, shard_paths = next(iter(by_count.items()))
+        indices = {int(SHARD_PATTERN.match(path.name)["index"]) for path in shard_paths}
+        missing_shards = sorted(set(range(1, count + 1)) - indices)
+
+        rows = merge_logs(shard_paths, prompt_order)
+        output_dir = Path(args.output_root) / run_folder
+        output_dir.mkdir(parents=True, exist_ok=True)
+        log_path = output_dir / f"{stem}.jsonl"
+        with open(log_path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        export_log_parquet(log_path, log_path.with_suffix(".parquet"))
+        if args.export_json_csv:
+            export_log(log_path, log_path.with_suffix(".json"), log_path.with_suffix(".csv"))
+        merged_paths.append(str(log_path.with_suffix(".parquet")))
+
+        missing_cells = len(prompts) * args.repetitions - sum(1 for row in rows if row["prompt"] in prompt_order)
+        print(
+            f"{run_folder}/{stem}: {len(rows)} completions from {len(shard_paths)} of {count} shard(s)"
+            + (f", shard(s) {missing_shards} missing" if missing_shards else "")
+            + (f", {missing_cells} cell(s) missing" if missing_cells > 0 else "")
+        )
+
+    if args.results_db is not None and merged_paths:
+        ingest_paths(args.results_db, merged_paths)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import numpy as np
+
+DEFAULT_NLI_BATCH_SIZE = 32
+# "pair" encodes (premise, hypothesis) with the tokenizer's pair API, the format
+# NLI models are trained on. "legacy_text" feeds the single text
+# "premise </s> hypothesis" that the published results were scored with.
+NLI_INPUT_ENCODINGS = ("pair", "legacy_text")
+DEFAULT_NLI_INPUT_ENCODING = "pair"
+
+
+class BatchedNLIEngine:
+    """
+    Premise/hypothesis NLI classifier that scores many pairs per forward pass.
+
+    Pairs are tokenized together once, sorted by token length and split into
+    fixed-size batches, so each batch is only padded to its own longest pair.
+    Verdicts are returned in the order the pairs were given. input_encoding is
+    one of NLI_INPUT_ENCODINGS.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = DEFAULT_NLI_BATCH_SIZE,
+        max_length: int = 512,
+        input_encoding: str = DEFAULT_NLI_INPUT_ENCODING,
+    ) -> None:
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        if input_encoding not in NLI_INPUT_ENCODINGS:
+            raise ValueError(f"Unknown NLI input encoding '{input_encoding}'. Available: {list(NLI_INPUT_ENCODINGS)}")
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.input_encoding = input_encoding
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        self.model.eval()
+        self.max_length = min(max_length, self.tokenizer.model_max_length)
+        self.id2label = {int(idx): str(label).upper() for idx, label in self.model.config.id2label.items()}
+
+    def logits(self, features: list[dict]) -> np.ndarray:
+        """
+        Logits of one batch of tokenized pairs, padded to its longest pair.
+        """
+        import torch
+
+        batch = self.tokenizer.pad(features, padding=True, return_tensors="pt")
+        with torch.inference_mode():
+            return self.model(**batch).logits.float().numpy()
+
+    def encode(self, pairs: list[tuple[str, str]]):
+        """
+        Token ids of the pairs in the engine's input encoding, unpadded.
+        """
+        if self.input_encoding == "legacy_text":
+            separator = self.tokenizer.sep_token
+            return self.tokenizer([f"{a} {separator} {b}" for a, b in pairs], truncation=True, max_length=self.max_length)
+        return self.tokenizer(
+            [a for a, _ in pairs],
+            [b for _, b in pairs],
+            truncation=True,
+            max_length=self.max_length,
+        )
+
+    def predict(self, pairs: list[tuple[str, str]]) -> list[dict]:
+        if not pairs:
+            return []
+
+        encoded = self.encode(pairs)
+        lengths = [len(ids) for ids in encoded["input_ids"]]
+        order = sorted(range(len(pairs)), key=lambda i: lengths[i])
+
+        verdicts: list[dict | None] = [None] * len(pairs)
+        for start in range(0, len(order), self.batch_size):
+            bucket = order[start : start + self.batch_size]
+            logits = self.logits([{key: encoded[key][i] for key in encoded.keys()} for i in bucket])
+            predicted = logits.argmax(axis=-1).tolist()
+            for row, idx in enumerate(bucket):
+                verdicts[idx] = {
+                    "label": self.id2label[predicted[row]],
+                    "logits": logits[row].tolist(),
+                }
+        return verdicts  # type: ignore[return-value]
@@ -0,0 +1,191 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+from analysis_cache import model_slug
+from nli_engine import DEFAULT_NLI_BATCH_SIZE, DEFAULT_NLI_INPUT_ENCODING, NLI_INPUT_ENCODINGS, BatchedNLIEngine
+
+DEFAULT_ONNX_MODEL_DIR = ".onnx_models"
+ONNX_OPSET = 17
+INT8_MODEL_FILE = "model_int8.onnx"
+SCORER_CONFIG_FILE = "scorer.json"
+
+
+def export_int8(model, tokenizer, output_name: str, target: Path) -> list[str]:
+    """
+    Export the named output of a Hugging Face model to ONNX with dynamic batch and
+    sequence axes, then quantize its weights to int8. Returns the input names.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    class SingleOutput(torch.nn.Module):
+        def __init__(self) -> None:
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return getattr(self.model(**dict(zip(input_names, inputs))), output_name)
+
+    target.mkdir(parents=True, exist_ok=True)
+    sample = tokenizer(["An example premise."], ["An example hypothesis."], return_tensors="pt")
+    input_names = list(sample.keys())
+    output_axes = {0: "batch", 1: "sequence"} if output_name == "last_hidden_state" else {0: "batch"}
+    fp32_path = target / "model_fp32.onnx"
+    with torch.inference_mode():
+        torch.onnx.export(
+            SingleOutput().eval(),
+            tuple(sample[name] for name in input_names),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=[output_name],
+            dynamic_axes={**{name: {0: "batch", 1: "sequence"} for name in input_names}, output_name: output_axes},
+            opset_version=ONNX_OPSET,
+        )
+    quantize_dynamic(str(fp32_path), str(target / INT8_MODEL_FILE), weight_type=QuantType.QInt8)
+    fp32_path.unlink()
+    tokenizer.save_pretrained(str(target))
+    return input_names
+
+
+def export_sequence_classifier(model_name: str, model_dir: str | Path = DEFAULT_ONNX_MODEL_DIR) -> Path:
+    """
+    Folder with the int8 ONNX export of a sequence classifier, exported on first use.
+    """
+    target = Path(model_dir) / model_slug(model_name)
+    if (target / INT8_MODEL_FILE).exists():
+        return target
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    print(f"Exporting {model_name} to ONNX with int8 weights in {target}...")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+    input_names = export_int8(model, tokenizer, "logits", target)
+    config = {
+        "model_name": model_name,
+        "input_names": input_names,
+        "id2label": {int(idx): str(label).upper() for idx, label in model.config.id2label.items()},
+    }
+    (target / SCORER_CONFIG_FILE).write_text(json.dumps(config, indent=2), encoding="utf-8")
+    return target
+
+
+def export_sentence_encoder(model_name: str, model_dir: str | Path = DEFAULT_ONNX_MODEL_DIR) -> Path:
+    """
+    Folder with the int8 ONNX export of the transformer of a mean-pooled
+    Sentence-BERT model, exported on first use.
+    """
+    target = Path(model_dir) / model_slug(model_name)
+    if (target / INT8_MODEL_FILE).exists():
+        return target
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize
+
+    print(f"Exporting {model_name} to ONNX with int8 weights in {target}...")
+    encoder = SentenceTransformer(model_name, device="cpu")
+    if not encoder[1].pooling_mode_mean_tokens:
+        raise ValueError(f"{model_name} does not use mean pooling; only mean-pooled encoders can be exported.")
+    input_names = export_int8(encoder[0].auto_model.eval(), encoder.tokenizer, "last_hidden_state", target)
+    config = {
+        "model_name": model_name,
+        "input_names": input_names,
+        "max_length": encoder.max_seq_length,
+        "dimension": encoder.get_sentence_embedding_dimension(),
+        "normalize": any(isinstance(module, Normalize) for module in encoder),
+    }
+    (target / SCORER_CONFIG_FILE).write_text(json.dumps(config, indent=2), encoding="utf-8")
+    return target
+
+
+def open_session(model_path: Path, threads: int | None = None):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    if threads is not None:
+        options.intra_op_num_threads = threads
+    return ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+
+
+class OnnxNLIEngine(BatchedNLIEngine):
+    """
+    BatchedNLIEngine running the int8 ONNX export of the classifier in ONNX Runtime.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = DEFAULT_NLI_BATCH_SIZE,
+        max_length: int = 512,
+        model_dir: str | Path = DEFAULT_ONNX_MODEL_DIR,
+        threads: int | None = None,
+        input_encoding: str = DEFAULT_NLI_INPUT_ENCODING,
+    ) -> None:
+        from transformers import AutoTokenizer
+
+        if input_encoding not in NLI_INPUT_ENCODINGS:
+            raise ValueError(f"Unknown NLI input encoding '{input_encoding}'. Available: {list(NLI_INPUT_ENCODINGS)}")
+        folder = export_sequence_classifier(model_name, model_dir)
+        config = json.loads((folder / SCORER_CONFIG_FILE).read_text(encoding="utf-8"))
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.input_encoding = input_encoding
+        self.tokenizer = AutoTokenizer.from_pretrained(str(folder))
+        self.session = open_session(folder / INT8_MODEL_FILE, threads)
+        self.input_names = config["input_names"]
+        self.max_length = min(max_length, self.tokenizer.model_max_length)
+        self.id2label = {int(idx): label for idx, label in config["id2label"].items()}
+
+    def logits(self, features: list[dict]) -> np.ndarray:
+        batch = self.tokenizer.pad(features, padding=True, return_tensors="np")
+        return self.session.run(None, {name: batch[name].astype(np.int64) for name in self.input_names})[0]
+
+
+class OnnxSentenceEncoder:
+    """
+    Sentence-BERT encoder running the int8 ONNX export of its transformer in ONNX
+    Runtime, followed by the same mean pooling (and normalization, if the model
+    has it). encode() takes the SentenceTransformer.encode arguments the analysis uses.
+    """
+
+    def __init__(self, model_name: str, model_dir: str | Path = DEFAULT_ONNX_MODEL_DIR, threads: int | None = None) -> None:
+        from transformers import AutoTokenizer
+
+        folder = export_sentence_encoder(model_name, model_dir)
+        config = json.loads((folder / SCORER_CONFIG_FILE).read_text(encoding="utf-8"))
+        self.model_name = model_name
+        self.tokenizer = AutoTokenizer.from_pretrained(str(folder))
+        self.session = open_session(folder / INT8_MODEL_FILE, threads)
+        self.input_names = config["input_names"]
+        self.max_length = config["max_length"]
+        self.dimension = config["dimension"]
+        self.normalize = config["normalize"]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(
+        self,
+        sentences: list[str],
+        batch_size: int = 32,
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = False,
+    ) -> np.ndarray:
+        embeddings = np.zeros((len(sentences), self.dimension), dtype=np.float32)
+        order = sorted(range(len(sentences)), key=lambda i: len(sentences[i]))
+        for start in range(0, len(order), batch_size):
+            bucket = order[start : start + batch_size]
+            batch = self.tokenizer(
+                [sentences[i] for i in bucket],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            hidden = self.session.run(None, {name: batch[name].astype(np.int64) for name in self.input_names})[0]
+            mask = batch["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if normalize_embeddings or self.normalize:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            embeddings[bucket] = pooled
+        return embeddings
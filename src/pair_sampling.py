@@ -0,0 +1,107 @@
+import hashlib
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+DEFAULT_PAIR_BATCH_SIZE = 64
+DEFAULT_MIN_SAMPLED_PAIRS = 128
+DEFAULT_CI_WIDTH = 0.02
+DEFAULT_CI_LEVEL = 0.95
+
+
+def group_seed(seed: int, prompt: str) -> int:
+    """
+    Seed of one prompt's pair order, independent of file and group order.
+    """
+    digest = hashlib.sha256(f"{seed}|{prompt}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+class PairSampler:
+    """
+    Adaptive estimate of the mean of a pairwise metric over all i < j pairs of n responses.
+
+    Pairs are drawn without replacement in a seeded random order, batch_size at a
+    time. Sampling stops once at least min_pairs are scored and the confidence
+    interval is no wider than ci_width, once max_pairs are scored, or when every
+    pair has been scored (the estimate is then exact and the interval collapses).
+
+    The interval is a normal interval (a Wilson interval for 0/1 metrics) with a
+    finite-population correction. Pairs sharing a response are not independent,
+    so it is an approximation that tends to be slightly narrow for small n.
+    """
+
+    def __init__(
+        self,
+        n: int,
+        seed: int,
+        batch_size: int = DEFAULT_PAIR_BATCH_SIZE,
+        min_pairs: int = DEFAULT_MIN_SAMPLED_PAIRS,
+        max_pairs: int | None = None,
+        ci_width: float = DEFAULT_CI_WIDTH,
+        ci_level: float = DEFAULT_CI_LEVEL,
+        binary: bool = False,
+    ) -> None:
+        self.first, self.second = np.triu_indices(n, k=1)
+        self.total = len(self.first)
+        self.order = np.random.default_rng(seed).permutation(self.total)
+        self.batch_size = batch_size
+        self.min_pairs = min_pairs
+        self.budget = self.total if max_pairs is None else min(max_pairs, self.total)
+        self.ci_width = ci_width
+        self.z = NormalDist().inv_cdf((1 + ci_level) / 2)
+        self.binary = binary
+        self.scores: list[float] = []
+
+    @property
+    def scored(self) -> int:
+        return len(self.scores)
+
+    def next_batch(self) -> list[tuple[int, int]]:
+        if self.done():
+            return []
+        picked = self.order[self.scored : min(self.scored + self.batch_size, self.budget)]
+        return list(zip(self.first[picked].tolist(), self.second[picked].tolist()))
+
+    def add(self, scores: list[float]) -> None:
+        self.scores.extend(float(score) for score in scores)
+
+    def interval(self) -> tuple[float, float, float]:
+        """
+        Return (estimate, ci_low, ci_high) from the pairs scored so far.
+        """
+        k = self.scored
+        if k == 0:
+            return 0.0, 0.0, 0.0
+        mean = sum(self.scores) / k
+        if k >= self.total:
+            return mean, mean, mean
+
+        fpc = (self.total - k) / (self.total - 1)
+        z2 = self.z**2
+        if self.binary:
+            center = (mean + z2 / (2 * k)) / (1 + z2 / k)
+            half = self.z / (1 + z2 / k) * math.sqrt(mean * (1 - mean) / k + z2 / (4 * k * k)) * math.sqrt(fpc)
+            return mean, max(center - half, 0.0), min(center + half, 1.0)
+
+        variance = float(np.var(self.scores, ddof=1)) if k > 1 else 0.0
+        half = self.z * math.sqrt(variance / k * fpc)
+        return mean, mean - half, mean + half
+
+    def done(self) -> bool:
+        if self.scored >= self.budget:
+            return True
+        if self.scored < self.min_pairs:
+            return False
+        _, low, high = self.interval()
+        return high - low <= self.ci_width
+
+    def result(self, metric: str) -> dict:
+        estimate, low, high = self.interval()
+        return {
+            metric: estimate,
+            f"{metric}_ci_low": low,
+            f"{metric}_ci_high": high,
+            f"{metric}_pairs_scored": self.scored,
+        }
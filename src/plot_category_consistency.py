@@ -1,15 +1,18 @@
-import pandas as pd
+import argparse
 import seaborn as sns
 import matplotlib.pyplot as plt
 from pathlib import Path
 import traceback
 
+from columnar_store import prefer_parquet, read_table
+from instrumentation import add_instrumentation_args, run_trace, stage
+
 # ==============================================================================
 #  MAIN SCRIPT BODY
 # ==============================================================================
 
-if __name__ == "__main__": # Good practice for organization
 
+def load_data():
     # --- Determine Input Path ---
     try:
         script_location = Path(__file__).resolve()
@@ -19,7 +22,7 @@ if __name__ == "__main__": # Good practice for organization
         input_csv_path = input_dir / "analysis_results.csv"
 
         print(f"Loading data from: {input_csv_path}")
-        df = pd.read_csv(input_csv_path)
+        df = read_table(prefer_parquet(input_csv_path))
         print("Data loaded successfully.")
 
     except FileNotFoundError:
@@ -30,6 +33,10 @@ if __name__ == "__main__": # Good practice for organization
         print(f"\nERROR loading data: {e}")
         exit()
 
+    return df, input_csv_path, project_root
+
+
+def prepare_heatmap_data(df, input_csv_path):
     # --- Prepare Data for Heatmap ---
     print("Preparing data for the heatmap...")
     try:
@@ -43,6 +50,10 @@ if __name__ == "__main__": # Good practice for organization
         print(f"\nERROR processing data for the heatmap: {e}")
         exit()
 
+    return heatmap_data
+
+
+def render_heatmap(heatmap_data, project_root):
     # --- Generate Heatmap ---
     print("Generating heatmap...")
     fig = None # Initialize fig to None for finally block
@@ -87,4 +98,21 @@ if __name__ == "__main__": # Good practice for organization
         if fig is not None:
             plt.close(fig)
 
-    print("\nScript finalizado.")
\ No newline at end of file
+
+def main() -> None:
+    args = add_instrumentation_args(
+        argparse.ArgumentParser(description="Generate the logical consistency heatmap by model and category.")
+    ).parse_args()
+    with run_trace("plot_category_consistency", args):
+        with stage("load_data"):
+            df, input_csv_path, project_root = load_data()
+        with stage("process"):
+            heatmap_data = prepare_heatmap_data(df, input_csv_path)
+        with stage("render"):
+            render_heatmap(heatmap_data, project_root)
+
+        print("\nScript finalizado.")
+
+
+if __name__ == "__main__": # Good practice for organization
+    main()
@@ -5,6 +5,10 @@ import traceback
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from columnar_store import build_filters, prefer_parquet, read_table
+from instrumentation import add_instrumentation_args, run_trace, stage
+from results_store import METRIC_COLUMNS, query_condition_means
+
 
 SCRIPT_DIR = Path(__file__).resolve().parent
 
@@ -34,11 +38,27 @@ def parse_args() -> argparse.Namespace:
         default="Figure_3_hyperparameter_sensitivity.pdf",
         help="Output PDF filename.",
     )
+    parser.add_argument("--models", type=str, nargs="+", default=None, help="Only plot these models.")
+    parser.add_argument(
+        "--results_db",
+        type=str,
+        default=None,
+        help="Read the per-condition means from this SQLite results store instead of the three summary files.",
+    )
+    parser.add_argument("--top_p", type=float, default=0.95, help="top_p of the conditions read from --results_db.")
+    parser.add_argument(
+        "--temperatures",
+        type=float,
+        nargs="+",
+        default=list(DEFAULT_FILES),
+        help="Temperatures of the conditions read from --results_db.",
+    )
+    add_instrumentation_args(parser)
     return parser.parse_args()
 
 
-def load_summary(csv_path: Path, temperature_label: float) -> pd.DataFrame:
-    df = pd.read_csv(csv_path)
+def load_summary(csv_path: Path, temperature_label: float, models: list[str] | None = None) -> pd.DataFrame:
+    df = read_table(prefer_parquet(csv_path), filters=build_filters(models=models))
     if "logical_consistency" not in df.columns:
         if "contradiction_rate" not in df.columns:
             raise KeyError(f"File {csv_path} lacks both logical_consistency and contradiction_rate.")
@@ -47,24 +67,28 @@ def load_summary(csv_path: Path, temperature_label: float) -> pd.DataFrame:
     return df
 
 
-def main() -> None:
-    args = parse_args()
-    output_dir = Path(args.output_dir).resolve()
-    output_dir.mkdir(parents=True, exist_ok=True)
-    output_path = output_dir / args.output_name
-
+def load_data(args: argparse.Namespace) -> pd.DataFrame:
     try:
-        data_frames = [
-            load_summary(Path(args.summary_02).resolve(), 0.2),
-            load_summary(Path(args.summary_07).resolve(), 0.7),
-            load_summary(Path(args.summary_10).resolve(), 1.0),
-        ]
-        df = pd.concat(data_frames, ignore_index=True)
+        if args.results_db is not None:
+            df = query_condition_means(args.results_db, list(METRIC_COLUMNS), args.models)
+            df = df.loc[(df["top_p"] == args.top_p) & df["temperature"].isin(args.temperatures)].copy()
+            df["temperature_label"] = df["temperature"]
+        else:
+            data_frames = [
+                load_summary(Path(args.summary_02).resolve(), 0.2, args.models),
+                load_summary(Path(args.summary_07).resolve(), 0.7, args.models),
+                load_summary(Path(args.summary_10).resolve(), 1.0, args.models),
+            ]
+            df = pd.concat(data_frames, ignore_index=True)
     except Exception as e:
         print(f"ERROR loading summary files: {e}")
         print(traceback.format_exc())
         raise
 
+    return df
+
+
+def plot_sensitivity(df: pd.DataFrame, output_path: Path) -> None:
     try:
         metrics = [
             ("logical_consistency", "Logical Consistency"),
@@ -72,7 +96,7 @@ def main() -> None:
             ("diachronic_semantic_similarity", "Diachronic Semantic Similarity"),
         ]
         model_order = ["hermes", "mistral", "stablelm", "openchat", "tinyllama"]
-        temperatures = [0.2, 0.7, 1.0]
+        temperatures = sorted(df["temperature_label"].unique())
 
         fig, axes = plt.subplots(len(metrics), 1, figsize=(11, 12), sharex=True)
         if len(metrics) == 1:
@@ -112,5 +136,18 @@ def main() -> None:
         raise
 
 
+def main() -> None:
+    args = parse_args()
+    with run_trace("plot_hyperparameter_sensitivity", args):
+        output_dir = Path(args.output_dir).resolve()
+        output_dir.mkdir(parents=True, exist_ok=True)
+        output_path = output_dir / args.output_name
+
+        with stage("load_data"):
+            df = load_data(args)
+        with stage("render"):
+            plot_sensitivity(df, output_path)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -2,22 +2,25 @@ import argparse
 from pathlib import Path
 import traceback
 
-import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 
+from columnar_store import build_filters, prefer_parquet, read_table
+from instrumentation import add_instrumentation_args, run_trace, stage
+from results_store import query_category_means
+
 
 def parse_args() -> argparse.Namespace:
     script_dir = Path(__file__).resolve().parent
 
     parser = argparse.ArgumentParser(
-        description="Generate the logical consistency heatmap from a prompt-level analysis CSV."
+        description="Generate the logical consistency heatmap from prompt-level analysis results (Parquet or CSV)."
     )
     parser.add_argument(
         "--input_csv",
         type=str,
         default=str(script_dir / "analysis_results_temp_0_7.csv"),
-        help="Path to the prompt-level analysis CSV for the chosen baseline condition.",
+        help="Prompt-level analysis results for the chosen baseline condition; a .parquet file next to it is preferred.",
     )
     parser.add_argument(
         "--output_dir",
@@ -31,24 +34,47 @@ def parse_args() -> argparse.Namespace:
         default="logical_heatmap.pdf",
         help="Output PDF filename.",
     )
+    parser.add_argument("--models", type=str, nargs="+", default=None, help="Only plot these models.")
+    parser.add_argument("--categories", type=str, nargs="+", default=None, help="Only plot these categories.")
+    parser.add_argument(
+        "--results_db",
+        type=str,
+        default=None,
+        help="Read the per-category means from this SQLite results store instead of --input_csv.",
+    )
+    parser.add_argument("--temperature", type=float, default=0.7, help="Condition queried from --results_db.")
+    parser.add_argument("--top_p", type=float, default=None, help="Condition queried from --results_db.")
+    add_instrumentation_args(parser)
     return parser.parse_args()
 
 
-def main() -> None:
-    args = parse_args()
-    input_csv = Path(args.input_csv).resolve()
-    output_dir = Path(args.output_dir).resolve()
-    output_dir.mkdir(parents=True, exist_ok=True)
-    output_path = output_dir / args.output_name
-
+def load_data(args: argparse.Namespace, input_path: Path):
     try:
-        print(f"Loading data from: {input_csv}")
-        df = pd.read_csv(input_csv)
+        if args.results_db is not None:
+            print(f"Loading data from: {args.results_db} (temperature={args.temperature}, top_p={args.top_p})")
+            df = query_category_means(args.results_db, "logical_consistency", args.temperature, args.top_p, args.models)
+            df["temperature"] = args.temperature
+            if args.categories:
+                df = df[df["category"].isin(args.categories)]
+        else:
+            print(f"Loading data from: {input_path}")
+            df = read_table(input_path, filters=build_filters(models=args.models, categories=args.categories))
         print("Data loaded successfully.")
     except Exception as e:
         print(f"ERROR loading data: {e}")
         raise
 
+    return df
+
+
+def condition_label(df) -> str:
+    if "temperature" not in df.columns:
+        return ""
+    temperatures = ", ".join(f"{t:g}" for t in sorted(df["temperature"].dropna().unique()))
+    return f" (baseline: temperature = {temperatures})"
+
+
+def plot_heatmap(df, output_path: Path) -> None:
     try:
         if "logical_consistency" in df.columns:
             value_col = "logical_consistency"
@@ -93,7 +119,7 @@ def main() -> None:
             cbar_kws={"label": "Logical Consistency"},
             ax=ax,
         )
-        ax.set_title("Logical Consistency by Model and Category (baseline: temperature = 0.7)")
+        ax.set_title(f"Logical Consistency by Model and Category{condition_label(df)}")
         ax.set_ylabel("Model")
         ax.set_xlabel("Category")
         fig.tight_layout()
@@ -108,5 +134,19 @@ def main() -> None:
         raise
 
 
+def main() -> None:
+    args = parse_args()
+    with run_trace("plot_logical_heatmap_revised", args):
+        input_path = prefer_parquet(Path(args.input_csv).resolve())
+        output_dir = Path(args.output_dir).resolve()
+        output_dir.mkdir(parents=True, exist_ok=True)
+        output_path = output_dir / args.output_name
+
+        with stage("load_data"):
+            df = load_data(args, input_path)
+        with stage("render"):
+            plot_heatmap(df, output_path)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,9 +1,12 @@
-import pandas as pd
+import argparse
 import matplotlib.pyplot as plt
 import matplotlib.figure # For type hinting
 from pathlib import Path
 import traceback
 
+from columnar_store import prefer_parquet, read_table
+from instrumentation import add_instrumentation_args, run_trace, stage
+
 # ==============================================================================
 #  HELPER FUNCTION TO SAVE PLOTS AS TIFF (Same as before)
 # ==============================================================================
@@ -58,8 +61,8 @@ def save_plot_as_tiff(figure: matplotlib.figure.Figure, filename: str, dpi: int
 #  MAIN SCRIPT BODY
 # ==============================================================================
 
-if __name__ == "__main__": # Good practice for organization
 
+def load_data():
     # --- Determine Input Path ---
     try:
         script_location = Path(__file__).resolve()
@@ -69,7 +72,7 @@ if __name__ == "__main__": # Good practice for organization
         input_csv_path = input_dir / "analysis_results.csv"
 
         print(f"Loading data from: {input_csv_path}")
-        df = pd.read_csv(input_csv_path)
+        df = read_table(prefer_parquet(input_csv_path))
         print("Data loaded successfully.")
 
     except FileNotFoundError:
@@ -80,6 +83,10 @@ if __name__ == "__main__": # Good practice for organization
         print(f"\nERROR loading data: {e}")
         exit()
 
+    return df, input_csv_path
+
+
+def compute_mean_metrics(df, input_csv_path):
     # --- Process Data for Plotting ---
     print("Processing data for bar chart...")
     try:
@@ -104,6 +111,10 @@ if __name__ == "__main__": # Good practice for organization
         print(f"\nERROR processing data for bar chart: {e}")
         exit()
 
+    return mean_metrics
+
+
+def render_bar_chart(mean_metrics):
     # --- Generate Bar Chart ---
     print("Generating bar chart...")
     try:
@@ -134,4 +145,21 @@ if __name__ == "__main__": # Good practice for organization
         print("Traceback:")
         print(traceback.format_exc())
 
-    print("\nScript finished.")
\ No newline at end of file
+
+def main() -> None:
+    args = add_instrumentation_args(
+        argparse.ArgumentParser(description="Generate the bar chart of average consistency per model (Figure 3).")
+    ).parse_args()
+    with run_trace("plot_overall_consistency", args):
+        with stage("load_data"):
+            df, input_csv_path = load_data()
+        with stage("process"):
+            mean_metrics = compute_mean_metrics(df, input_csv_path)
+        with stage("render"):
+            render_bar_chart(mean_metrics)
+
+        print("\nScript finished.")
+
+
+if __name__ == "__main__": # Good practice for organization
+    main()
@@ -0,0 +1,91 @@
+import time
+
+import llama_cpp
+
+
+def eval_timings_ms(model) -> tuple[float, float]:
+    """
+    (prompt-eval ms, decode ms) that llama.cpp accumulated since its timings were last reset.
+    """
+    timings = llama_cpp.llama_get_timings(model._ctx.ctx)
+    return round(float(timings.t_p_eval_ms), 3), round(float(timings.t_eval_ms), 3)
+
+
+class PromptPrefix:
+    """
+    Evaluates a prompt once on a llama-cpp-python model and resumes every
+    repetition from that point, so only sampling work is repeated.
+
+    The snapshot is the prompt tokens plus the logits row of the last prompt
+    token. Restoring rewinds the model to the end of the prompt (llama.cpp drops
+    the KV cells of the previous completion on the next eval) and puts that
+    logits row back. Llama.save_state()/load_state() is not used because it
+    copies the whole n_ctx x n_vocab logits buffer on every call, which costs
+    far more than the short prompts it would save. If another prompt has been
+    evaluated in between, the prompt is evaluated again.
+    """
+
+    def __init__(self, model, prompt_text: str) -> None:
+        self.model = model
+        self.prompt_tokens: list[int] = model.tokenize(prompt_text.encode("utf-8"), special=True)
+        if len(self.prompt_tokens) >= model.n_ctx():
+            raise ValueError(
+                f"Requested tokens ({len(self.prompt_tokens)}) exceed context window of {model.n_ctx()}"
+            )
+        self.prompt_eval_seconds = 0.0
+        self.prompt_evals = 0
+        self._reported_prompt_eval_seconds = 0.0
+        self._prime()
+
+    def _prime(self) -> None:
+        started = time.perf_counter()
+        self.model.reset()
+        self.model.eval(self.prompt_tokens)
+        self.last_logits = self.model.scores[len(self.prompt_tokens) - 1, :].copy()
+        self.prompt_eval_seconds += time.perf_counter() - started
+        self.prompt_evals += 1
+
+    def _restore(self) -> None:
+        n_prompt = len(self.prompt_tokens)
+        if self.model.n_tokens < n_prompt or self.model.input_ids[:n_prompt].tolist() != self.prompt_tokens:
+            self._prime()
+            return
+        self.model.n_tokens = n_prompt
+        self.model.scores[n_prompt - 1, :] = self.last_logits
+
+    def complete(self, max_tokens: int, temperature: float, top_p: float, seed: int | None = None) -> tuple[str, dict]:
+        """
+        Sample one completion with the same sampler settings Llama.__call__ uses,
+        seeding the sampler first when a seed is given. Returns the stripped text
+        and its stats: prompt and completion tokens, prompt-eval ms (the prompt
+        evaluation since the previous completion, 0 when its state was reused),
+        llama.cpp decode ms and the finish reason.
+        """
+        llama_cpp.llama_reset_timings(self.model._ctx.ctx)
+        self._restore()
+        if seed is not None:
+            self.model.set_seed(seed)
+        max_tokens = min(max_tokens, self.model.n_ctx() - len(self.prompt_tokens))
+        eos = self.model.token_eos()
+
+        completion_tokens: list[int] = []
+        finish_reason = "length"
+        for token in self.model.generate([], top_p=top_p, temp=temperature, reset=False):
+            if token == eos:
+                finish_reason = "stop"
+                break
+            completion_tokens.append(token)
+            if len(completion_tokens) >= max_tokens:
+                break
+
+        text = self.model.detokenize(completion_tokens, prev_tokens=self.prompt_tokens)
+        _, decode_ms = eval_timings_ms(self.model)
+        prompt_eval_ms = round((self.prompt_eval_seconds - self._reported_prompt_eval_seconds) * 1000, 3)
+        self._reported_prompt_eval_seconds = self.prompt_eval_seconds
+        return text.decode("utf-8", errors="ignore").strip(), {
+            "prompt_tokens": len(self.prompt_tokens),
+            "completion_tokens": len(completion_tokens),
+            "prompt_eval_ms": prompt_eval_ms,
+            "decode_ms": decode_ms,
+            "finish_reason": finish_reason,
+        }
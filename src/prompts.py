@@ -0,0 +1,11 @@
+import json
+
+DEFAULT_REPETITIONS = 10
+
+
+def load_prompts(prompts_file: str) -> list[dict]:
+    with open(prompts_file, "r", encoding="utf-8") as f:
+        prompts = json.load(f)
+    if not isinstance(prompts, list) or not prompts:
+        raise ValueError("prompts.json must contain a non-empty list of prompt records.")
+    return prompts
@@ -0,0 +1,251 @@
+import argparse
+import sqlite3
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from columnar_store import read_table
+
+DEFAULT_RESULTS_DB = "results_store.sqlite"
+CONDITION_KEY = ("model", "temperature", "top_p", "category", "prompt")
+GENERATION_COLUMNS = (*CONDITION_KEY, "repetition", "response", "max_tokens", "timestamp")
+METRIC_COLUMNS = (
+    "textual_similarity",
+    "semantic_similarity",
+    "contradiction_rate",
+    "logical_consistency",
+    "diachronic_textual_similarity",
+    "diachronic_semantic_similarity",
+)
+PROMPT_METRIC_COLUMNS = (*CONDITION_KEY, "max_tokens", *METRIC_COLUMNS)
+
+
+def open_results_db(db_path: str | Path) -> sqlite3.Connection:
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=60, isolation_level=None)
+    metric_defs = ",\n            ".join(f"{column} REAL" for column in METRIC_COLUMNS)
+    conn.executescript(
+        f"""
+        CREATE TABLE IF NOT EXISTS generations (
+            model TEXT NOT NULL,
+            temperature REAL,
+            top_p REAL,
+            category TEXT NOT NULL,
+            prompt TEXT NOT NULL,
+            repetition INTEGER NOT NULL,
+            response TEXT,
+            max_tokens INTEGER,
+            timestamp TEXT,
+            source_file TEXT NOT NULL,
+            PRIMARY KEY (model, temperature, top_p, category, prompt, repetition)
+        );
+        CREATE TABLE IF NOT EXISTS prompt_metrics (
+            model TEXT NOT NULL,
+            temperature REAL,
+            top_p REAL,
+            category TEXT NOT NULL,
+            prompt TEXT NOT NULL,
+            max_tokens INTEGER,
+            {metric_defs},
+            source_file TEXT NOT NULL,
+            PRIMARY KEY (model, temperature, top_p, category, prompt)
+        );
+        CREATE TABLE IF NOT EXISTS ingested_files (
+            path TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            rows INTEGER NOT NULL,
+            ingested_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS generations_by_source ON generations (source_file);
+        CREATE INDEX IF NOT EXISTS prompt_metrics_by_source ON prompt_metrics (source_file);
+        CREATE INDEX IF NOT EXISTS prompt_metrics_by_condition
+            ON prompt_metrics (temperature, top_p, model, category);
+        CREATE INDEX IF NOT EXISTS prompt_metrics_by_model
+            ON prompt_metrics (model, temperature, top_p);
+        """
+    )
+    return conn
+
+
+def table_kind(columns) -> str | None:
+    """
+    "generations" for completion files, "prompt_metrics" for prompt-level analysis
+    results, None for anything else (model summaries are derived by query instead).
+    """
+    if {"prompt", "response", "repetition"}.issubset(columns):
+        return "generations"
+    if {"prompt", "textual_similarity"}.issubset(columns):
+        return "prompt_metrics"
+    return None
+
+
+def ingest_file(conn: sqlite3.Connection, path: str | Path, force: bool = False) -> int | None:
+    """
+    Load one output file into the store, replacing whatever an earlier version of
+    the same file contributed. Files whose size and mtime are unchanged since the
+    last ingest are skipped. Returns the number of rows ingested, or None if skipped.
+    """
+    path = Path(path).resolve()
+    stat = path.stat()
+    known = conn.execute("SELECT size, mtime_ns FROM ingested_files WHERE path = ?", (str(path),)).fetchone()
+    if not force and known == (stat.st_size, stat.st_mtime_ns):
+        return None
+
+    df = read_table(path)
+    kind = table_kind(df.columns)
+    if kind is None:
+        conn.execute(
+            "INSERT OR REPLACE INTO ingested_files (path, kind, size, mtime_ns, rows, ingested_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (str(path), "ignored", stat.st_size, stat.st_mtime_ns, 0, time.time()),
+        )
+        return None
+    columns = list(GENERATION_COLUMNS if kind == "generations" else PROMPT_METRIC_COLUMNS)
+    for column in columns:
+        if column not in df.columns:
+            df[column] = None
+    records = df[columns].astype(object).where(df[columns].notna(), None).itertuples(index=False, name=None)
+    rows = [(*record, str(path)) for record in records]
+
+    placeholders = ", ".join("?" for _ in range(len(columns) + 1))
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(f"DELETE FROM {kind} WHERE source_file = ?", (str(path),))
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {kind} ({', '.join(columns)}, source_file) VALUES ({placeholders})",
+            rows,
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO ingested_files (path, kind, size, mtime_ns, rows, ingested_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (str(path), kind, stat.st_size, stat.st_mtime_ns, len(rows), time.time()),
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return len(rows)
+
+
+def discover_files(paths: list[str]) -> list[Path]:
+    """
+    Output files under the given files/directories. Where a Parquet file and a
+    CSV share a stem, only the Parquet file is used; JSON exports are ignored.
+    """
+    found: list[Path] = []
+    for arg in paths:
+        root = Path(arg)
+        candidates = [root] if root.is_file() else sorted(root.rglob("*.parquet")) + sorted(root.rglob("*.csv"))
+        for candidate in candidates:
+            if candidate.suffix == ".csv" and candidate.with_suffix(".parquet").exists():
+                continue
+            if candidate.suffix in (".parquet", ".csv"):
+                found.append(candidate)
+    return found
+
+
+def ingest_paths(db_path: str | Path, paths: list[str], force: bool = False) -> dict[str, int]:
+    conn = open_results_db(db_path)
+    counts = {"ingested_files": 0, "skipped_files": 0, "rows": 0}
+    try:
+        for path in discover_files(paths):
+            rows = ingest_file(conn, path, force=force)
+            if rows is None:
+                counts["skipped_files"] += 1
+            else:
+                counts["ingested_files"] += 1
+                counts["rows"] += rows
+    finally:
+        conn.close()
+    return counts
+
+
+def check_metric(metric: str) -> str:
+    if metric not in METRIC_COLUMNS:
+        raise ValueError(f"Unknown metric '{metric}'. Available: {list(METRIC_COLUMNS)}")
+    return metric
+
+
+def model_filter(models: list[str] | None) -> tuple[str, list]:
+    if not models:
+        return "", []
+    return f" AND model IN ({', '.join('?' for _ in models)})", list(models)
+
+
+def query_category_means(
+    db_path: str | Path,
+    metric: str,
+    temperature: float | None = None,
+    top_p: float | None = None,
+    models: list[str] | None = None,
+) -> pd.DataFrame:
+    """
+    Mean of a prompt-level metric per (model, category), optionally restricted to one condition.
+    """
+    metric = check_metric(metric)
+    where, params = "1 = 1", []
+    if temperature is not None:
+        where += " AND temperature = ?"
+        params.append(temperature)
+    if top_p is not None:
+        where += " AND top_p = ?"
+        params.append(top_p)
+    model_sql, model_params = model_filter(models)
+    conn = open_results_db(db_path)
+    try:
+        return pd.read_sql_query(
+            f"SELECT model, category, AVG({metric}) AS {metric} FROM prompt_metrics "
+            f"WHERE {where}{model_sql} GROUP BY model, category ORDER BY model, category",
+            conn,
+            params=params + model_params,
+        )
+    finally:
+        conn.close()
+
+
+def query_condition_means(db_path: str | Path, metrics: list[str], models: list[str] | None = None) -> pd.DataFrame:
+    """
+    Mean of each metric per (model, temperature, top_p), as in the analysis model summaries.
+    """
+    selected = ", ".join(f"AVG({check_metric(metric)}) AS {metric}" for metric in metrics)
+    model_sql, model_params = model_filter(models)
+    conn = open_results_db(db_path)
+    try:
+        return pd.read_sql_query(
+            f"SELECT model, temperature, top_p, {selected} FROM prompt_metrics WHERE 1 = 1{model_sql} "
+            "GROUP BY model, temperature, top_p ORDER BY model, temperature, top_p",
+            conn,
+            params=model_params,
+        )
+    finally:
+        conn.close()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Ingest generation outputs and prompt-level analysis results into the consolidated results store."
+    )
+    parser.add_argument(
+        "paths",
+        type=str,
+        nargs="+",
+        help="Files or directories to ingest, e.g. outputs analysis/results.",
+    )
+    parser.add_argument("--db", type=str, default=DEFAULT_RESULTS_DB, help="Path of the SQLite results store.")
+    parser.add_argument("--force", action="store_true", help="Re-ingest files even if they are unchanged.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    counts = ingest_paths(args.db, args.paths, force=args.force)
+    print(
+        f"Ingested {counts['rows']} rows from {counts['ingested_files']} file(s) into {args.db}; "
+        f"{counts['skipped_files']} unchanged or unrelated file(s) skipped."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+RSS_SAMPLING_INTERVAL_SECONDS = 0.05
+
+
+def physical_core_count() -> int:
+    """
+    Number of physical CPU cores, falling back to the logical count when the
+    topology cannot be read (non-Linux systems without psutil).
+    """
+    try:
+        import psutil
+
+        cores = psutil.cpu_count(logical=False)
+        if cores:
+            return int(cores)
+    except ImportError:
+        pass
+
+    cpuinfo = Path("/proc/cpuinfo")
+    if cpuinfo.exists():
+        cores_seen = set()
+        physical_id = core_id = None
+        for line in cpuinfo.read_text(encoding="utf-8", errors="ignore").splitlines():
+            key, _, value = line.partition(":")
+            key = key.strip()
+            if key == "physical id":
+                physical_id = value.strip()
+            elif key == "core id":
+                core_id = value.strip()
+            elif not key and physical_id is not None and core_id is not None:
+                cores_seen.add((physical_id, core_id))
+                physical_id = core_id = None
+        if physical_id is not None and core_id is not None:
+            cores_seen.add((physical_id, core_id))
+        if cores_seen:
+            return len(cores_seen)
+
+    return os.cpu_count() or 1
+
+
+def _meminfo_bytes(field: str) -> int | None:
+    meminfo = Path("/proc/meminfo")
+    if not meminfo.exists():
+        return None
+    for line in meminfo.read_text(encoding="utf-8").splitlines():
+        if line.startswith(f"{field}:"):
+            return int(line.split()[1]) * 1024
+    return None
+
+
+def available_memory_bytes() -> int | None:
+    try:
+        import psutil
+
+        return int(psutil.virtual_memory().available)
+    except ImportError:
+        return _meminfo_bytes("MemAvailable")
+
+
+def total_memory_bytes() -> int | None:
+    try:
+        import psutil
+
+        return int(psutil.virtual_memory().total)
+    except ImportError:
+        pass
+    total = _meminfo_bytes("MemTotal")
+    if total is None and hasattr(os, "sysconf"):
+        try:
+            total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+        except (ValueError, OSError):
+            total = None
+    return total
+
+
+def peak_rss_bytes() -> int | None:
+    """
+    Peak resident set size over the whole lifetime of this process so far, or
+    None if it cannot be read. Use PeakRSS for the peak within a window.
+    """
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+
+            memory = psutil.Process().memory_info()
+            return int(getattr(memory, "peak_wset", memory.rss))
+        except ImportError:
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return int(peak) if sys.platform == "darwin" else int(peak) * 1024
+
+
+def current_rss_bytes() -> int | None:
+    """
+    Resident set size of this process right now, or None if it cannot be read.
+    """
+    try:
+        import psutil
+
+        return int(psutil.Process().memory_info().rss)
+    except ImportError:
+        pass
+    statm = Path("/proc/self/statm")
+    if statm.exists() and hasattr(os, "sysconf"):
+        return int(statm.read_text(encoding="utf-8").split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    return None
+
+
+class PeakRSS:
+    """
+    Highest resident set size of this process between start() and stop(). Unlike
+    ru_maxrss, which never goes down, it does not carry over the peak of an earlier
+    model that has since been freed. One daemon thread per process samples the
+    current RSS every RSS_SAMPLING_INTERVAL_SECONDS for all open windows, so spikes
+    shorter than that can be missed. peak_bytes is None where RSS cannot be read.
+    """
+
+    _open: set = set()
+    _lock = threading.Lock()
+    _sampler_pid: int | None = None
+
+    def __init__(self) -> None:
+        self.peak_bytes: int | None = None
+
+    def _update(self, rss: int | None) -> None:
+        if rss is not None and (self.peak_bytes is None or rss > self.peak_bytes):
+            self.peak_bytes = rss
+
+    @classmethod
+    def _sample(cls) -> None:
+        while True:
+            time.sleep(RSS_SAMPLING_INTERVAL_SECONDS)
+            rss = current_rss_bytes()
+            with cls._lock:
+                for window in cls._open:
+                    window._update(rss)
+
+    def start(self) -> "PeakRSS":
+        rss = current_rss_bytes()
+        with PeakRSS._lock:
+            self._update(rss)
+            if rss is None:
+                return self
+            PeakRSS._open.add(self)
+            if PeakRSS._sampler_pid != os.getpid():
+                # A forked worker inherits the flag but not the thread.
+                PeakRSS._sampler_pid = os.getpid()
+                threading.Thread(target=PeakRSS._sample, name="rss-sampler", daemon=True).start()
+        return self
+
+    def stop(self) -> int | None:
+        rss = current_rss_bytes()
+        with PeakRSS._lock:
+            PeakRSS._open.discard(self)
+            self._update(rss)
+        return self.peak_bytes
+
+    def __enter__(self) -> "PeakRSS":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -0,0 +1,145 @@
+import re
+from difflib import SequenceMatcher
+
+import numpy as np
+
+DEFAULT_TEXTUAL_BACKEND = "sequence_matcher"
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+class SequenceMatcherBackend:
+    """
+    Exact difflib.SequenceMatcher(None, a, b).ratio(), as used for the published numbers.
+
+    The ratio is not symmetric, so (a, b) order is preserved. Each distinct ordered
+    pair of strings is scored once, and all pairs sharing the same second string
+    reuse one matcher, whose b-side index difflib caches across set_seq1 calls.
+    """
+
+    name = "sequence_matcher"
+
+    def score_pairs(self, responses: list[str], pairs: list[tuple[int, int]]) -> list[float]:
+        by_second: dict[str, set[str]] = {}
+        for i, j in pairs:
+            by_second.setdefault(responses[j], set()).add(responses[i])
+
+        ratios: dict[tuple[str, str], float] = {}
+        matcher = SequenceMatcher(None)
+        for b, firsts in by_second.items():
+            matcher.set_seq2(b)
+            for a in firsts:
+                matcher.set_seq1(a)
+                ratios[(a, b)] = matcher.ratio()
+        return [ratios[(responses[i], responses[j])] for i, j in pairs]
+
+
+def encode_tokens(responses: list[str]) -> list[np.ndarray]:
+    """
+    Lower-cased word/punctuation tokens of each response as integer id arrays
+    over a vocabulary shared by the whole group.
+    """
+    vocabulary: dict[str, int] = {}
+    encoded = []
+    for text in responses:
+        ids = [vocabulary.setdefault(token, len(vocabulary)) for token in TOKEN_PATTERN.findall(text.lower())]
+        encoded.append(np.asarray(ids, dtype=np.int64))
+    return encoded
+
+
+def unique_groups(responses: list[str]) -> tuple[list[str], list[int]]:
+    index: dict[str, int] = {}
+    position = [index.setdefault(text, len(index)) for text in responses]
+    return list(index), position
+
+
+class TokenJaccardBackend:
+    """
+    Jaccard overlap of the token sets, computed for all pairs at once from a
+    binary response x vocabulary incidence matrix.
+    """
+
+    name = "token_jaccard"
+
+    def score_pairs(self, responses: list[str], pairs: list[tuple[int, int]]) -> list[float]:
+        distinct, position = unique_groups(responses)
+        tokens = encode_tokens(distinct)
+        vocab_size = max((int(ids.max()) + 1 for ids in tokens if ids.size), default=0)
+        incidence = np.zeros((len(distinct), vocab_size), dtype=np.float32)
+        for row, ids in enumerate(tokens):
+            incidence[row, ids] = 1.0
+
+        intersection = incidence @ incidence.T
+        sizes = incidence.sum(axis=1)
+        union = sizes[:, None] + sizes[None, :] - intersection
+        with np.errstate(invalid="ignore", divide="ignore"):
+            jaccard = np.where(union > 0, intersection / union, 1.0)
+        return [float(jaccard[position[i], position[j]]) for i, j in pairs]
+
+
+def token_edit_distances(a: np.ndarray, others: list[np.ndarray]) -> np.ndarray:
+    """
+    Levenshtein distances between one token id array and several others.
+
+    The others are right-padded into one matrix and the DP advances one token of
+    a at a time for all of them together; the insertion recurrence within a row
+    is resolved with a running minimum. Padding only affects columns past each
+    sequence's own length, so every distance is read at its own column.
+    """
+    lengths = np.array([len(b) for b in others])
+    if a.size == 0:
+        return lengths
+    padded = np.full((len(others), max(int(lengths.max()), 1)), -1, dtype=np.int64)
+    for row, b in enumerate(others):
+        padded[row, : len(b)] = b
+
+    offsets = np.arange(padded.shape[1] + 1)
+    rows = np.broadcast_to(offsets, (len(others), offsets.size)).copy()
+    candidates = np.empty_like(rows)
+    for token in a:
+        candidates[:, 0] = rows[:, 0] + 1
+        np.minimum(rows[:, :-1] + (padded != token), rows[:, 1:] + 1, out=candidates[:, 1:])
+        rows = np.minimum.accumulate(candidates - offsets, axis=1) + offsets
+    return rows[np.arange(len(others)), lengths]
+
+
+class TokenEditBackend:
+    """
+    1 - token-level Levenshtein distance / length of the longer response.
+    """
+
+    name = "token_edit"
+
+    def score_pairs(self, responses: list[str], pairs: list[tuple[int, int]]) -> list[float]:
+        distinct, position = unique_groups(responses)
+        tokens = encode_tokens(distinct)
+        partners: dict[int, set[int]] = {}
+        for i, j in pairs:
+            p, q = sorted((position[i], position[j]))
+            if p != q:
+                partners.setdefault(p, set()).add(q)
+
+        scores: dict[tuple[int, int], float] = {}
+        for p, qs in partners.items():
+            qs = sorted(qs)
+            distances = token_edit_distances(tokens[p], [tokens[q] for q in qs])
+            for q, distance in zip(qs, distances):
+                longest = max(tokens[p].size, tokens[q].size)
+                scores[(p, q)] = 1.0 - int(distance) / longest if longest else 1.0
+
+        result = []
+        for i, j in pairs:
+            p, q = sorted((position[i], position[j]))
+            result.append(1.0 if p == q else scores[(p, q)])
+        return result
+
+
+TEXTUAL_BACKENDS = {
+    backend.name: backend
+    for backend in (SequenceMatcherBackend, TokenJaccardBackend, TokenEditBackend)
+}
+
+
+def get_textual_backend(name: str = DEFAULT_TEXTUAL_BACKEND):
+    if name not in TEXTUAL_BACKENDS:
+        raise ValueError(f"Unknown textual backend '{name}'. Available: {sorted(TEXTUAL_BACKENDS)}")
+    return TEXTUAL_BACKENDS[name]()
@@ -0,0 +1,88 @@
+import os
+import time
+
+from system_resources import available_memory_bytes, total_memory_bytes
+
+DEFAULT_MAX_PAUSE_SECONDS = 2.0
+DEFAULT_LOAD_RATIO = 1.5
+DEFAULT_MIN_FREE_MEMORY_FRACTION = 0.05
+DEFAULT_SLOWDOWN_RATIO = 0.5
+INITIAL_PAUSE_SECONDS = 0.05
+EWMA_ALPHA = 0.2
+
+
+class AdaptiveThrottle:
+    """
+    Backpressure between generations that only pauses under contention.
+
+    Contention is any of: the 1-minute load average per CPU above load_ratio,
+    free memory below min_free_memory_fraction of the total, or the smoothed
+    tokens/s falling under slowdown_ratio of the best rate seen so far. While
+    contention persists the pause doubles from INITIAL_PAUSE_SECONDS up to
+    max_pause_seconds; it resets as soon as a check comes back clean.
+    """
+
+    def __init__(
+        self,
+        max_pause_seconds: float = DEFAULT_MAX_PAUSE_SECONDS,
+        load_ratio: float = DEFAULT_LOAD_RATIO,
+        min_free_memory_fraction: float = DEFAULT_MIN_FREE_MEMORY_FRACTION,
+        slowdown_ratio: float = DEFAULT_SLOWDOWN_RATIO,
+    ) -> None:
+        self.max_pause_seconds = max_pause_seconds
+        self.load_ratio = load_ratio
+        self.min_free_memory_fraction = min_free_memory_fraction
+        self.slowdown_ratio = slowdown_ratio
+        self.cpu_count = os.cpu_count() or 1
+        self.total_memory = total_memory_bytes()
+        self.tokens_per_second: float | None = None
+        self.best_tokens_per_second = 0.0
+        self.next_pause = INITIAL_PAUSE_SECONDS
+        self.throttled_seconds = 0.0
+        self.pauses = 0
+
+    def observe(self, tokens: int, seconds: float) -> None:
+        if tokens <= 0 or seconds <= 0:
+            return
+        rate = tokens / seconds
+        if self.tokens_per_second is None:
+            self.tokens_per_second = rate
+        else:
+            self.tokens_per_second = EWMA_ALPHA * rate + (1 - EWMA_ALPHA) * self.tokens_per_second
+        self.best_tokens_per_second = max(self.best_tokens_per_second, self.tokens_per_second)
+
+    def contention(self) -> str | None:
+        if hasattr(os, "getloadavg"):
+            load_per_cpu = os.getloadavg()[0] / self.cpu_count
+            if load_per_cpu > self.load_ratio:
+                return f"load {load_per_cpu:.2f}/cpu"
+
+        available = available_memory_bytes()
+        if available is not None and self.total_memory:
+            if available / self.total_memory < self.min_free_memory_fraction:
+                return f"free memory {available / 2**30:.1f} GiB"
+
+        if self.tokens_per_second is not None and self.best_tokens_per_second > 0:
+            if self.tokens_per_second < self.slowdown_ratio * self.best_tokens_per_second:
+                return f"{self.tokens_per_second:.1f} tokens/s (best {self.best_tokens_per_second:.1f})"
+
+        return None
+
+    def wait(self) -> float:
+        """
+        Pause if contention is detected and return the time spent paused.
+        """
+        if self.max_pause_seconds <= 0:
+            return 0.0
+        reason = self.contention()
+        if reason is None:
+            self.next_pause = INITIAL_PAUSE_SECONDS
+            return 0.0
+
+        pause = min(self.next_pause, self.max_pause_seconds)
+        print(f"Throttling for {pause:.2f}s: {reason}")
+        time.sleep(pause)
+        self.next_pause = min(self.next_pause * 2, self.max_pause_seconds)
+        self.throttled_seconds += pause
+        self.pauses += 1
+        return pause